@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from neomodel import db
+from typing import Iterator
+
+
+class _Entity(dict):
+    # Stands in for a neo4j node in results
+    element_id = None
+
+
+class EchoDatabase:
+    """
+    Answers the compiled create and append statements of `RecordChainRepository`
+    from their own rows, without a server.
+
+    The results have the shape the server returns, so the client side of a write
+    (validation, row building, inflation and read models) can be measured alone.
+    """
+
+    def __init__(self) -> None:
+        self.statements = 0
+
+    def cypher_query(self, query: str, params: dict = None, **kwargs):
+        self.statements += 1
+        rows = (params or {}).get("rows", [])
+        if "HAS_ACTIVE_RECORD]->(previous" in query:
+            return [
+                [
+                    row["index"],
+                    _Entity(uuid=row["uuid"], created_at=row["created_at"], version=2),
+                    _Entity(
+                        row["data"],
+                        uuid=row["record_uuid"],
+                        created_at=row["created_at"],
+                        operation=row["operation"],
+                        entity_uuid=row["uuid"],
+                        version=2,
+                        changed_fields=[field["name"] for field in row["fields"]],
+                    ),
+                    True,
+                    False,
+                ]
+                for row in rows
+            ], ["row.index", "node", "record", "written", "conflict"]
+        return [
+            [row["index"], _Entity(row["node"]), _Entity(row["record"])] for row in rows
+        ], ["row.index", "node", "record"]
+
+    @contextmanager
+    def installed(self) -> Iterator["EchoDatabase"]:
+        """
+        Answer the statements of the current thread while the block runs.
+        """
+        db.cypher_query = self.cypher_query
+        try:
+            yield self
+        finally:
+            del db.cypher_query
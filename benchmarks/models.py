@@ -0,0 +1,36 @@
+from functools import lru_cache
+from neomodel import IntegerProperty
+from pydantic import create_model
+from src.models import NodeModel, NodeRecord, RecordedNode
+from typing import Tuple
+
+
+@lru_cache(maxsize=None)
+def bench_classes(width: int) -> Tuple[type, type, type]:
+    """
+    Build the data model, node class and record class of a recorded entity with
+    `width` integer fields.
+
+    Args:
+        width: The number of data fields.
+
+    Returns: The pydantic model, the neomodel node class and record class.
+
+    """
+    fields = [f"field_{i}" for i in range(width)]
+    model_class = create_model(
+        f"Bench{width}Model",
+        __base__=NodeModel,
+        **{name: (int, ...) for name in fields},
+    )
+    node_class = type(f"Bench{width}", (RecordedNode,), {"__module__": __name__})
+    record_class = type(
+        f"Bench{width}Record",
+        (NodeRecord,),
+        {"__module__": __name__, **{name: IntegerProperty() for name in fields}},
+    )
+    return model_class, node_class, record_class
+
+
+def bench_data(width: int, seed: int = 0) -> dict:
+    return {f"field_{i}": seed + i for i in range(width)}
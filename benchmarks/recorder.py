@@ -0,0 +1,233 @@
+"""
+Throughput, latency, round-trips and allocations of `RecordedNodeService`
+operations.
+
+Runs the scenarios on the in-memory backend with every statement recorded, or on
+the Neo4j server configured by the NEO4J_* environment variables.
+
+    python -m benchmarks.recorder --entities 500 --depth 20 --width 20
+    python -m benchmarks.recorder --backend neo4j --storage delta --json
+"""
+
+import argparse
+import tracemalloc
+from benchmarks.models import bench_classes, bench_data
+from benchmarks.recording import StatementLog
+from contextlib import nullcontext
+from pydantic import BaseModel
+from src.core import init_db
+from src.repositories import MemoryStore
+from src.services import ServiceFactory
+from src.types import BackendEnum, RecordStorageEnum
+from statistics import quantiles
+from time import perf_counter
+from typing import Callable, Dict, List
+
+# Operations of a scenario whose allocations are traced and left out of the timings
+ALLOCATION_SAMPLE = 20
+
+
+class ScenarioResult(BaseModel):
+    scenario: str
+    operations: int
+    ops_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    round_trips_per_op: float
+    rows_per_op: float
+    kib_per_op: float
+    allocated_kib_per_op: float
+
+
+def _allocated_kib(operations: List[Callable[[], object]]) -> float:
+    # Mean peak of the traced memory while an operation runs
+    if not operations:
+        return 0.0
+    tracemalloc.start()
+    try:
+        total = 0
+        for operation in operations:
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            operation()
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - start
+    finally:
+        tracemalloc.stop()
+    return total / len(operations) / 1024
+
+
+def measure(
+    name: str, operations: List[Callable[[], object]], log: StatementLog
+) -> ScenarioResult:
+    """
+    Run the operations of a scenario one by one.
+
+    Args:
+        name: The name of the scenario.
+        operations: The operations, each one call of the service.
+        log: The statement log of the service.
+
+    Returns: The measurements of the scenario.
+
+    """
+    sample, timed = operations[:ALLOCATION_SAMPLE], operations[ALLOCATION_SAMPLE:]
+    allocated_kib = _allocated_kib(sample)
+
+    log.reset()
+    latencies = []
+    start = perf_counter()
+    for operation in timed:
+        operation_start = perf_counter()
+        operation()
+        latencies.append(perf_counter() - operation_start)
+    elapsed = perf_counter() - start
+
+    count = max(len(timed), 1)
+    percentiles = quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return ScenarioResult(
+        scenario=name,
+        operations=len(timed),
+        ops_per_sec=len(timed) / elapsed if elapsed else 0.0,
+        p50_ms=percentiles[49] * 1e3 if percentiles else 0.0,
+        p99_ms=percentiles[98] * 1e3 if percentiles else 0.0,
+        round_trips_per_op=log.statements / count,
+        rows_per_op=(log.rows_sent + log.rows_received) / count,
+        kib_per_op=(log.bytes_sent + log.bytes_received) / count / 1024,
+        allocated_kib_per_op=allocated_kib,
+    )
+
+
+def run(
+    backend: BackendEnum = BackendEnum.MEMORY,
+    storage: RecordStorageEnum = RecordStorageEnum.FULL,
+    entities: int = 500,
+    depth: int = 10,
+    width: int = 20,
+    page_size: int = 100,
+) -> List[ScenarioResult]:
+    """
+    Measure create, read, update, history and delete scenarios.
+
+    Args:
+        backend: The backend of the service.
+        storage: Whether records hold full copies or only the changed fields.
+        entities: The number of entities per scenario.
+        depth: The number of updates recorded per entity before the reads.
+        width: The number of data fields of the entity.
+        page_size: The page size of the history scenario.
+
+    Returns: The measurements per scenario.
+
+    """
+    backend = BackendEnum(backend)
+    model_class, node_class, record_class = bench_classes(width)
+    log = StatementLog()
+    if backend == BackendEnum.MEMORY:
+        service = ServiceFactory.create_service(
+            model_class,
+            node_class,
+            record_class,
+            storage=storage,
+            backend=backend,
+            store=MemoryStore(),
+        )
+        log.record_memory_service(service)
+        recording = nullcontext()
+    else:
+        init_db()
+        service = ServiceFactory.create_service(
+            model_class, node_class, record_class, storage=storage
+        )
+        recording = log.recording_database()
+
+    entities = max(entities, ALLOCATION_SAMPLE + 1)
+    results = []
+    with recording:
+        # Entities with a recorded history of the given depth
+        uuids = [
+            str(node.uuid)
+            for node in service.create_many(
+                bench_data(width, i) for i in range(entities)
+            )
+        ]
+        for version in range(depth):
+            service.update_many(
+                (uuid, {f"field_{version % width}": -version - 1}) for uuid in uuids
+            )
+
+        scenarios: Dict[str, List[Callable[[], object]]] = {
+            "create": [
+                lambda i=i: service.create(bench_data(width, i))
+                for i in range(entities)
+            ],
+            "read": [lambda uuid=uuid: service.read(uuid) for uuid in uuids],
+            "read_active_record": [
+                lambda uuid=uuid: service.read_active_record(uuid) for uuid in uuids
+            ],
+            "read_version": [
+                lambda uuid=uuid: service.read_version(uuid, depth // 2 + 1)
+                for uuid in uuids
+            ],
+            "history": [
+                lambda uuid=uuid: list(service.iter_history(uuid, page_size=page_size))
+                for uuid in uuids
+            ],
+            "update": [
+                lambda uuid=uuid: service.update(uuid, {"field_0": depth + 1})
+                for uuid in uuids
+            ],
+            "delete": [lambda uuid=uuid: service.delete(uuid) for uuid in uuids],
+        }
+        for name, operations in scenarios.items():
+            results.append(measure(name, operations, log))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--backend",
+        choices=[backend.value for backend in BackendEnum],
+        default=BackendEnum.MEMORY.value,
+    )
+    parser.add_argument(
+        "--storage",
+        choices=[storage.value for storage in RecordStorageEnum],
+        default=RecordStorageEnum.FULL.value,
+    )
+    parser.add_argument("--entities", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--width", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    args = parser.parse_args()
+
+    results = run(
+        BackendEnum(args.backend),
+        RecordStorageEnum(args.storage),
+        args.entities,
+        args.depth,
+        args.width,
+        args.page_size,
+    )
+    if args.json:
+        for result in results:
+            print(result.model_dump_json())
+        return
+
+    print(
+        f"{'scenario':<20} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'trips/op':>9} {'rows/op':>8} {'KiB/op':>8} {'alloc KiB/op':>13}"
+    )
+    for result in results:
+        print(
+            f"{result.scenario:<20} {result.ops_per_sec:>10.0f} "
+            f"{result.p50_ms:>8.3f} {result.p99_ms:>8.3f} "
+            f"{result.round_trips_per_op:>9.2f} {result.rows_per_op:>8.1f} "
+            f"{result.kib_per_op:>8.2f} {result.allocated_kib_per_op:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import json
+from contextlib import contextmanager
+from neomodel import db
+from typing import Iterator, Optional
+
+
+def _payload_size(value) -> int:
+    # Estimated wire size: the JSON encoding of parameters and results
+    return len(json.dumps(value, default=str))
+
+
+class StatementLog:
+    """
+    Counts the Cypher statements of a benchmark with the rows and bytes they move.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.rows_sent = 0
+        self.rows_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def record(self, query: str, params: Optional[dict], results: list) -> None:
+        params = params or {}
+        self.statements += 1
+        self.rows_sent += len(params.get("rows", ())) or 1
+        self.rows_received += len(results)
+        self.bytes_sent += len(query) + _payload_size(params)
+        self.bytes_received += _payload_size(results)
+
+    @contextmanager
+    def recording_database(self) -> Iterator["StatementLog"]:
+        """
+        Record every statement the current thread sends to Neo4j while the block
+        runs, including those of neomodel.
+        """
+        cypher_query = db.cypher_query
+
+        def recorded(query: str, params: dict = None, **kwargs):
+            results, columns = cypher_query(query, params, **kwargs)
+            self.record(query, params, results)
+            return results, columns
+
+        db.cypher_query = recorded
+        try:
+            yield self
+        finally:
+            del db.cypher_query
+
+    def record_memory_service(self, service) -> None:
+        """
+        Record the statements of a service on the memory backend. A node read
+        counts as the one statement the Neo4j repository sends for it.
+
+        Args:
+            service: A `RecordedNodeService` built with `BackendEnum.MEMORY`.
+
+        """
+        chain = service.record_chain_repo
+        run, read = chain.run, service.repository.read
+
+        def recorded_run(query: str, params: Optional[dict] = None):
+            results, columns = run(query, params)
+            self.record(query, params, results)
+            return results, columns
+
+        def recorded_read(uuid: str):
+            node = read(uuid)
+            self.record(
+                "MATCH (n {uuid: $uuid}) RETURN n",
+                {"uuid": str(uuid)},
+                [[node.model_dump(mode="json")]],
+            )
+            return node
+
+        chain.run = recorded_run
+        service.repository.read = recorded_read
@@ -0,0 +1,96 @@
+"""
+CPU per operation of the client side of a write, with the statements answered by
+`EchoDatabase`.
+
+Compares neomodel's `inflate`/`deflate`, which collect the property definitions
+on every call, with the memoised `PropertyTable` used by the repositories.
+
+    python -m benchmarks.validation --width 20 --operations 5000
+"""
+
+import argparse
+from benchmarks.echo_database import EchoDatabase
+from benchmarks.models import bench_classes, bench_data
+from src.repositories.property_table import PropertyTable
+from src.services import ServiceFactory
+from time import process_time
+from typing import Callable
+
+
+class NeomodelTable(PropertyTable):
+    """Property table that converts with neomodel's own class methods."""
+
+    def inflate(self, entity):
+        return self.model.inflate(entity)
+
+    def deflate(self, data: dict) -> dict:
+        return self.model.deflate(data)
+
+    def deflate_fields(self, data: dict) -> dict:
+        properties = self.model.defined_properties(aliases=False, rels=False)
+        return {
+            properties[name].get_db_property_name(name): (
+                None if value is None else properties[name].deflate(value)
+            )
+            for name, value in data.items()
+            if name in properties
+        }
+
+
+def cpu_per_op(func: Callable[[int], object], operations: int) -> float:
+    """
+    Returns: The CPU time per call in microseconds.
+    """
+    start = process_time()
+    for i in range(operations):
+        func(i)
+    return (process_time() - start) / operations * 1e6
+
+
+def build_service(width: int, neomodel_tables: bool):
+    service = ServiceFactory.create_service(*bench_classes(width))
+    if neomodel_tables:
+        chain = service.record_chain_repo
+        chain.node_table = NeomodelTable(chain.node_model)
+        chain.record_table = NeomodelTable(chain.record_model)
+    return service
+
+
+def run(width: int, operations: int) -> dict:
+    """
+    Measure the CPU per create and update with neomodel conversions (before) and
+    with property tables (after).
+
+    Args:
+        width: The number of data fields of the entity.
+        operations: The number of operations per measurement.
+
+    Returns: The CPU time per operation in microseconds by measurement.
+
+    """
+    results = {}
+    with EchoDatabase().installed():
+        for label, neomodel_tables in (("before", True), ("after", False)):
+            service = build_service(width, neomodel_tables)
+            node = service.create(bench_data(width))
+            results[f"create {label}"] = cpu_per_op(
+                lambda i: service.create(bench_data(width, i)), operations
+            )
+            results[f"update {label}"] = cpu_per_op(
+                lambda i: service.update(node.uuid, {"field_0": i}), operations
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--width", type=int, default=20)
+    parser.add_argument("--operations", type=int, default=5000)
+    args = parser.parse_args()
+
+    for name, value in run(args.width, args.operations).items():
+        print(f"{name:<16} {value:10.1f} us/op")
+
+
+if __name__ == "__main__":
+    main()
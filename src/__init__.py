@@ -1,2 +1,2 @@
 from .core import init_db
-from .types import OperationEnum
+from .types import OperationEnum, RecordStorageEnum, BackendEnum, TransferFormatEnum
@@ -1 +1,20 @@
-from .database import init_db
+from .database import (
+    init_db,
+    get_connection_manager,
+    ConnectionManager,
+    ConnectionSettings,
+    PoolStats,
+    cypher_query,
+    async_cypher_query,
+    count_round_trips,
+    RoundTripCounter,
+)
+from .instrumentation import (
+    Instrument,
+    QueryEvent,
+    OperationEvent,
+    MetricsCollector,
+    PrometheusExporter,
+    add_instrument,
+    remove_instrument,
+)
@@ -1,8 +1,380 @@
-from .config import NEO4J_USERNAME, NEO4J_PASSWORD, NEO4J_IP, NEO4J_BOLT_PORT
-from neomodel import config
+from .config import (
+    NEO4J_USERNAME,
+    NEO4J_PASSWORD,
+    NEO4J_IP,
+    NEO4J_BOLT_PORT,
+    NEO4J_DATABASE,
+)
+from .instrumentation import QuerySpan, instrumentation_enabled
+from contextlib import contextmanager
+from neo4j import (
+    AsyncDriver,
+    AsyncGraphDatabase,
+    DEFAULT_DATABASE,
+    Driver,
+    GraphDatabase,
+    RoutingControl,
+)
+from neomodel import config, db
+from pydantic import BaseModel, Field
+from threading import Lock, local
+from time import perf_counter
+from typing import Iterator, Optional
 
 
-def init_db():
-    config.DATABASE_URL = (
-        f"bolt://{NEO4J_USERNAME}:{NEO4J_PASSWORD}@{NEO4J_IP}:{NEO4J_BOLT_PORT}"
+class ConnectionSettings(BaseModel):
+    uri: str = Field(..., description="The bolt or neo4j URI of the server")
+    username: Optional[str] = Field(None, description="The user name")
+    password: Optional[str] = Field(None, description="The password")
+    database: Optional[str] = Field(
+        None, description="The database name or None for the default database"
     )
+    max_connection_pool_size: int = Field(
+        100, description="The maximum number of connections in the pool"
+    )
+    max_connection_lifetime: float = Field(
+        3600, description="The maximum time in seconds a connection is reused"
+    )
+    connection_acquisition_timeout: float = Field(
+        60, description="The maximum time in seconds to wait for a free connection"
+    )
+    fetch_size: int = Field(
+        1000, description="The number of rows fetched per network round-trip"
+    )
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "ConnectionSettings":
+        """
+        Read the server address and credentials from the NEO4J_* environment
+        variables.
+
+        Args:
+            **kwargs: Further settings, e.g. the pool size.
+
+        Returns: The connection settings.
+
+        """
+        return cls(
+            uri=f"bolt://{NEO4J_IP}:{NEO4J_BOLT_PORT}",
+            username=NEO4J_USERNAME,
+            password=NEO4J_PASSWORD,
+            database=NEO4J_DATABASE,
+            **kwargs,
+        )
+
+
+class PoolStats(BaseModel):
+    in_use: int
+    idle: int
+    acquisitions: int
+    total_wait_ms: float
+    max_wait_ms: float
+
+
+def _bind(driver: Optional[Driver], database: Optional[str]) -> None:
+    # Point the neomodel connection of the current thread to a driver without
+    # the server version round-trip of `db.set_connection`.
+    db.driver = driver
+    db._database_name = database or DEFAULT_DATABASE
+
+
+class ConnectionManager:
+    """
+    Owns the neo4j driver and connection pool of one recorder configuration.
+
+    The driver is created on first use and opens connections lazily. Services use
+    the manager that is active for the current thread: the one bound by
+    `session()` or `transaction()`, otherwise the one activated by `activate()`.
+
+    Example:
+        manager = ConnectionManager(ConnectionSettings.from_env(fetch_size=500))
+        with manager.transaction():
+            person = person_service.create(data)
+            person_service.update(uuid=person.uuid, data={"age": 58})
+    """
+
+    def __init__(self, settings: ConnectionSettings) -> None:
+        self.settings = settings
+        self._driver: Optional[Driver] = None
+        self._async_driver: Optional[AsyncDriver] = None
+        self._lock = Lock()
+        self._acquisitions = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _driver_config(self) -> dict:
+        auth = None
+        if self.settings.username is not None:
+            auth = (self.settings.username, self.settings.password)
+        return dict(
+            auth=auth,
+            max_connection_pool_size=self.settings.max_connection_pool_size,
+            max_connection_lifetime=self.settings.max_connection_lifetime,
+            connection_acquisition_timeout=self.settings.connection_acquisition_timeout,
+            fetch_size=self.settings.fetch_size,
+        )
+
+    @property
+    def driver(self) -> Driver:
+        with self._lock:
+            if self._driver is None:
+                self._driver = GraphDatabase.driver(
+                    self.settings.uri, **self._driver_config()
+                )
+            return self._driver
+
+    @property
+    def async_driver(self) -> AsyncDriver:
+        """The async driver for `ServiceFactory.create_async_service`."""
+        with self._lock:
+            if self._async_driver is None:
+                self._async_driver = AsyncGraphDatabase.driver(
+                    self.settings.uri, **self._driver_config()
+                )
+            return self._async_driver
+
+    def activate(self) -> None:
+        """
+        Make this manager the default connection of neomodel and the services.
+
+        Threads that already used another connection keep it until they enter a
+        `session()` or `transaction()` of this manager.
+        """
+        config.DATABASE_URL = None
+        config.DRIVER = self.driver
+        config.DATABASE_NAME = self.settings.database
+        _bind(self.driver, self.settings.database)
+
+    def _record_wait(self, wait: float) -> None:
+        with self._lock:
+            self._acquisitions += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+    @contextmanager
+    def session(self) -> Iterator["ConnectionManager"]:
+        """
+        Run the services called in the block on this manager. Each statement
+        commits on its own.
+
+        Returns: The manager.
+
+        """
+        previous = db.driver, db._database_name
+        if db._active_transaction is not None and previous[0] is not self.driver:
+            raise RuntimeError("A transaction of another connection is in progress")
+        _bind(self.driver, self.settings.database)
+        try:
+            yield self
+        finally:
+            _bind(*previous)
+
+    @contextmanager
+    def transaction(self, write: bool = True) -> Iterator["ConnectionManager"]:
+        """
+        Run the services called in the block in one transaction on this manager.
+
+        The transaction commits when the block exits and rolls back if it raises.
+        Nested transactions of the same manager join the outer one.
+
+        Args:
+            write: Whether the transaction is routed to a writer.
+
+        Returns: The manager.
+
+        """
+        with self.session():
+            if db._active_transaction is not None:
+                yield self
+                return
+
+            start = perf_counter()
+            db.begin(access_mode="WRITE" if write else "READ")
+            self._record_wait(perf_counter() - start)
+            try:
+                yield self
+            except BaseException:
+                db.rollback()
+                raise
+            db.commit()
+
+    @property
+    def pool_stats(self) -> PoolStats:
+        """
+        Connection counts of the pool and the time spent waiting for a connection
+        when transactions of this manager began.
+        """
+        in_use = idle = 0
+        if self._driver is not None:
+            pool = self._driver._pool
+            with pool.lock:
+                for connections in pool.connections.values():
+                    for connection in connections:
+                        if connection.in_use:
+                            in_use += 1
+                        else:
+                            idle += 1
+        with self._lock:
+            return PoolStats(
+                in_use=in_use,
+                idle=idle,
+                acquisitions=self._acquisitions,
+                total_wait_ms=self._total_wait * 1000,
+                max_wait_ms=self._max_wait * 1000,
+            )
+
+    def close(self) -> None:
+        """
+        Close the driver and its connections. The async driver is closed by
+        `aclose()`.
+        """
+        with self._lock:
+            driver, self._driver = self._driver, None
+        if driver is None:
+            return
+        if config.DRIVER is driver:
+            config.DRIVER = None
+        if db.driver is driver:
+            _bind(None, None)
+        driver.close()
+
+    async def aclose(self) -> None:
+        """
+        Close the async driver. Call it from the event loop that used it.
+        """
+        with self._lock:
+            async_driver, self._async_driver = self._async_driver, None
+        if async_driver is not None:
+            await async_driver.close()
+
+
+_default_manager: Optional[ConnectionManager] = None
+
+
+def init_db(settings: Optional[ConnectionSettings] = None) -> ConnectionManager:
+    """
+    Create and activate the default connection manager.
+
+    Args:
+        settings: The connection settings. Defaults to the NEO4J_* environment
+            variables.
+
+    Returns: The default connection manager.
+
+    """
+    global _default_manager
+    if _default_manager is not None:
+        _default_manager.close()
+    _default_manager = ConnectionManager(settings or ConnectionSettings.from_env())
+    _default_manager.activate()
+    return _default_manager
+
+
+def get_connection_manager() -> ConnectionManager:
+    """
+    Returns: The connection manager activated by `init_db`.
+    """
+    if _default_manager is None:
+        raise RuntimeError("init_db() has not been called")
+    return _default_manager
+
+
+class RoundTripCounter:
+    """
+    Counts the Cypher statements sent through `cypher_query` while it is active.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.queries: list = []
+
+    def record(self, query: str) -> None:
+        self.count += 1
+        self.queries.append(query)
+
+
+_active_counters = local()
+
+
+def _counters() -> list:
+    if not hasattr(_active_counters, "stack"):
+        _active_counters.stack = []
+    return _active_counters.stack
+
+
+@contextmanager
+def count_round_trips() -> Iterator[RoundTripCounter]:
+    """
+    Count the round-trips issued by the current thread.
+
+    Example:
+        with count_round_trips() as counter:
+            person_service.update(uuid=uuid, data={"age": 58})
+        assert counter.count == 1
+
+    Returns: A counter that is updated for every statement run through `cypher_query`.
+
+    """
+    counter = RoundTripCounter()
+    _counters().append(counter)
+    try:
+        yield counter
+    finally:
+        _counters().remove(counter)
+
+
+def cypher_query(query: str, params: Optional[dict] = None, **kwargs):
+    """
+    Run a Cypher statement on the neomodel connection as one round-trip.
+
+    Args:
+        query: The Cypher statement.
+        params: The statement parameters.
+
+    Returns: A tuple of result rows and column names.
+
+    """
+    for counter in _counters():
+        counter.record(query)
+    if not instrumentation_enabled():
+        return db.cypher_query(query, params, **kwargs)
+    with QuerySpan(query) as span:
+        results, columns = db.cypher_query(query, params, **kwargs)
+        span.rows = len(results)
+    return results, columns
+
+
+async def async_cypher_query(
+    driver: AsyncDriver,
+    query: str,
+    params: Optional[dict] = None,
+    database: Optional[str] = None,
+    write: bool = True,
+):
+    """
+    Run a Cypher statement on an async driver as one round-trip.
+
+    The statement runs in a managed transaction that the driver retries on
+    transient errors.
+
+    Args:
+        driver: The async driver.
+        query: The Cypher statement.
+        params: The statement parameters.
+        database: The database name or None for the default database.
+        write: Whether the statement is routed to a writer.
+
+    Returns: A tuple of result rows and column names.
+
+    """
+    for counter in _counters():
+        counter.record(query)
+    with QuerySpan(query) as span:
+        records, _, keys = await driver.execute_query(
+            query,
+            params or {},
+            database_=database,
+            routing_=RoutingControl.WRITE if write else RoutingControl.READ,
+        )
+        span.rows = len(records)
+    return [list(record.values()) for record in records], keys
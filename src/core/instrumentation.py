@@ -0,0 +1,461 @@
+import inspect
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class QueryEvent(NamedTuple):
+    """A database call, attributed to the operation that caused it."""
+
+    query: str
+    method: Optional[str]  # The instrumented method of the operation or None
+    seconds: float
+    rows: int
+    failed: bool
+
+
+class OperationEvent(NamedTuple):
+    """A call of an instrumented service or repository method."""
+
+    method: str
+    seconds: float
+    database_seconds: float
+    validation_seconds: float
+    queries: int
+    rows: int
+    failed: bool
+
+
+class Instrument:
+    """
+    Callback interface of the instrumentation. Override the callbacks of interest
+    and register the instrument with `add_instrument`.
+
+    Callbacks run synchronously in the thread of the operation, so they should
+    be cheap.
+    """
+
+    def on_query(self, event: QueryEvent) -> None:
+        pass
+
+    def on_operation(self, event: OperationEvent) -> None:
+        pass
+
+
+_instruments: List[Instrument] = []
+_instruments_lock = Lock()
+
+
+def add_instrument(instrument: Instrument) -> Instrument:
+    """
+    Start sending query and operation events to an instrument.
+
+    Returns: The instrument.
+    """
+    global _instruments
+    with _instruments_lock:
+        # Copy on write, emitting iterates without the lock
+        _instruments = _instruments + [instrument]
+    return instrument
+
+
+def remove_instrument(instrument: Instrument) -> None:
+    global _instruments
+    with _instruments_lock:
+        _instruments = [item for item in _instruments if item is not instrument]
+
+
+def instrumentation_enabled() -> bool:
+    return bool(_instruments)
+
+
+class _Operation:
+    __slots__ = ("method", "database_seconds", "validation_seconds", "queries", "rows")
+
+    def __init__(self, method: str) -> None:
+        self.method = method
+        self.database_seconds = 0.0
+        self.validation_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+
+
+_current_operation: ContextVar[Optional[_Operation]] = ContextVar(
+    "recorder_operation", default=None
+)
+
+
+class QuerySpan:
+    """
+    Times a database call as one query of the current operation. Set `rows` to
+    the number of returned rows before the block ends.
+
+    Example:
+        with QuerySpan(query) as span:
+            results, columns = db.cypher_query(query, params)
+            span.rows = len(results)
+    """
+
+    __slots__ = ("query", "rows", "_start")
+
+    def __init__(self, query: str) -> None:
+        self.query = query
+        self.rows = 0
+
+    def __enter__(self) -> "QuerySpan":
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if not _instruments:
+            return
+        seconds = perf_counter() - self._start
+        operation = _current_operation.get()
+        if operation is not None:
+            operation.database_seconds += seconds
+            operation.queries += 1
+            operation.rows += self.rows
+        event = QueryEvent(
+            self.query,
+            None if operation is None else operation.method,
+            seconds,
+            self.rows,
+            exc_type is not None,
+        )
+        for instrument in _instruments:
+            instrument.on_query(event)
+
+
+class ValidationSpan:
+    """
+    Adds the time of the block to the validation time of the current operation.
+    """
+
+    __slots__ = ("_start",)
+
+    def __enter__(self) -> "ValidationSpan":
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        operation = _current_operation.get()
+        if operation is not None:
+            operation.validation_seconds += perf_counter() - self._start
+
+
+def _finish(operation: _Operation, seconds: float, failed: bool) -> None:
+    event = OperationEvent(
+        operation.method,
+        seconds,
+        operation.database_seconds,
+        operation.validation_seconds,
+        operation.queries,
+        operation.rows,
+        failed,
+    )
+    for instrument in _instruments:
+        instrument.on_operation(event)
+
+
+def instrumented(func: Callable) -> Callable:
+    """
+    Time every call of a method as an operation named by the method, and attribute
+    the queries and validation inside it to the operation. Calls from within
+    another operation belong to that operation.
+
+    Generator methods are timed while they produce items. Without registered
+    instruments the method is called directly.
+    """
+    method = func.__qualname__
+
+    if inspect.isgeneratorfunction(func):
+
+        @wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            if not _instruments or _current_operation.get() is not None:
+                yield from func(*args, **kwargs)
+                return
+
+            operation = _Operation(method)
+            iterator = func(*args, **kwargs)
+            seconds = 0.0
+            failed = True
+            try:
+                while True:
+                    token = _current_operation.set(operation)
+                    start = perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        failed = False
+                        return
+                    finally:
+                        seconds += perf_counter() - start
+                        _current_operation.reset(token)
+                    try:
+                        yield item
+                    except GeneratorExit:
+                        # Stopped by the consumer before the end
+                        failed = False
+                        raise
+            finally:
+                iterator.close()
+                _finish(operation, seconds, failed)
+
+        return generator_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _instruments or _current_operation.get() is not None:
+            return func(*args, **kwargs)
+
+        operation = _Operation(method)
+        token = _current_operation.set(operation)
+        start = perf_counter()
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _current_operation.reset(token)
+            _finish(operation, perf_counter() - start, failed)
+
+    return wrapper
+
+
+def database_call(func: Callable) -> Callable:
+    """
+    Instrument a repository method that talks to the database through neomodel
+    as an operation with a single query named by the method.
+    """
+    method = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _instruments:
+            return func(*args, **kwargs)
+
+        span = QuerySpan(method)
+        with span:
+            result = func(*args, **kwargs)
+            span.rows = 0 if result is None else 1
+        return result
+
+    return instrumented(wrapper)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MethodMetrics:
+    """The aggregated operations of one instrumented method."""
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.operations = 0
+        self.failures = 0
+        self.queries = 0
+        self.rows = 0
+        self.database_seconds = 0.0
+        self.validation_seconds = 0.0
+        self.latency = _Histogram(buckets)
+        self.query_latency = _Histogram(buckets)
+
+    @property
+    def queries_per_op(self) -> float:
+        return self.queries / self.operations if self.operations else 0.0
+
+    @property
+    def seconds(self) -> float:
+        return self.latency.sum
+
+    @property
+    def other_seconds(self) -> float:
+        """Time spent neither in the database nor in validation."""
+        return self.seconds - self.database_seconds - self.validation_seconds
+
+
+class MetricsCollector(Instrument):
+    """
+    Aggregates the events per method: operations, queries, rows, latency
+    histograms and the split into database, validation and other time.
+
+    Example:
+        metrics = add_instrument(MetricsCollector())
+        person_service.update(uuid, {"age": 58})
+        update = metrics.methods["RecordedNodeService.update"]
+        print(update.queries_per_op, update.database_seconds, update.validation_seconds)
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.methods: Dict[str, MethodMetrics] = {}
+        self._lock = Lock()
+
+    def _method(self, method: str) -> MethodMetrics:
+        metrics = self.methods.get(method)
+        if metrics is None:
+            metrics = self.methods.setdefault(method, MethodMetrics(self.buckets))
+        return metrics
+
+    def on_query(self, event: QueryEvent) -> None:
+        with self._lock:
+            self._method(event.method or "").query_latency.observe(event.seconds)
+
+    def on_operation(self, event: OperationEvent) -> None:
+        with self._lock:
+            metrics = self._method(event.method)
+            metrics.operations += 1
+            metrics.failures += event.failed
+            metrics.queries += event.queries
+            metrics.rows += event.rows
+            metrics.database_seconds += event.database_seconds
+            metrics.validation_seconds += event.validation_seconds
+            metrics.latency.observe(event.seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.methods = {}
+
+
+class PrometheusExporter:
+    """
+    Exposes the metrics of a collector in the Prometheus text format.
+
+    Example:
+        exporter = PrometheusExporter(add_instrument(MetricsCollector()))
+        exporter.serve(9464)
+    """
+
+    def __init__(self, collector: MetricsCollector, prefix: str = "recorder") -> None:
+        self.collector = collector
+        self.prefix = prefix
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @staticmethod
+    def _label(method: str) -> str:
+        method = method.replace("\\", "\\\\").replace('"', '\\"')
+        return f'method="{method}"'
+
+    def _histogram(self, lines: List[str], name: str, label: str, hist) -> None:
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label},le="+Inf"}} {hist.count}')
+        lines.append(f"{name}_sum{{{label}}} {hist.sum}")
+        lines.append(f"{name}_count{{{label}}} {hist.count}")
+
+    def render(self) -> str:
+        """
+        Returns: The metrics in the Prometheus text exposition format.
+        """
+        p = self.prefix
+        counters = {
+            f"{p}_operations_total": ("Calls of the method", "operations"),
+            f"{p}_operation_failures_total": ("Failed calls", "failures"),
+            f"{p}_queries_total": ("Database calls of the method", "queries"),
+            f"{p}_rows_total": ("Rows returned to the method", "rows"),
+            f"{p}_database_seconds_total": (
+                "Time spent in database calls",
+                "database_seconds",
+            ),
+            f"{p}_validation_seconds_total": (
+                "Time spent in pydantic validation",
+                "validation_seconds",
+            ),
+        }
+        with self.collector._lock:
+            methods = sorted(self.collector.methods.items())
+            lines = []
+            for name, (description, attribute) in counters.items():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} counter")
+                for method, metrics in methods:
+                    if metrics.operations:
+                        value = getattr(metrics, attribute)
+                        lines.append(f"{name}{{{self._label(method)}}} {value}")
+            for name, description, attribute in (
+                (f"{p}_operation_seconds", "Latency of the method", "latency"),
+                (
+                    f"{p}_query_seconds",
+                    "Latency of its database calls",
+                    "query_latency",
+                ),
+            ):
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+                for method, metrics in methods:
+                    hist = getattr(metrics, attribute)
+                    if hist.count:
+                        self._histogram(lines, name, self._label(method), hist)
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "") -> ThreadingHTTPServer:
+        """
+        Serve the metrics over HTTP from a daemon thread.
+
+        Args:
+            port: The port to listen on.
+            host: The interface to listen on, all by default.
+
+        Returns: The server, stopped by `shutdown`.
+
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
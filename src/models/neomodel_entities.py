@@ -2,6 +2,9 @@ from neomodel import (
     StructuredNode,
     StructuredRel,
     StringProperty,
+    IntegerProperty,
+    BooleanProperty,
+    ArrayProperty,
     DateTimeProperty,
     RelationshipTo,
     RelationshipFrom,
@@ -32,12 +35,17 @@ class RecorderNode(StructuredNode):
 
 class NodeRecord(RecorderNode):
     operation = StringProperty(required=True)
+    entity_uuid = StringProperty(index=True)
+    version = IntegerProperty(index=True)
+    snapshot = BooleanProperty()
+    changed_fields = ArrayProperty(StringProperty())
     previous = RelationshipFrom(
         "NodeRecord", "HAS_PREVIOUS_RECORD", model=HasPreviousRecord
     )
 
 
 class RecordedNode(RecorderNode):
+    version = IntegerProperty()  # Version of the active record, the write counter
     records = RelationshipTo(NodeRecord, "HAS_RECORD", model=HasRecord)
     active_record = RelationshipTo(
         NodeRecord, "HAS_ACTIVE_RECORD", model=HasActiveRecord
@@ -46,6 +54,8 @@ class RecordedNode(RecorderNode):
 
 class EdgeRecord(RecorderNode):
     operation = StringProperty(required=True)
+    edge_uuid = StringProperty(index=True)
+    version = IntegerProperty(index=True)
     previous = RelationshipFrom(
         "EdgeRecord", "HAS_PREVIOUS_RECORD", model=HasPreviousRecord
     )
@@ -1,8 +1,9 @@
 from datetime import datetime
+from functools import lru_cache
 from pydantic import BaseModel, create_model, Field
 from pydantic.fields import FieldInfo
 from src.types import OperationEnum
-from typing import Dict
+from typing import Dict, List, Optional, Tuple, Type
 from uuid import UUID
 
 
@@ -14,7 +15,8 @@ class NodeModel(BaseModel):
 class EntityCreateModel(BaseModel): ...
 
 
-class EntityReadModel(NodeModel): ...
+class EntityReadModel(NodeModel):
+    version: Optional[int] = Field(None, description="Version of the entity data")
 
 
 class EntityUpdateModel(BaseModel): ...
@@ -32,6 +34,10 @@ class RecordCreateModel(BaseModel):
 
 class RecordReadModel(NodeModel):
     operation: OperationEnum = Field(..., description="Operation to be performed")
+    version: Optional[int] = Field(None, description="Version within the entity")
+    changed_fields: Optional[List[str]] = Field(
+        None, description="Fields changed by the operation"
+    )
 
     class Config:
         use_enum_values = True
@@ -96,12 +102,14 @@ def create_entity_read_model(model: NodeModel):
 
 def create_entity_update_model(model: NodeModel):
     """
-    Create a generic model for create operations.
+    Create a generic model for update operations.
+
+    All fields are optional, so an update only has to contain the changed fields.
 
     Args:
-        model: The model to create the create operation model from.
+        model: The model to create the update operation model from.
 
-    Returns: A create operation model.
+    Returns: An update operation model.
 
     """
     exclude_fields = {"uuid", "created_at"}
@@ -115,7 +123,10 @@ def create_entity_update_model(model: NodeModel):
             if name not in exclude_fields
         },
         **{
-            name: (field.annotation, field)
+            name: (
+                field.annotation,
+                FieldInfo.from_annotated_attribute(field.annotation, None),
+            )
             for name, field in model.model_fields.items()
             if name not in exclude_fields
         },
@@ -203,11 +214,166 @@ def create_record_read_model(model: NodeModel):
     return create_model(f"{model.__name__}RecordRead", **fields, __config__=Config)
 
 
+@lru_cache(maxsize=None)
+def create_projection_model(
+    model: Type[BaseModel], fields: Tuple[str, ...], keep: Tuple[str, ...] = ("uuid",)
+):
+    """
+    Create a partial read model with a subset of the fields of a read model.
+
+    Args:
+        model: The read model to project, e.g. a generated record read model.
+        fields: The projected fields.
+        keep: The fields every projection includes.
+
+    Returns: A memoised read model with the kept and the projected fields.
+
+    """
+    unknown = [name for name in fields if name not in model.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown} of {model.__name__}")
+    fields: Dict[str, tuple] = {
+        name: (model.model_fields[name].annotation, model.model_fields[name])
+        for name in dict.fromkeys(keep + fields)
+    }
+    return create_model(
+        f"{model.__name__}Projection", **fields, __config__=model.model_config
+    )
+
+
+class ItemNotFound(BaseModel):
+    """Outcome of a batch item whose node does not exist."""
+
+    uuid: str
+
+
+class ItemConflict(BaseModel):
+    """Outcome of a batch item whose node is not at the expected version."""
+
+    uuid: str
+    expected_version: int
+    version: Optional[int] = Field(None, description="The current version")
+
+
+class ItemInvalid(BaseModel):
+    """Outcome of a batch item that failed validation."""
+
+    index: int
+    error: str
+
+
 class EdgeModel(BaseModel):
     uuid: UUID
     created_at: datetime
 
 
+class EdgeCreateModel(BaseModel):
+    start_uuid: UUID = Field(..., description="The uuid of the start node")
+    end_uuid: UUID = Field(..., description="The uuid of the end node")
+
+
+class EdgeReadModel(EdgeModel, EdgeCreateModel):
+    version: Optional[int] = Field(None, description="Version of the edge data")
+
+
+class EdgeRecordReadModel(NodeModel):
+    operation: OperationEnum = Field(..., description="Operation to be performed")
+    edge_uuid: Optional[UUID] = Field(None, description="The uuid of the edge")
+    version: Optional[int] = Field(None, description="Version within the edge")
+
+    class Config:
+        use_enum_values = True
+
+
+def create_edge_create_model(model: EdgeModel):
+    """
+    Create a generic model for create operations of recorded edges.
+
+    Args:
+        model: The model to create the create operation model from.
+
+    Returns: A create operation model.
+
+    """
+    exclude_fields = {"uuid", "created_at"}
+    fields = {
+        **{
+            name: (field.annotation, field)
+            for name, field in EdgeCreateModel.model_fields.items()
+        },
+        **{
+            name: (field.annotation, field)
+            for name, field in model.model_fields.items()
+            if name not in exclude_fields
+        },
+    }
+
+    return create_model(f"{model.__name__}Create", **fields)
+
+
+def create_edge_read_model(model: EdgeModel):
+    """
+    Create a generic model for read operations of recorded edges.
+
+    Args:
+        model: The model to create the read operation model from.
+
+    Returns: A read operation model.
+
+    """
+    fields: Dict[str, tuple] = {
+        **{
+            name: (field.annotation, field)
+            for name, field in EdgeReadModel.model_fields.items()
+        },
+        **{
+            name: (
+                field.annotation,
+                FieldInfo.from_annotated_attribute(field.annotation, None),
+            )
+            for name, field in model.model_fields.items()
+            if name not in EdgeReadModel.model_fields
+        },
+    }
+
+    class Config:
+        from_attributes = True
+
+    return create_model(f"{model.__name__}Read", **fields, __config__=Config)
+
+
+def create_edge_record_read_model(model: EdgeModel):
+    """
+    Create a generic model for reading the records of recorded edges.
+
+    Args:
+        model: The model to create the read operation model from.
+
+    Returns: A read operation model.
+
+    """
+    fields: Dict[str, tuple] = {
+        **{
+            name: (field.annotation, field)
+            for name, field in EdgeRecordReadModel.model_fields.items()
+        },
+        **{
+            name: (
+                field.annotation,
+                FieldInfo.from_annotated_attribute(field.annotation, None),
+            )
+            for name, field in model.model_fields.items()
+            if name not in EdgeRecordReadModel.model_fields
+        },
+    }
+
+    class Config:
+        from_attributes = True
+        use_enum_values = True
+
+    return create_model(f"{model.__name__}RecordRead", **fields, __config__=Config)
+
+
 class HasRecordCreate(BaseModel):
     start_uuid: UUID
     end_uuid: UUID
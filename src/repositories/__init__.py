@@ -1,2 +1,12 @@
 from .edge_repositories import EdgeRepository
 from .node_repository import NodeRepository
+from .record_chain_repository import RecordChainRepository
+from .async_node_repository import AsyncNodeRepository
+from .async_record_chain_repository import AsyncRecordChainRepository
+from .edge_record_chain_repository import EdgeRecordChainRepository
+from .memory_repositories import (
+    MemoryStore,
+    MemoryNodeRepository,
+    MemoryRecordChainRepository,
+    MemoryEdgeRecordChainRepository,
+)
@@ -0,0 +1,53 @@
+from neo4j import AsyncDriver
+from src.core.database import async_cypher_query
+from src.models.neomodel_entities import RecorderNode
+from pydantic import BaseModel
+from src.models.pydantic_models import NodeModel
+from src.repositories.property_table import property_table
+from typing import Type, TypeVar, Generic, Optional
+
+TNodeCreate = TypeVar("TNodeCreate", bound=BaseModel)  # Pydantic create class
+TNodeRead = TypeVar("TNodeRead", bound=NodeModel)  # Pydantic read class
+TNode = TypeVar("TNode", bound=RecorderNode)  # Neomodel node class
+
+
+class AsyncNodeRepository(Generic[TNodeCreate, TNodeRead, TNode]):
+    def __init__(
+        self,
+        driver: AsyncDriver,
+        node_model: Type[TNode],
+        read_model: Type[TNodeRead],
+        database: Optional[str] = None,
+    ):
+        self.driver = driver  # Neo4j async driver
+        self.database = database  # Database name or None for the default database
+        self.node_model = node_model  # Neomodel node class
+        self.read_model = read_model  # Pydantic read class
+        self.node_table = property_table(node_model)
+
+        labels = ":".join(node_model.inherited_labels())
+        self.create_query = f"CREATE (node:{labels}) SET node = $properties RETURN node"
+        self.read_query = (
+            f"MATCH (node:{node_model.__label__} {{uuid: $uuid}}) RETURN node"
+        )
+
+    async def create(self, data: TNodeCreate) -> TNodeRead:
+        # Deflate the pydantic create data with the neomodel node class
+        properties = self.node_table.deflate(data.model_dump())
+        results, _ = await async_cypher_query(
+            self.driver, self.create_query, {"properties": properties}, self.database
+        )
+
+        # Validate the data against the pydantic read model
+        return self.read_model.model_validate(self.node_table.inflate(results[0][0]))
+
+    async def read(self, uuid: str) -> TNodeRead:
+        results, _ = await async_cypher_query(
+            self.driver, self.read_query, {"uuid": str(uuid)}, self.database, False
+        )
+
+        if not results:
+            raise ValueError(f"Node with uuid {uuid} not found")
+
+        # Validate the data against the pydantic read model
+        return self.read_model.model_validate(self.node_table.inflate(results[0][0]))
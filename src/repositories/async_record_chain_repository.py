@@ -0,0 +1,166 @@
+from datetime import datetime
+from neo4j import AsyncDriver
+from src.core.database import async_cypher_query
+from src.repositories.record_chain_repository import (
+    DEFAULT_BATCH_SIZE,
+    RecordChainRepository,
+    TEntity,
+    TRecord,
+)
+from src.types import OperationEnum, RecordStorageEnum
+from typing import Generic, Optional, Tuple, Iterable, AsyncIterator, List
+
+
+class AsyncRecordChainRepository(Generic[TEntity, TRecord]):
+    """
+    Runs the compiled statements of a `RecordChainRepository` on an async driver.
+
+    Statements, rows and result handling are shared with the blocking repository,
+    only the round-trips are awaited.
+    """
+
+    def __init__(
+        self,
+        driver: AsyncDriver,
+        chain: RecordChainRepository[TEntity, TRecord],
+        database: Optional[str] = None,
+    ):
+        self.driver = driver  # Neo4j async driver
+        self.chain = chain  # Repository holding the compiled statements
+        self.database = database  # Database name or None for the default database
+
+    @property
+    def skipped_updates(self) -> int:
+        return self.chain.skipped_updates
+
+    async def _query(self, query: str, params: dict, write: bool = True) -> list:
+        results, _ = await async_cypher_query(
+            self.driver, query, params, self.database, write
+        )
+        return results
+
+    async def _materialize(self, kind: str, params: dict) -> List[TRecord]:
+        results = await self._query(
+            self.chain.materialize_queries[kind], {"from_version": None} | params, False
+        )
+        return self.chain.fold_records([record for record, in results])
+
+    async def _write_snapshots(self, records: List[TRecord]) -> None:
+        rows = []
+        for record in records:
+            states = await self._materialize(
+                "version", {"uuid": record.entity_uuid, "version": record.version}
+            )
+            rows.append(self.chain.snapshot_row(record, states[-1]))
+        await self._query(self.chain.write_snapshots_query, {"rows": rows})
+
+    async def create_records(
+        self, items: Iterable[Tuple[int, dict]], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> AsyncIterator[Tuple[int, TEntity, TRecord]]:
+        """
+        Create recorded nodes together with their first record in UNWIND batches.
+
+        Args:
+            items: Pairs of an item index and the validated node data.
+            batch_size: The maximum number of nodes per statement.
+
+        Returns: Triples of the item index, the created node and its record.
+
+        """
+        for rows in self.chain.create_batches(items, batch_size):
+            results = await self._query(self.chain.create_records_query, {"rows": rows})
+            for result in self.chain.inflate_results(results):
+                yield result
+
+    async def create_record(self, data: dict) -> Tuple[TEntity, TRecord]:
+        async for _, node, record in self.create_records([(0, data)]):
+            return node, record
+
+    async def append_records(
+        self,
+        items: Iterable[Tuple[int, str, dict, OperationEnum]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> AsyncIterator[Tuple[int, TEntity, TRecord]]:
+        """
+        Append records to the record chains of recorded nodes in UNWIND batches.
+
+        Args:
+            items: Quadruples of an item index, the node uuid, the changed record data
+                and the operation.
+            batch_size: The maximum number of records per statement.
+
+        Returns: Triples of the item index, the node and the new record. Items of
+            unknown nodes are left out.
+
+        """
+        for rows in self.chain.append_batches(items, batch_size):
+            results = await self._query(self.chain.append_records_query, {"rows": rows})
+            appended, due = self.chain.inflate_append_results(results)
+            if due:
+                await self._write_snapshots(due)
+            for result in appended:
+                yield result
+
+    async def append_record(
+        self, uuid: str, data: dict, operation: OperationEnum
+    ) -> Optional[Tuple[TEntity, TRecord]]:
+        async for _, node, record in self.append_records([(0, uuid, data, operation)]):
+            return node, record
+        return None
+
+    async def _read_record(self, query: str, params: dict) -> Optional[TRecord]:
+        results = await self._query(query, params, False)
+        if not results:
+            return None
+        return self.chain.record_table.inflate(results[0][0])
+
+    async def _read(self, kind: str, query: str, params: dict) -> Optional[TRecord]:
+        if self.chain.storage == RecordStorageEnum.DELTA:
+            return self.chain.last(await self._materialize(kind, params))
+        return await self._read_record(query, params)
+
+    async def read_record_as_of(
+        self, uuid: str, timestamp: datetime
+    ) -> Optional[TRecord]:
+        return await self._read(
+            "as_of",
+            self.chain.read_record_as_of_query,
+            self.chain.as_of_params(uuid, timestamp),
+        )
+
+    async def read_record_version(self, uuid: str, version: int) -> Optional[TRecord]:
+        return await self._read(
+            "version",
+            self.chain.read_record_version_query,
+            {"uuid": str(uuid), "version": version},
+        )
+
+    async def read_active_record(self, uuid: str) -> Optional[TRecord]:
+        return await self._read(
+            "active", self.chain.read_active_record_query, {"uuid": str(uuid)}
+        )
+
+    async def read_history_page(
+        self,
+        uuid: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+        page_size: int = DEFAULT_BATCH_SIZE,
+        newest_first: bool = True,
+        changed_field: Optional[str] = None,
+    ) -> List[TRecord]:
+        results = await self._query(
+            self.chain.read_history_page_queries[newest_first],
+            self.chain.history_page_params(
+                uuid, since, until, after, page_size, changed_field, newest_first
+            ),
+            False,
+        )
+        page = [self.chain.record_table.inflate(record) for record, in results]
+        if self.chain.storage == RecordStorageEnum.DELTA and page:
+            states = await self._materialize(
+                "version", self.chain.page_state_params(uuid, page)
+            )
+            page = self.chain.page_states(page, states)
+        return page
@@ -0,0 +1,379 @@
+import re
+from datetime import datetime, timezone
+from src.core.database import cypher_query
+from src.models.neomodel_entities import EdgeRecord, RecorderNode
+from src.repositories.record_chain_repository import DEFAULT_BATCH_SIZE, _now
+from src.repositories.property_table import property_table
+from src.types import OperationEnum
+from typing import Type, TypeVar, Generic, Optional, Tuple, Iterable, Iterator, List
+from uuid import uuid4
+
+TEdgeRecord = TypeVar("TEdgeRecord", bound=EdgeRecord)  # Neomodel edge record class
+
+# Properties of an edge record that describe the record instead of the recorded data
+EDGE_RECORD_META_FIELDS = {"uuid", "created_at", "operation", "edge_uuid", "version"}
+
+_RELATIONSHIP_TYPE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class EdgeRecordChainRepository(Generic[TEdgeRecord]):
+    """
+    Writes recorded edges and their record chains with compiled Cypher statements.
+
+    A recorded edge is a relationship `(start)-[:{REL}]->(end)` holding the current
+    data and version. Every change creates an edge record that is connected to both
+    nodes by `(start)-[:{REL}__RECORDED]->(record)-[:RECORDED__{REL}]->(end)` and to
+    the record it replaces by `HAS_PREVIOUS_RECORD`. Deleting an edge removes the
+    relationship and keeps its records.
+
+    Appends lock the edge before reading its version, so concurrent writers of one
+    edge queue up instead of forking the record chain.
+    """
+
+    def __init__(
+        self,
+        rel_type: str,
+        start_node_model: Type[RecorderNode],
+        end_node_model: Type[RecorderNode],
+        record_model: Type[TEdgeRecord],
+    ):
+        if not _RELATIONSHIP_TYPE.match(rel_type):
+            raise ValueError(f"Invalid relationship type {rel_type}")
+
+        self.rel_type = rel_type
+        self.recorded_rel_type = f"{rel_type}__RECORDED"
+        self.records_rel_type = f"RECORDED__{rel_type}"
+        self.start_node_model = start_node_model
+        self.end_node_model = end_node_model
+        self.record_model = record_model  # Neomodel edge record class
+        self.record_table = property_table(record_model)
+        self.properties = self.record_table.properties
+        self.data_fields = [
+            name for name in self.properties if name not in EDGE_RECORD_META_FIELDS
+        ]
+
+        self.start_label = start_node_model.__label__
+        self.end_label = end_node_model.__label__
+        self.record_label = record_model.__label__
+        self.record_labels = ":".join(record_model.inherited_labels())
+
+        self.create_edges_query = self._compile_create_edges_query()
+        self.append_edges_query = self._compile_append_edges_query()
+        self.read_edge_query = f"""
+            MATCH (start:{self.start_label})
+                -[edge:{self.rel_type} {{uuid: $uuid}}]->(end:{self.end_label})
+            RETURN start.uuid, end.uuid, properties(edge)
+        """
+        self.read_edges_between_query = f"""
+            MATCH (start:{self.start_label} {{uuid: $start_uuid}})
+                -[edge:{self.rel_type}]->(end:{self.end_label} {{uuid: $end_uuid}})
+            RETURN start.uuid, end.uuid, properties(edge)
+            ORDER BY edge.created_at
+        """
+        self.read_history_query = f"""
+            MATCH (record:{self.record_label})
+            WHERE record.edge_uuid = $uuid
+            RETURN record
+            ORDER BY record.version
+        """
+
+    def run(self, query: str, params: Optional[dict] = None):
+        """
+        Run one of the compiled statements of the repository as one round-trip.
+
+        Args:
+            query: The statement.
+            params: The statement parameters.
+
+        Returns: A tuple of result rows and column names.
+
+        """
+        return cypher_query(query, params)
+
+    def _links(self) -> str:
+        # Connect the record to both nodes of the recorded edge
+        return f"""
+            CREATE (start)-[:{self.recorded_rel_type} {{
+                uuid: row.start_link_uuid, created_at: row.created_at
+            }}]->(record)
+            CREATE (record)-[:{self.records_rel_type} {{
+                uuid: row.end_link_uuid, created_at: row.created_at
+            }}]->(end)
+        """
+
+    def _compile_create_edges_query(self) -> str:
+        # Match nodes -> create edge -> create first record -> link record to nodes
+        # Rows with a missing node return which node is missing.
+        return f"""
+            UNWIND $rows AS row
+            OPTIONAL MATCH (start:{self.start_label} {{uuid: row.start_uuid}})
+            OPTIONAL MATCH (end:{self.end_label} {{uuid: row.end_uuid}})
+            CALL {{
+                WITH row, start, end
+                WITH row, start, end
+                WHERE start IS NOT NULL AND end IS NOT NULL
+                CREATE (start)-[edge:{self.rel_type}]->(end)
+                SET edge = row.edge
+                CREATE (record:{self.record_labels})
+                SET record = row.record
+                {self._links()}
+                RETURN properties(edge) AS edge, record
+                UNION
+                WITH start, end
+                WITH start, end
+                WHERE start IS NULL OR end IS NULL
+                RETURN null AS edge, null AS record
+            }}
+            RETURN row.index, start IS NOT NULL, end IS NOT NULL, edge, record
+        """
+
+    def _compile_append_edges_query(self) -> str:
+        # Lock edge -> match its last record -> create record from it and the data
+        # -> link record to nodes and previous record -> update or delete the edge
+        return f"""
+            UNWIND $rows AS row
+            MATCH (start:{self.start_label})
+                -[edge:{self.rel_type} {{uuid: row.uuid}}]->(end:{self.end_label})
+            // Concurrent appends to the edge wait for its write lock and then read
+            // the version committed by the previous append
+            SET edge._lock = true
+            REMOVE edge._lock
+            WITH row, start, edge, end
+            MATCH (previous:{self.record_label})
+            WHERE previous.edge_uuid = edge.uuid AND previous.version = edge.version
+            CREATE (record:{self.record_labels})
+            SET record = properties(previous)
+            SET record += row.data
+            SET record.uuid = row.record_uuid,
+                record.created_at = row.created_at,
+                record.operation = row.operation,
+                record.version = previous.version + 1
+            {self._links()}
+            CREATE (record)-[:HAS_PREVIOUS_RECORD {{
+                uuid: row.has_previous_record_uuid, created_at: row.created_at
+            }}]->(previous)
+            SET edge += row.data
+            SET edge.version = record.version
+            WITH row, start, end, edge, record, properties(edge) AS edge_properties
+            FOREACH (
+                _ IN CASE
+                    WHEN row.operation = '{OperationEnum.DELETED.value}' THEN [1]
+                    ELSE []
+                END | DELETE edge
+            )
+            RETURN row.index, start.uuid, end.uuid, edge_properties, record
+        """
+
+    def inflate_edge(self, start_uuid: str, end_uuid: str, properties: dict) -> dict:
+        """
+        Convert the properties of an edge into edge data.
+
+        Args:
+            start_uuid: The uuid of the start node.
+            end_uuid: The uuid of the end node.
+            properties: The properties of the relationship.
+
+        Returns: The edge data keyed by the python attribute names.
+
+        """
+        edge = {
+            "uuid": properties["uuid"],
+            "created_at": datetime.fromtimestamp(
+                properties["created_at"], timezone.utc
+            ),
+            "version": properties.get("version"),
+            "start_uuid": start_uuid,
+            "end_uuid": end_uuid,
+        }
+        for name in self.data_fields:
+            prop = self.properties[name]
+            value = properties.get(prop.get_db_property_name(name))
+            edge[name] = None if value is None else prop.inflate(value)
+        return edge
+
+    def create_row(
+        self, index: int, start_uuid: str, end_uuid: str, data: dict
+    ) -> dict:
+        """
+        Build the row of the create statement for one edge.
+
+        Args:
+            index: The item index returned with the result.
+            start_uuid: The uuid of the start node.
+            end_uuid: The uuid of the end node.
+            data: The validated edge data.
+
+        Returns: The statement row.
+
+        """
+        created_at = _now()
+        edge_uuid = str(uuid4())
+        deflated = self.record_table.deflate_fields(data)
+        return {
+            "index": index,
+            "start_uuid": str(start_uuid),
+            "end_uuid": str(end_uuid),
+            "created_at": created_at,
+            "edge": deflated
+            | {"uuid": edge_uuid, "created_at": created_at, "version": 1},
+            "record": deflated
+            | {
+                "uuid": str(uuid4()),
+                "created_at": created_at,
+                "operation": OperationEnum.CREATED.value,
+                "edge_uuid": edge_uuid,
+                "version": 1,
+            },
+            "start_link_uuid": str(uuid4()),
+            "end_link_uuid": str(uuid4()),
+        }
+
+    def append_row(
+        self, index: int, uuid: str, data: dict, operation: OperationEnum
+    ) -> dict:
+        """
+        Build the row of the append statement for one change.
+
+        Args:
+            index: The item index returned with the result.
+            uuid: The uuid of the edge.
+            data: The changed edge data.
+            operation: The operation of the new record.
+
+        Returns: The statement row.
+
+        """
+        return {
+            "index": index,
+            "uuid": str(uuid),
+            "data": self.record_table.deflate_fields(data),
+            "operation": OperationEnum(operation).value,
+            "created_at": _now(),
+            "record_uuid": str(uuid4()),
+            "start_link_uuid": str(uuid4()),
+            "end_link_uuid": str(uuid4()),
+            "has_previous_record_uuid": str(uuid4()),
+        }
+
+    def create_edges(
+        self,
+        items: Iterable[Tuple[int, str, str, dict]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[Tuple[int, bool, bool, Optional[dict], Optional[TEdgeRecord]]]:
+        """
+        Create recorded edges together with their first record in UNWIND batches.
+
+        Args:
+            items: Quadruples of an item index, the start node uuid, the end node uuid
+                and the validated edge data.
+            batch_size: The maximum number of edges per statement.
+
+        Returns: Per item the index, whether the start and end node exist, and the
+            edge data and record or None if a node does not exist.
+
+        """
+        rows = []
+        for index, start_uuid, end_uuid, data in items:
+            rows.append(self.create_row(index, start_uuid, end_uuid, data))
+            if len(rows) >= batch_size:
+                yield from self._create_batch(rows)
+                rows = []
+        if rows:
+            yield from self._create_batch(rows)
+
+    def _create_batch(self, rows: List[dict]):
+        starts = {row["index"]: row["start_uuid"] for row in rows}
+        ends = {row["index"]: row["end_uuid"] for row in rows}
+        results, _ = self.run(self.create_edges_query, {"rows": rows})
+        for index, has_start, has_end, edge, record in results:
+            if edge is None:
+                yield index, has_start, has_end, None, None
+                continue
+            yield (
+                index,
+                has_start,
+                has_end,
+                self.inflate_edge(starts[index], ends[index], edge),
+                self.record_table.inflate(record),
+            )
+
+    def append_edges(
+        self,
+        items: Iterable[Tuple[int, str, dict, OperationEnum]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[Tuple[int, dict, TEdgeRecord]]:
+        """
+        Record changes of recorded edges in UNWIND batches.
+
+        An edge uuid occurs at most once per statement, so repeated changes of the
+        same edge are chained in order.
+
+        Args:
+            items: Quadruples of an item index, the edge uuid, the changed edge data
+                and the operation.
+            batch_size: The maximum number of records per statement.
+
+        Returns: Triples of the item index, the edge data after the change and the
+            new record. Items of unknown edges are left out.
+
+        """
+        rows = []
+        uuids = set()
+        for index, uuid, data, operation in items:
+            uuid = str(uuid)
+            if len(rows) >= batch_size or uuid in uuids:
+                yield from self._append_batch(rows)
+                rows = []
+                uuids = set()
+            uuids.add(uuid)
+            rows.append(self.append_row(index, uuid, data, operation))
+        if rows:
+            yield from self._append_batch(rows)
+
+    def _append_batch(self, rows: List[dict]):
+        results, _ = self.run(self.append_edges_query, {"rows": rows})
+        for index, start_uuid, end_uuid, edge, record in results:
+            yield (
+                index,
+                self.inflate_edge(start_uuid, end_uuid, edge),
+                self.record_table.inflate(record),
+            )
+
+    def read_edge(self, uuid: str) -> Optional[dict]:
+        """
+        Args:
+            uuid: The uuid of the edge.
+
+        Returns: The edge data or None if the edge does not exist.
+
+        """
+        results, _ = self.run(self.read_edge_query, {"uuid": str(uuid)})
+        for start_uuid, end_uuid, edge in results:
+            return self.inflate_edge(start_uuid, end_uuid, edge)
+        return None
+
+    def read_edges_between(self, start_uuid: str, end_uuid: str) -> List[dict]:
+        """
+        Args:
+            start_uuid: The uuid of the start node.
+            end_uuid: The uuid of the end node.
+
+        Returns: The data of the edges from the start to the end node.
+
+        """
+        results, _ = self.run(
+            self.read_edges_between_query,
+            {"start_uuid": str(start_uuid), "end_uuid": str(end_uuid)},
+        )
+        return [self.inflate_edge(*result) for result in results]
+
+    def read_history(self, uuid: str) -> List[TEdgeRecord]:
+        """
+        Args:
+            uuid: The uuid of the edge.
+
+        Returns: The records of the edge ordered by version.
+
+        """
+        results, _ = self.run(self.read_history_query, {"uuid": str(uuid)})
+        return [self.record_table.inflate(record) for record, in results]
@@ -1,3 +1,4 @@
+from src.core.instrumentation import database_call
 from src.models.neomodel_entities import RecorderEdge, RecorderNode
 from pydantic import BaseModel
 from src.models.pydantic_models import EdgeModel
@@ -29,6 +30,7 @@ class EdgeRepository(
         self.create_model = create_model
         self.read_model = read_model
 
+    @database_call
     def create(self, relationship: str, data: TCreate) -> Optional[TRead]:
         """
 
@@ -59,6 +61,7 @@ class EdgeRepository(
         # Rückgabe des Pydantic-Read-Modells
         return self.read_model.from_orm(rel_instance)
 
+    @database_call
     def read(
         self,
         relationship: str,
@@ -77,6 +80,7 @@ class EdgeRepository(
             )
         return None
 
+    @database_call
     def update(self, relationship: str, data: TUpdate) -> Optional[TRead]:
         """
 
@@ -110,6 +114,7 @@ class EdgeRepository(
         # Rückgabe des Pydantic-Read-Modells
         return self.read_model.from_orm(rel_instance)
 
+    @database_call
     def get_relationship(
         self, start_node_uuid: str, end_node_uuid: str
     ) -> Optional[TRead]:
@@ -127,6 +132,7 @@ class EdgeRepository(
         # Rückgabe als Pydantic-Read-Modell
         return self.read_model.from_orm(rel_instance)
 
+    @database_call
     def delete_relationship(self, start_node_uuid: str, end_node_uuid: str) -> bool:
         """Löscht die Beziehung zwischen zwei Knoten basierend auf deren UUIDs."""
         start_node = self.start_node_model.nodes.get_or_none(uuid=start_node_uuid)
@@ -0,0 +1,705 @@
+from collections import defaultdict
+from src.core.instrumentation import QuerySpan, database_call
+from src.models.neomodel_entities import RecorderNode, RecordedNode, NodeRecord
+from src.repositories.edge_record_chain_repository import (
+    EdgeRecordChainRepository,
+    TEdgeRecord,
+)
+from src.repositories.node_repository import (
+    NodeRepository,
+    TNode,
+    TNodeCreate,
+    TNodeRead,
+)
+from src.repositories.property_table import property_table
+from src.repositories.record_chain_repository import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_SNAPSHOT_INTERVAL,
+    RecordChainRepository,
+)
+from src.types import OperationEnum, RecordStorageEnum
+from threading import RLock
+from typing import Callable, Dict, Iterable, List, Optional, Type, TypeVar
+
+TEntity = TypeVar("TEntity", bound=RecordedNode)  # Neomodel recorded node class
+TRecord = TypeVar("TRecord", bound=NodeRecord)  # Neomodel node record class
+
+
+def _strip(properties: dict) -> dict:
+    # Like SET in Cypher, null values do not create properties
+    return {key: value for key, value in properties.items() if value is not None}
+
+
+class MemoryStore:
+    """
+    In-memory graph for the recorder: nodes and records by uuid, the records of each
+    entity in version order and an adjacency map of the relationships.
+
+    Each statement runs under `lock`, so it is atomic like a transaction.
+    """
+
+    def __init__(self) -> None:
+        self.lock = RLock()
+        self.nodes: Dict[str, dict] = {}
+        self.labels: Dict[str, frozenset] = {}
+        # Records of a recorded node or edge by its uuid, ordered by version
+        self.timelines: Dict[str, List[dict]] = defaultdict(list)
+        # Relationships by start node uuid as [type, end node uuid, properties]
+        self.outgoing: Dict[str, List[list]] = defaultdict(list)
+        # Relationships by their uuid as (start node uuid, adjacency entry)
+        self.relationships: Dict[str, tuple] = {}
+
+    def add_node(self, labels: List[str], properties: dict) -> dict:
+        node = _strip(properties)
+        self.nodes[node["uuid"]] = node
+        self.labels[node["uuid"]] = frozenset(labels)
+        return node
+
+    def add_record(self, labels: List[str], properties: dict, key: str) -> dict:
+        record = self.add_node(labels, properties)
+        self.timelines[key].append(record)
+        return record
+
+    def node(self, uuid: str, label: str) -> Optional[dict]:
+        if label not in self.labels.get(uuid, ()):
+            return None
+        return self.nodes[uuid]
+
+    def relate(self, start: str, rel_type: str, end: str, properties: dict) -> list:
+        entry = [rel_type, end, _strip(properties)]
+        self.outgoing[start].append(entry)
+        self.relationships[entry[2]["uuid"]] = (start, entry)
+        return entry
+
+    def unrelate(self, uuid: str) -> None:
+        start, entry = self.relationships.pop(uuid)
+        self.outgoing[start].remove(entry)
+
+    def delete_node(self, uuid: str, key: Optional[str] = None) -> None:
+        # Like DETACH DELETE, also removes the relationships of the node
+        self.nodes.pop(uuid)
+        self.labels.pop(uuid)
+        for entry in self.outgoing.pop(uuid, []):
+            del self.relationships[entry[2]["uuid"]]
+        for rel_uuid, (start, entry) in list(self.relationships.items()):
+            if entry[1] == uuid:
+                self.unrelate(rel_uuid)
+        if key is not None:
+            self.timelines[key] = [
+                record for record in self.timelines[key] if record["uuid"] != uuid
+            ]
+
+    def related(self, start: str, rel_type: str) -> List[list]:
+        return [entry for entry in self.outgoing.get(start, ()) if entry[0] == rel_type]
+
+    def changes(
+        self,
+        labels: List[str],
+        after: tuple,
+        until: float,
+        operations: Optional[List[str]],
+        page_size: int,
+    ) -> List[list]:
+        """
+        Rows of a change feed page: [label, record] of the records of the labels
+        created after the (created_at, uuid) cursor, in cursor order.
+        """
+        rows = []
+        for label in labels:
+            for uuid, node_labels in self.labels.items():
+                if label not in node_labels:
+                    continue
+                record = self.nodes[uuid]
+                key = (record["created_at"], uuid)
+                if key <= after or record["created_at"] > until:
+                    continue
+                if operations is not None and record["operation"] not in operations:
+                    continue
+                rows.append([label, dict(record)])
+        rows.sort(key=lambda row: (row[1]["created_at"], row[1]["uuid"]))
+        return rows[:page_size]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.nodes.clear()
+            self.labels.clear()
+            self.timelines.clear()
+            self.outgoing.clear()
+            self.relationships.clear()
+
+
+DEFAULT_STORE = MemoryStore()
+
+
+class MemoryNodeRepository(NodeRepository[TNodeCreate, TNodeRead, TNode]):
+    def __init__(
+        self,
+        node_model: Type[TNode],
+        read_model: Type[TNodeRead],
+        store: Optional[MemoryStore] = None,
+    ):
+        super().__init__(node_model=node_model, read_model=read_model)
+        self.store = store or DEFAULT_STORE
+        self.node_table = property_table(node_model)
+
+    @database_call
+    def create(self, data: TNodeCreate) -> TNodeRead:
+        properties = self.node_table.deflate(data.model_dump())
+        with self.store.lock:
+            node = self.store.add_node(self.node_model.inherited_labels(), properties)
+        return self.read_model.model_validate(self.node_table.inflate(dict(node)))
+
+    @database_call
+    def read(self, uuid: str) -> TNodeRead:
+        with self.store.lock:
+            node = self.store.node(str(uuid), self.node_model.__label__)
+            node = None if node is None else dict(node)
+
+        if node is None:
+            raise ValueError(f"Node with uuid {uuid} not found")
+        return self.read_model.model_validate(self.node_table.inflate(node))
+
+    @database_call
+    def read_many(self, uuids: Iterable[str]) -> Dict[str, TNodeRead]:
+        label = self.node_model.__label__
+        with self.store.lock:
+            nodes = [self.store.node(str(uuid), label) for uuid in uuids]
+            nodes = [dict(node) for node in nodes if node is not None]
+        return {
+            node["uuid"]: self.read_model.model_validate(self.node_table.inflate(node))
+            for node in nodes
+        }
+
+
+class MemoryRecordChainRepository(RecordChainRepository[TEntity, TRecord]):
+    """
+    `RecordChainRepository` on a `MemoryStore`.
+
+    The compiled statements are answered by equivalent in-memory operations, so
+    rows, results, delta folding and inflation are shared with the Neo4j backend.
+    """
+
+    def __init__(
+        self,
+        node_model: Type[TEntity],
+        record_model: Type[TRecord],
+        storage: RecordStorageEnum = RecordStorageEnum.FULL,
+        snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+        store: Optional[MemoryStore] = None,
+    ):
+        super().__init__(node_model, record_model, storage, snapshot_interval)
+        self.store = store or DEFAULT_STORE
+        self._handlers: Dict[str, Callable[[dict], list]] = {
+            self.create_records_query: self._create_records,
+            self.append_records_query: self._append_records,
+            self.backfill_chains_query: self._backfill_chains,
+            self.read_record_as_of_query: lambda params: self._rows(
+                self._as_of(params)
+            ),
+            self.read_record_version_query: lambda params: self._rows(
+                self._version(params)
+            ),
+            self.read_active_record_query: lambda params: self._rows(
+                self._active(params["uuid"])
+            ),
+            self.write_snapshots_query: self._write_snapshot_rows,
+            self.snapshot_as_of_query: self._snapshot_as_of,
+            self.retention_page_query: self._retention_page,
+            self.compact_records_query: self._compact_records,
+            self.delete_records_query: self._delete_records,
+            self.read_history_page_queries[True]: lambda params: self._history(
+                params, newest_first=True
+            ),
+            self.read_history_page_queries[False]: lambda params: self._history(
+                params, newest_first=False
+            ),
+            self.materialize_queries["version"]: lambda params: self._since_snapshot(
+                self._version(params), params
+            ),
+            self.materialize_queries["as_of"]: lambda params: self._since_snapshot(
+                self._as_of(params), params
+            ),
+            self.materialize_queries["active"]: lambda params: self._since_snapshot(
+                self._active(params["uuid"]), params
+            ),
+        }
+
+    def run(self, query: str, params: Optional[dict] = None):
+        handled, keys = self.projections.get(query, (query, None))
+        with QuerySpan(query) as span, self.store.lock:
+            results = self._handlers[handled](params or {})
+            if keys is not None:
+                # Map projection of the returned records
+                results = [
+                    [{key: record.get(key) for key in keys} for record in row]
+                    for row in results
+                ]
+            span.rows = len(results)
+        return results, []
+
+    def install_timeline_indexes(self) -> None:
+        pass
+
+    def backfill_timeline(self, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        return 0
+
+    def migrate_to_delta(self, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        with self.store.lock:
+            uuids = sorted(
+                uuid
+                for uuid, labels in self.store.labels.items()
+                if self.node_label in labels
+            )
+        converted = 0
+        # Like the Neo4j backend, pages of nodes are converted one at a time
+        for start in range(0, len(uuids), batch_size):
+            with self.store.lock:
+                for uuid in uuids[start : start + batch_size]:
+                    records = self._timeline(uuid)
+                    if any(record.get("snapshot") is not None for record in records):
+                        continue
+                    for record, properties in zip(
+                        records, self.delta_properties(records)
+                    ):
+                        # In place, the timeline and the store share the records
+                        record.clear()
+                        record.update(_strip(properties))
+                    converted += len(records)
+        return converted
+
+    @staticmethod
+    def _rows(*records: Optional[dict]) -> List[list]:
+        return [[dict(record)] for record in records if record is not None]
+
+    def _timeline(self, uuid: str) -> List[dict]:
+        return self.store.timelines.get(str(uuid), [])
+
+    def _active(self, uuid: str) -> Optional[dict]:
+        if self.store.node(uuid, self.node_label) is None:
+            return None
+        for _, end, _ in self.store.related(uuid, "HAS_ACTIVE_RECORD"):
+            return self.store.node(end, self.record_label)
+        return None
+
+    def _version(self, params: dict) -> Optional[dict]:
+        for record in self._timeline(params["uuid"]):
+            if record.get("version") == params["version"]:
+                return record
+        return None
+
+    def _as_of(self, params: dict) -> Optional[dict]:
+        candidates = [
+            record
+            for record in self._timeline(params["uuid"])
+            if record["created_at"] <= params["timestamp"]
+        ]
+        if not candidates:
+            return None
+        return max(
+            candidates, key=lambda record: (record["created_at"], record["version"])
+        )
+
+    def _since_snapshot(self, target: Optional[dict], params: dict) -> List[list]:
+        # Records from the nearest snapshot at or before the target up to the target
+        if target is None:
+            return []
+        timeline = self._timeline(target["entity_uuid"])
+        limit = params.get("from_version") or target["version"]
+        snapshots = [
+            record["version"]
+            for record in timeline
+            if record["version"] <= limit and record.get("snapshot", True)
+        ]
+        if not snapshots:
+            return []
+        return self._rows(
+            *(
+                record
+                for record in timeline
+                if max(snapshots) <= record["version"] <= target["version"]
+            )
+        )
+
+    def _snapshot_as_of(self, params: dict) -> List[list]:
+        uuids = sorted(
+            uuid
+            for uuid, labels in self.store.labels.items()
+            if self.node_label in labels
+            and (params["after"] is None or uuid > params["after"])
+        )[: params["page_size"]]
+        results = []
+        for uuid in uuids:
+            target = self._as_of({"uuid": uuid, "timestamp": params["timestamp"]})
+            records = []
+            if target is not None and (
+                params["include_deleted"] or target["operation"] != params["deleted"]
+            ):
+                if self.storage == RecordStorageEnum.DELTA:
+                    records = [record for record, in self._since_snapshot(target, {})]
+                elif all(
+                    target.get(key) == value for key, value in params["filter"].items()
+                ):
+                    records = [dict(target)]
+            results.append([uuid, records])
+        return results
+
+    def _create_records(self, params: dict) -> List[list]:
+        results = []
+        for row in params["rows"]:
+            node = self.store.add_node(self.node_model.inherited_labels(), row["node"])
+            record = self.store.add_record(
+                self.record_model.inherited_labels(), row["record"], node["uuid"]
+            )
+            for rel_type in ("HAS_RECORD", "HAS_ACTIVE_RECORD"):
+                self.store.relate(
+                    node["uuid"],
+                    rel_type,
+                    record["uuid"],
+                    {
+                        "uuid": row[f"{rel_type.lower()}_uuid"],
+                        "created_at": row["created_at"],
+                    },
+                )
+            results.append([row["index"], dict(node), dict(record)])
+        return results
+
+    def _state(self, previous: dict) -> dict:
+        # The data of the active record, folded from the nearest snapshot
+        if self.storage == RecordStorageEnum.FULL:
+            return previous
+        keys = self.record_table.keys
+        state = {}
+        for (record,) in self._since_snapshot(previous, {}):
+            if record.get("snapshot", True):
+                state = dict(record)
+            else:
+                for name in record.get("changed_fields") or []:
+                    state[keys[name]] = record.get(keys[name])
+        return state
+
+    def _append_records(self, params: dict) -> List[list]:
+        results = []
+        for row in params["rows"]:
+            uuid = row["uuid"]
+            previous = self._active(uuid)
+            if previous is None:
+                continue
+            node = self.store.nodes[uuid]
+            version = previous.get("version") or 0
+            node["version"] = version
+            if row.get("expected_version") not in (None, version):
+                results.append([row["index"], dict(node), dict(previous), False, True])
+                continue
+
+            data = row["data"]
+            state = self._state(previous)
+            changed_fields = [
+                field["name"]
+                for field in row["fields"]
+                if state.get(field["key"]) != data.get(field["key"])
+            ]
+            if row["operation"] == OperationEnum.UPDATED.value and not changed_fields:
+                results.append([row["index"], dict(node), dict(previous), False, False])
+                continue
+
+            if self.storage == RecordStorageEnum.DELTA:
+                properties = data | {"snapshot": False}
+            else:
+                properties = previous | data
+            record = self.store.add_record(
+                self.record_model.inherited_labels(),
+                properties
+                | {
+                    "uuid": row["record_uuid"],
+                    "created_at": row["created_at"],
+                    "operation": row["operation"],
+                    "changed_fields": changed_fields,
+                    "entity_uuid": uuid,
+                    "version": version + 1,
+                },
+                uuid,
+            )
+            node["version"] = version + 1
+            for _, _, active in self.store.related(uuid, "HAS_ACTIVE_RECORD"):
+                self.store.unrelate(active["uuid"])
+            for start, rel_type, end, rel_uuid in (
+                (uuid, "HAS_RECORD", record["uuid"], row["has_record_uuid"]),
+                (
+                    uuid,
+                    "HAS_ACTIVE_RECORD",
+                    record["uuid"],
+                    row["has_active_record_uuid"],
+                ),
+                (
+                    record["uuid"],
+                    "HAS_PREVIOUS_RECORD",
+                    previous["uuid"],
+                    row["has_previous_record_uuid"],
+                ),
+            ):
+                self.store.relate(
+                    start,
+                    rel_type,
+                    end,
+                    {"uuid": rel_uuid, "created_at": row["created_at"]},
+                )
+            results.append([row["index"], dict(node), dict(record), True, False])
+        return results
+
+    def _backfill_chains(self, params: dict) -> List[list]:
+        created = []
+        for row in params["rows"]:
+            uuid = row["node"]["uuid"]
+            if self.store.node(uuid, self.node_label) is not None:
+                continue
+            self.store.add_node(self.node_model.inherited_labels(), row["node"])
+            for entry in row["records"]:
+                record = self.store.add_record(
+                    self.record_model.inherited_labels(), entry["record"], uuid
+                )
+                self.store.relate(
+                    uuid,
+                    "HAS_RECORD",
+                    record["uuid"],
+                    {
+                        "uuid": entry["has_record_uuid"],
+                        "created_at": record["created_at"],
+                    },
+                )
+            for link in row["previous"]:
+                self.store.relate(
+                    link["record_uuid"],
+                    "HAS_PREVIOUS_RECORD",
+                    link["previous_uuid"],
+                    {"uuid": link["uuid"], "created_at": link["created_at"]},
+                )
+            active = row["active"]
+            self.store.relate(
+                uuid,
+                "HAS_ACTIVE_RECORD",
+                active["record_uuid"],
+                {"uuid": active["uuid"], "created_at": active["created_at"]},
+            )
+            created.append(uuid)
+        return [[created]]
+
+    def _write_snapshot_rows(self, params: dict) -> List[list]:
+        for row in params["rows"]:
+            record = self.store.nodes[row["uuid"]]
+            record.update(row["data"])
+            record["snapshot"] = True
+            for key in [key for key, value in record.items() if value is None]:
+                del record[key]
+        return []
+
+    def _retention_page(self, params: dict) -> List[list]:
+        uuids = sorted(
+            uuid
+            for uuid, labels in self.store.labels.items()
+            if self.node_label in labels
+            and (params["after"] is None or uuid > params["after"])
+        )
+        page = []
+        for uuid in uuids[: params["batch_size"]]:
+            active = self._active(uuid)
+            if active is None:
+                continue
+            records = [
+                [
+                    record["uuid"],
+                    record.get("version"),
+                    record["created_at"],
+                    record.get("snapshot"),
+                    record.get("changed_fields"),
+                ]
+                for record in self._timeline(uuid)
+            ]
+            page.append([uuid, active["uuid"], records])
+        return page
+
+    def _compact_records(self, params: dict) -> List[list]:
+        for row in params["rows"]:
+            record = self.store.nodes.get(row["uuid"])
+            if record is None:
+                continue
+            record.update(row["data"])
+            record["changed_fields"] = row["changed_fields"]
+            record["snapshot"] = row["snapshot"]
+            for key in [key for key, value in record.items() if value is None]:
+                del record[key]
+            for _, _, link in self.store.related(record["uuid"], "HAS_PREVIOUS_RECORD"):
+                self.store.unrelate(link["uuid"])
+            if self.store.node(row["previous_uuid"], self.record_label) is not None:
+                self.store.relate(
+                    record["uuid"],
+                    "HAS_PREVIOUS_RECORD",
+                    row["previous_uuid"],
+                    {"uuid": row["link_uuid"], "created_at": row["created_at"]},
+                )
+        return []
+
+    def _delete_records(self, params: dict) -> List[list]:
+        for uuid in params["uuids"]:
+            record = self.store.node(uuid, self.record_label)
+            if record is not None:
+                self.store.delete_node(uuid, record.get("entity_uuid"))
+        return []
+
+    def _history(self, params: dict, newest_first: bool) -> List[list]:
+        def key(record: dict) -> tuple:
+            return record["created_at"], record["uuid"]
+
+        after = (params["after_created_at"], params["after_uuid"])
+        page = []
+        for record in self._timeline(params["uuid"]):
+            if not params["since"] <= record["created_at"] <= params["until"]:
+                continue
+            if params["changed_field"] is not None and params["changed_field"] not in (
+                record.get("changed_fields") or []
+            ):
+                continue
+            if key(record) >= after if newest_first else key(record) <= after:
+                continue
+            page.append(record)
+        page.sort(key=key, reverse=newest_first)
+        return self._rows(*page[: params["page_size"]])
+
+
+class MemoryEdgeRecordChainRepository(EdgeRecordChainRepository[TEdgeRecord]):
+    """
+    `EdgeRecordChainRepository` on a `MemoryStore`.
+    """
+
+    def __init__(
+        self,
+        rel_type: str,
+        start_node_model: Type[RecorderNode],
+        end_node_model: Type[RecorderNode],
+        record_model: Type[TEdgeRecord],
+        store: Optional[MemoryStore] = None,
+    ):
+        super().__init__(rel_type, start_node_model, end_node_model, record_model)
+        self.store = store or DEFAULT_STORE
+        self._handlers: Dict[str, Callable[[dict], list]] = {
+            self.create_edges_query: self._create_edges,
+            self.append_edges_query: self._append_edges,
+            self.read_edge_query: self._read_edge,
+            self.read_edges_between_query: self._read_edges_between,
+            self.read_history_query: lambda params: [
+                [dict(record)]
+                for record in self.store.timelines.get(params["uuid"], [])
+            ],
+        }
+
+    def run(self, query: str, params: Optional[dict] = None):
+        with QuerySpan(query) as span, self.store.lock:
+            results = self._handlers[query](params or {})
+            span.rows = len(results)
+        return results, []
+
+    def _edge(self, uuid: str) -> Optional[tuple]:
+        start, entry = self.store.relationships.get(uuid, (None, None))
+        if entry is None or entry[0] != self.rel_type:
+            return None
+        if self.store.node(start, self.start_label) is None:
+            return None
+        if self.store.node(entry[1], self.end_label) is None:
+            return None
+        return start, entry
+
+    def _link(self, start: str, record: dict, end: str, row: dict) -> None:
+        for link_start, rel_type, link_end, rel_uuid in (
+            (start, self.recorded_rel_type, record["uuid"], row["start_link_uuid"]),
+            (record["uuid"], self.records_rel_type, end, row["end_link_uuid"]),
+        ):
+            self.store.relate(
+                link_start,
+                rel_type,
+                link_end,
+                {"uuid": rel_uuid, "created_at": row["created_at"]},
+            )
+
+    def _create_edges(self, params: dict) -> List[list]:
+        results = []
+        for row in params["rows"]:
+            start = self.store.node(row["start_uuid"], self.start_label)
+            end = self.store.node(row["end_uuid"], self.end_label)
+            if start is None or end is None:
+                results.append(
+                    [row["index"], start is not None, end is not None, None, None]
+                )
+                continue
+            _, _, edge = self.store.relate(
+                row["start_uuid"], self.rel_type, row["end_uuid"], row["edge"]
+            )
+            record = self.store.add_record(
+                self.record_model.inherited_labels(), row["record"], edge["uuid"]
+            )
+            self._link(row["start_uuid"], record, row["end_uuid"], row)
+            results.append([row["index"], True, True, dict(edge), dict(record)])
+        return results
+
+    def _append_edges(self, params: dict) -> List[list]:
+        results = []
+        for row in params["rows"]:
+            found = self._edge(row["uuid"])
+            if found is None:
+                continue
+            start, (_, end, edge) = found
+            previous = next(
+                record
+                for record in self.store.timelines[edge["uuid"]]
+                if record.get("version") == edge.get("version")
+            )
+            record = self.store.add_record(
+                self.record_model.inherited_labels(),
+                previous
+                | row["data"]
+                | {
+                    "uuid": row["record_uuid"],
+                    "created_at": row["created_at"],
+                    "operation": row["operation"],
+                    "version": previous["version"] + 1,
+                },
+                edge["uuid"],
+            )
+            self._link(start, record, end, row)
+            self.store.relate(
+                record["uuid"],
+                "HAS_PREVIOUS_RECORD",
+                previous["uuid"],
+                {
+                    "uuid": row["has_previous_record_uuid"],
+                    "created_at": row["created_at"],
+                },
+            )
+            edge.update(row["data"])
+            edge["version"] = record["version"]
+            for key in [key for key, value in edge.items() if value is None]:
+                del edge[key]
+            if row["operation"] == OperationEnum.DELETED.value:
+                self.store.unrelate(edge["uuid"])
+            results.append([row["index"], start, end, dict(edge), dict(record)])
+        return results
+
+    def _read_edge(self, params: dict) -> List[list]:
+        found = self._edge(params["uuid"])
+        if found is None:
+            return []
+        start, (_, end, edge) = found
+        return [[start, end, dict(edge)]]
+
+    def _read_edges_between(self, params: dict) -> List[list]:
+        if self.store.node(params["start_uuid"], self.start_label) is None:
+            return []
+        if self.store.node(params["end_uuid"], self.end_label) is None:
+            return []
+        edges = [
+            edge
+            for _, end, edge in self.store.related(params["start_uuid"], self.rel_type)
+            if end == params["end_uuid"]
+        ]
+        edges.sort(key=lambda edge: edge["created_at"])
+        return [
+            [params["start_uuid"], params["end_uuid"], dict(edge)] for edge in edges
+        ]
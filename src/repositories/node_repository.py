@@ -1,7 +1,8 @@
+from src.core.instrumentation import database_call
 from src.models.neomodel_entities import RecorderEdge, RecorderNode
 from pydantic import BaseModel
 from src.models.pydantic_models import NodeModel, EdgeModel
-from typing import Type, TypeVar, Generic, Optional
+from typing import Dict, Iterable, Type, TypeVar, Generic, Optional
 
 TNodeCreate = TypeVar("TNodeCreate", bound=BaseModel)  # Pydantic create class
 TNodeRead = TypeVar("TNodeRead", bound=NodeModel)  # Pydantic read class
@@ -13,6 +14,7 @@ class NodeRepository(Generic[TNodeCreate, TNodeRead, TNode]):
         self.node_model = node_model  # Neomodel node class
         self.read_model = read_model  # Pydantic read class
 
+    @database_call
     def create(self, data: TNodeCreate) -> TNodeRead:
         # Create and save a neomodel object from the pydantic create data in the database
         node_instance = self.node_model(**data.model_dump())
@@ -21,6 +23,7 @@ class NodeRepository(Generic[TNodeCreate, TNodeRead, TNode]):
         # Validate the data against the pydantic read model
         return self.read_model.model_validate(node_instance.__properties__)
 
+    @database_call
     def read(self, uuid: str) -> TNodeRead:
         node_instance = self.node_model.nodes.get_or_none(uuid=uuid)
 
@@ -29,3 +32,23 @@ class NodeRepository(Generic[TNodeCreate, TNodeRead, TNode]):
 
         # Validate the data against the pydantic read model
         return self.read_model.model_validate(node_instance)
+
+    @database_call
+    def read_many(self, uuids: Iterable[str]) -> Dict[str, TNodeRead]:
+        """
+        Read many nodes with one lookup per statement, backed by the uuid
+        uniqueness constraint.
+
+        Args:
+            uuids: The uuids of the nodes.
+
+        Returns: The read models of the found nodes by uuid.
+
+        """
+        node_instances = self.node_model.nodes.filter(
+            uuid__in=[str(uuid) for uuid in uuids]
+        )
+        return {
+            str(node_instance.uuid): self.read_model.model_validate(node_instance)
+            for node_instance in node_instances
+        }
@@ -0,0 +1,118 @@
+from functools import lru_cache
+from neomodel.exceptions import RequiredProperty
+from typing import Dict, Generic, List, Tuple, Type, TypeVar
+
+TModel = TypeVar("TModel")  # Neomodel node or relationship class
+
+
+class PropertyTable(Generic[TModel]):
+    """
+    The property definitions of a neomodel class, collected once.
+
+    neomodel's `inflate` and `deflate` scan the class hierarchy for the property
+    definitions on every call, which dominates the client CPU of a write. The table
+    converts trusted database results and validated data with the same property
+    conversions but without the scan.
+    """
+
+    def __init__(self, model: Type[TModel]) -> None:
+        self.model = model
+        self.properties = model.defined_properties(aliases=False, rels=False)
+        self.entries: List[Tuple[str, str, object]] = [
+            (name, prop.get_db_property_name(name), prop)
+            for name, prop in self.properties.items()
+        ]
+        self.keys: Dict[str, str] = {name: key for name, key, _ in self.entries}
+
+    def inflate(self, entity) -> TModel:
+        """
+        Inflate a node or relationship returned by the database, like
+        `model.inflate`.
+
+        Args:
+            entity: The neo4j node or relationship.
+
+        Returns: The neomodel instance.
+
+        """
+        inflated = {}
+        for name, key, prop in self.entries:
+            value = entity.get(key)
+            if value is not None:
+                inflated[name] = prop.inflate(value, entity)
+            elif prop.has_default:
+                inflated[name] = prop.default_value()
+            else:
+                inflated[name] = None
+        instance = self.model(**inflated)
+        instance.element_id_property = getattr(entity, "element_id", None)
+        return instance
+
+    def inflate_fields(self, properties: dict) -> dict:
+        """
+        Inflate the properties of a map projection without building an instance.
+
+        Args:
+            properties: The properties keyed by the database property names.
+
+        Returns: The inflated values of the given properties keyed by the python
+            attribute names.
+
+        """
+        inflated = {}
+        for name, key, prop in self.entries:
+            if key in properties:
+                value = properties[key]
+                inflated[name] = None if value is None else prop.inflate(value)
+        return inflated
+
+    def deflate(self, data: dict) -> dict:
+        """
+        Deflate validated data into the database properties of a new entity, like
+        `model.deflate`. Missing properties get their default value.
+
+        Args:
+            data: The data keyed by the python attribute names.
+
+        Returns: The deflated properties keyed by the database property names.
+
+        """
+        deflated = {}
+        for name, key, prop in self.entries:
+            value = data.get(name)
+            if value is not None:
+                deflated[key] = prop.deflate(value)
+            elif prop.has_default:
+                deflated[key] = prop.deflate(prop.default_value())
+            elif prop.required:
+                raise RequiredProperty(name, self.model)
+            else:
+                deflated[key] = None
+        return deflated
+
+    def deflate_fields(self, data: dict) -> dict:
+        """
+        Deflate only the given fields of validated data. Unknown fields are ignored.
+
+        Args:
+            data: The data keyed by the python attribute names.
+
+        Returns: The deflated properties keyed by the database property names.
+
+        """
+        properties = self.properties
+        deflated = {}
+        for name, value in data.items():
+            prop = properties.get(name)
+            if prop is None:
+                continue
+            deflated[self.keys[name]] = None if value is None else prop.deflate(value)
+        return deflated
+
+
+@lru_cache(maxsize=None)
+def property_table(model: Type[TModel]) -> PropertyTable[TModel]:
+    """
+    Returns: The memoised property table of a neomodel class.
+    """
+    return PropertyTable(model)
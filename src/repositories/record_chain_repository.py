@@ -0,0 +1,1568 @@
+from datetime import datetime, timezone
+from neo4j.exceptions import TransientError
+from neomodel import db
+from random import uniform
+from src.core.database import cypher_query
+from src.models.neomodel_entities import RecordedNode, NodeRecord
+from src.repositories.property_table import property_table
+from src.types import OperationEnum, RecordStorageEnum
+from functools import partial
+from typing import (
+    Callable,
+    Dict,
+    Type,
+    TypeVar,
+    Generic,
+    Optional,
+    Tuple,
+    Iterable,
+    Iterator,
+    List,
+)
+from threading import Lock
+from time import sleep
+from uuid import uuid4
+
+TEntity = TypeVar("TEntity", bound=RecordedNode)  # Neomodel recorded node class
+TRecord = TypeVar("TRecord", bound=NodeRecord)  # Neomodel node record class
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_SNAPSHOT_INTERVAL = 50
+DEFAULT_MAX_RETRIES = 3  # Retries of a write statement after a transient error
+DEFAULT_RETRY_DELAY = 0.05  # Seconds, the upper bound of the first backoff
+
+# Properties of a record that describe the record instead of the recorded data
+RECORD_META_FIELDS = {
+    "uuid",
+    "created_at",
+    "operation",
+    "entity_uuid",
+    "version",
+    "snapshot",
+    "changed_fields",
+}
+
+# Record properties every projection reads, to identify, order and fold records
+PROJECTION_META_FIELDS = (
+    "uuid",
+    "created_at",
+    "operation",
+    "version",
+    "snapshot",
+    "changed_fields",
+)
+
+
+def _now() -> float:
+    # Same representation as neomodel's DateTimeProperty (unix epoch in UTC)
+    return datetime.now(timezone.utc).timestamp()
+
+
+class RecordChainRepository(Generic[TEntity, TRecord]):
+    """
+    Writes the record chain of a recorded node with compiled Cypher statements.
+
+    The statements are built once per repository from the labels of the node classes.
+    They take a list of rows and are sent as one parameterised statement per batch,
+    so a single change costs one round-trip and runs in one transaction.
+
+    With `RecordStorageEnum.DELTA` storage a record holds only the fields changed by
+    its operation, and every `snapshot_interval` versions a record additionally holds
+    the full state. Reads rebuild the state from the nearest snapshot and the deltas.
+    Records without the `snapshot` property are full copies and count as snapshots.
+
+    Appends lock the recorded node before reading its active record, so concurrent
+    writers of one node queue up instead of forking the chain. The node `version`
+    counts its records, an append with an expected version only writes if they
+    match. Deadlocks and other transient errors of an append are retried up to
+    `max_retries` times with exponential backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        node_model: Type[TEntity],
+        record_model: Type[TRecord],
+        storage: RecordStorageEnum = RecordStorageEnum.FULL,
+        snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+    ):
+        if snapshot_interval < 1:
+            raise ValueError("snapshot_interval must be at least 1")
+
+        self.node_model = node_model  # Neomodel recorded node class
+        self.record_model = record_model  # Neomodel node record class
+        self.storage = RecordStorageEnum(storage)
+        self.snapshot_interval = snapshot_interval
+        self.skipped_updates = 0  # Updates that changed no field and were not written
+        self.conflicts = 0  # Appends not written because of an unexpected version
+        self.retries = 0  # Write statements repeated after a transient error
+        self.max_retries = DEFAULT_MAX_RETRIES
+        self.retry_delay = DEFAULT_RETRY_DELAY
+        self._lock = Lock()
+        self.node_table = property_table(node_model)
+        self.record_table = property_table(record_model)
+        self.data_fields = [
+            name
+            for name in self.record_table.properties
+            if name not in RECORD_META_FIELDS
+        ]
+
+        self.node_label = node_model.__label__
+        self.node_labels = ":".join(node_model.inherited_labels())
+        self.record_label = record_model.__label__
+        self.record_labels = ":".join(record_model.inherited_labels())
+
+        self.create_records_query = self._compile_create_records_query()
+        self.append_records_query = self._compile_append_records_query()
+        self.backfill_chains_query = self._compile_backfill_chains_query()
+        self.materialize_targets = {
+            "version": f"""
+                MATCH (target:{self.record_label})
+                WHERE target.entity_uuid = $uuid AND target.version = $version
+            """,
+            "as_of": f"""
+                MATCH (target:{self.record_label})
+                WHERE target.entity_uuid = $uuid AND target.created_at <= $timestamp
+                WITH target
+                ORDER BY target.created_at DESC, target.version DESC
+                LIMIT 1
+            """,
+            "active": f"""
+                MATCH (:{self.node_label} {{uuid: $uuid}})
+                    -[:HAS_ACTIVE_RECORD]->(target:{self.record_label})
+            """,
+        }
+        # Compilers of the record reads by kind, called with the RETURN expression
+        self._read_compilers: Dict[tuple, Callable[[str], str]] = {
+            ("as_of",): self._compile_read_record_as_of_query,
+            ("version",): self._compile_read_record_version_query,
+            ("active",): self._compile_read_active_record_query,
+            **{
+                ("history", newest_first): partial(
+                    self._compile_read_history_page_query, newest_first
+                )
+                for newest_first in (True, False)
+            },
+            **{
+                ("materialize", kind): partial(
+                    self._compile_materialize_query, match_target
+                )
+                for kind, match_target in self.materialize_targets.items()
+            },
+        }
+        self.read_record_as_of_query = self._compile_read_record_as_of_query()
+        self.read_record_version_query = self._compile_read_record_version_query()
+        self.read_history_page_queries = {
+            newest_first: self._compile_read_history_page_query(newest_first)
+            for newest_first in (True, False)
+        }
+        self.read_active_record_query = self._compile_read_active_record_query()
+        self.write_snapshots_query = f"""
+            UNWIND $rows AS row
+            MATCH (record:{self.record_label} {{uuid: row.uuid}})
+            SET record += row.data, record.snapshot = true
+        """
+        self.materialize_queries = {
+            kind: self._compile_materialize_query(match_target)
+            for kind, match_target in self.materialize_targets.items()
+        }
+        # Projected statement -> (statement it projects, projected property keys)
+        self.projections: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+        self._projected_queries: Dict[tuple, str] = {}
+        self.snapshot_as_of_query = self._compile_snapshot_as_of_query()
+        self.retention_page_query = f"""
+            MATCH (node:{self.node_label})
+            WHERE $after IS NULL OR node.uuid > $after
+            WITH node
+            ORDER BY node.uuid
+            LIMIT $batch_size
+            MATCH (node)-[:HAS_ACTIVE_RECORD]->(active:{self.record_label})
+            MATCH (node)-[:HAS_RECORD]->(record:{self.record_label})
+            WITH node, active, record
+            ORDER BY record.version
+            RETURN node.uuid, active.uuid, collect([
+                record.uuid, record.version, record.created_at, record.snapshot,
+                record.changed_fields
+            ])
+            ORDER BY node.uuid
+        """
+        self.compact_records_query = self._compile_compact_records_query()
+        self.delete_records_query = f"""
+            UNWIND $uuids AS uuid
+            CALL {{
+                WITH uuid
+                MATCH (record:{self.record_label} {{uuid: uuid}})
+                DETACH DELETE record
+            }} IN TRANSACTIONS OF $rows_per_transaction ROWS
+        """
+
+    def _compile_create_records_query(self) -> str:
+        # Create node -> create first record -> attach HAS_RECORD and HAS_ACTIVE_RECORD
+        return f"""
+            UNWIND $rows AS row
+            CREATE (node:{self.node_labels})
+            SET node = row.node
+            CREATE (record:{self.record_labels})
+            SET record = row.record
+            CREATE (node)-[:HAS_RECORD {{
+                uuid: row.has_record_uuid, created_at: row.created_at
+            }}]->(record)
+            CREATE (node)-[:HAS_ACTIVE_RECORD {{
+                uuid: row.has_active_record_uuid, created_at: row.created_at
+            }}]->(record)
+            RETURN row.index, node, record
+        """
+
+    def _compile_append_records_query(self) -> str:
+        # Lock node -> read active record -> compare version -> diff data -> create
+        # new record -> attach HAS_RECORD -> move HAS_ACTIVE_RECORD -> link
+        # HAS_PREVIOUS_RECORD -> increment node version
+        # Updates that change no field return the active record instead, appends
+        # whose expected version differs return it as a conflict.
+        if self.storage == RecordStorageEnum.DELTA:
+            set_data = """
+                SET record = row.data
+                SET record.snapshot = false
+            """
+            # A delta record holds only its changed fields, the data is diffed
+            # against the state folded from the nearest snapshot
+            fold = f"""
+                CALL {{
+                    WITH node, version
+                    MATCH (snapshot:{self.record_label})
+                    WHERE snapshot.entity_uuid = node.uuid
+                        AND snapshot.version <= version
+                        AND coalesce(snapshot.snapshot, true)
+                    WITH node, version, snapshot
+                    ORDER BY snapshot.version DESC
+                    LIMIT 1
+                    MATCH (record:{self.record_label})
+                    WHERE record.entity_uuid = node.uuid
+                        AND record.version >= snapshot.version
+                        AND record.version <= version
+                    WITH record
+                    ORDER BY record.version
+                    RETURN collect(record) AS chain
+                }}
+            """
+        else:
+            set_data = """
+                SET record = properties(previous)
+                SET record += row.data
+            """
+            fold = "WITH row, node, active, previous, version, [previous] AS chain"
+        return f"""
+            UNWIND $rows AS row
+            MATCH (node:{self.node_label} {{uuid: row.uuid}})
+            // Concurrent appends to the node wait for its write lock and then read
+            // the active record committed by the previous append
+            SET node._lock = true
+            REMOVE node._lock
+            WITH row, node
+            MATCH (node)-[active:HAS_ACTIVE_RECORD]->(previous:{self.record_label})
+            WITH row, node, active, previous, coalesce(previous.version, 0) AS version
+            SET node.version = version
+            {fold}
+            // The value of a field is that of the last record holding it
+            WITH row, node, active, previous, version, [
+                field IN row.fields
+                | [field, last([
+                    record IN chain
+                    WHERE coalesce(record.snapshot, true)
+                        OR field.name IN record.changed_fields
+                ])[field.key]]
+            ] AS current
+            WITH row, node, active, previous, version, [
+                entry IN current
+                WHERE NOT coalesce(
+                    entry[1] = row.data[entry[0].key],
+                    entry[1] IS NULL AND row.data[entry[0].key] IS NULL
+                )
+                | entry[0].name
+            ] AS changed_fields,
+                coalesce(row.expected_version = version, true) AS expected
+            CALL {{
+                WITH row, node, active, previous, version, changed_fields, expected
+                WITH row, node, active, previous, version, changed_fields, expected
+                WHERE expected AND (
+                    row.operation <> '{OperationEnum.UPDATED.value}'
+                    OR size(changed_fields) > 0
+                )
+                CREATE (record:{self.record_labels})
+                {set_data}
+                SET record.uuid = row.record_uuid,
+                    record.created_at = row.created_at,
+                    record.operation = row.operation,
+                    record.changed_fields = changed_fields,
+                    record.entity_uuid = node.uuid,
+                    record.version = version + 1
+                SET node.version = version + 1
+                DELETE active
+                CREATE (node)-[:HAS_RECORD {{
+                    uuid: row.has_record_uuid, created_at: row.created_at
+                }}]->(record)
+                CREATE (node)-[:HAS_ACTIVE_RECORD {{
+                    uuid: row.has_active_record_uuid, created_at: row.created_at
+                }}]->(record)
+                CREATE (record)-[:HAS_PREVIOUS_RECORD {{
+                    uuid: row.has_previous_record_uuid, created_at: row.created_at
+                }}]->(previous)
+                RETURN record, true AS written, false AS conflict
+                UNION
+                WITH row, previous, changed_fields, expected
+                WITH row, previous, changed_fields, expected
+                WHERE expected
+                    AND row.operation = '{OperationEnum.UPDATED.value}'
+                    AND size(changed_fields) = 0
+                RETURN previous AS record, false AS written, false AS conflict
+                UNION
+                WITH previous, expected
+                WITH previous, expected
+                WHERE NOT expected
+                RETURN previous AS record, false AS written, true AS conflict
+            }}
+            RETURN row.index, node, record, written, conflict
+        """
+
+    def _compile_backfill_chains_query(self) -> str:
+        # Skip existing node -> create node -> create records with HAS_RECORD
+        # -> link HAS_PREVIOUS_RECORD -> attach HAS_ACTIVE_RECORD to the last record
+        # Nodes that exist are skipped, so a committed batch can be repeated.
+        return f"""
+            UNWIND $rows AS row
+            OPTIONAL MATCH (existing:{self.node_label} {{uuid: row.node.uuid}})
+            WITH row, existing
+            WHERE existing IS NULL
+            CREATE (node:{self.node_labels})
+            SET node = row.node
+            WITH row, node
+            CALL {{
+                WITH row, node
+                UNWIND row.records AS entry
+                CREATE (record:{self.record_labels})
+                SET record = entry.record
+                CREATE (node)-[:HAS_RECORD {{
+                    uuid: entry.has_record_uuid, created_at: entry.record.created_at
+                }}]->(record)
+                RETURN count(record) AS records
+            }}
+            CALL {{
+                WITH row
+                UNWIND row.previous AS link
+                MATCH (record:{self.record_label} {{uuid: link.record_uuid}})
+                MATCH (previous:{self.record_label} {{uuid: link.previous_uuid}})
+                CREATE (record)-[:HAS_PREVIOUS_RECORD {{
+                    uuid: link.uuid, created_at: link.created_at
+                }}]->(previous)
+                RETURN count(previous) AS links
+            }}
+            MATCH (active:{self.record_label} {{uuid: row.active.record_uuid}})
+            CREATE (node)-[:HAS_ACTIVE_RECORD {{
+                uuid: row.active.uuid, created_at: row.active.created_at
+            }}]->(active)
+            RETURN collect(node.uuid)
+        """
+
+    def _compile_compact_records_query(self) -> str:
+        # Merge the removed records into the record that follows them
+        # -> link it to the previous kept record
+        return f"""
+            UNWIND $rows AS row
+            CALL {{
+                WITH row
+                MATCH (record:{self.record_label} {{uuid: row.uuid}})
+                SET record += row.data
+                SET record.changed_fields = row.changed_fields,
+                    record.snapshot = row.snapshot
+                WITH row, record
+                OPTIONAL MATCH (record)-[old:HAS_PREVIOUS_RECORD]->()
+                DELETE old
+                WITH DISTINCT row, record
+                OPTIONAL MATCH (previous:{self.record_label} {{uuid: row.previous_uuid}})
+                FOREACH (
+                    _ IN CASE WHEN previous IS NULL THEN [] ELSE [1] END |
+                    CREATE (record)-[:HAS_PREVIOUS_RECORD {{
+                        uuid: row.link_uuid, created_at: row.created_at
+                    }}]->(previous)
+                )
+            }} IN TRANSACTIONS OF $rows_per_transaction ROWS
+        """
+
+    def _compile_read_record_as_of_query(self, returns: str = "record") -> str:
+        # Backed by the (entity_uuid, created_at) timeline index
+        return f"""
+            MATCH (record:{self.record_label})
+            WHERE record.entity_uuid = $uuid AND record.created_at <= $timestamp
+            RETURN {returns}
+            ORDER BY record.created_at DESC, record.version DESC
+            LIMIT 1
+        """
+
+    def _compile_read_record_version_query(self, returns: str = "record") -> str:
+        # Backed by the (entity_uuid, version) timeline index
+        return f"""
+            MATCH (record:{self.record_label})
+            WHERE record.entity_uuid = $uuid AND record.version = $version
+            RETURN {returns}
+        """
+
+    def _compile_read_history_page_query(
+        self, newest_first: bool, returns: str = "record"
+    ) -> str:
+        # Keyset pagination over (created_at, uuid) of the record timeline. The
+        # bounds are always given, open ones as infinite sentinels, so that they
+        # and the cursor are a range seek on the (entity_uuid, created_at) index and
+        # only the records of the page are read. The uuid breaks ties of the cursor.
+        comparator, direction = ("<", "DESC") if newest_first else (">", "ASC")
+        return f"""
+            MATCH (record:{self.record_label})
+            WHERE record.entity_uuid = $uuid
+                AND record.created_at >= $since
+                AND record.created_at <= $until
+                AND record.created_at {comparator}= $after_created_at
+                AND (
+                    record.created_at {comparator} $after_created_at
+                    OR record.uuid {comparator} $after_uuid
+                )
+                AND ($changed_field IS NULL OR $changed_field IN record.changed_fields)
+            RETURN {returns}
+            ORDER BY record.created_at {direction}, record.uuid {direction}
+            LIMIT $page_size
+        """
+
+    def _compile_read_active_record_query(self, returns: str = "record") -> str:
+        return f"""
+            MATCH (:{self.node_label} {{uuid: $uuid}})
+                -[:HAS_ACTIVE_RECORD]->(record:{self.record_label})
+            RETURN {returns}
+        """
+
+    def _compile_materialize_query(
+        self, match_target: str, returns: str = "record"
+    ) -> str:
+        # Target record -> nearest snapshot at or before it -> records up to the target
+        return f"""
+            {match_target}
+            MATCH (snapshot:{self.record_label})
+            WHERE snapshot.entity_uuid = target.entity_uuid
+                AND snapshot.version <= coalesce($from_version, target.version)
+                AND coalesce(snapshot.snapshot, true)
+            WITH target, snapshot
+            ORDER BY snapshot.version DESC
+            LIMIT 1
+            MATCH (record:{self.record_label})
+            WHERE record.entity_uuid = target.entity_uuid
+                AND record.version >= snapshot.version
+                AND record.version <= target.version
+            RETURN {returns}
+            ORDER BY record.version
+        """
+
+    def _compile_snapshot_as_of_query(self) -> str:
+        # Page of nodes -> record active at $timestamp per node, via the
+        # (entity_uuid, created_at) timeline index. Delta storage also returns the
+        # records from the nearest snapshot on, full storage filters on the server
+        if self.storage == RecordStorageEnum.DELTA:
+            records = f"""
+                MATCH (snapshot:{self.record_label})
+                WHERE snapshot.entity_uuid = target.entity_uuid
+                    AND snapshot.version <= target.version
+                    AND coalesce(snapshot.snapshot, true)
+                WITH target, snapshot
+                ORDER BY snapshot.version DESC
+                LIMIT 1
+                MATCH (record:{self.record_label})
+                WHERE record.entity_uuid = target.entity_uuid
+                    AND record.version >= snapshot.version
+                    AND record.version <= target.version
+                WITH record
+                ORDER BY record.version
+            """
+        else:
+            records = """
+                WITH target AS record
+                WHERE all(key IN keys($filter) WHERE record[key] = $filter[key])
+            """
+        return f"""
+            MATCH (node:{self.node_label})
+            WHERE $after IS NULL OR node.uuid > $after
+            WITH node
+            ORDER BY node.uuid
+            LIMIT $page_size
+            CALL {{
+                WITH node
+                MATCH (target:{self.record_label})
+                WHERE target.entity_uuid = node.uuid
+                    AND target.created_at <= $timestamp
+                WITH target
+                ORDER BY target.created_at DESC, target.version DESC
+                LIMIT 1
+                WITH target
+                WHERE $include_deleted OR target.operation <> $deleted
+                {records}
+                // One row per node, empty if it had no matching record
+                RETURN collect(record) AS records
+            }}
+            RETURN node.uuid, records
+            ORDER BY node.uuid
+        """
+
+    def run(self, query: str, params: Optional[dict] = None):
+        """
+        Run one of the compiled statements of the repository as one round-trip.
+
+        Args:
+            query: The statement.
+            params: The statement parameters.
+
+        Returns: A tuple of result rows and column names.
+
+        """
+        return cypher_query(query, params)
+
+    def run_write(self, query: str, params: Optional[dict] = None):
+        """
+        Run a write statement like `run` and repeat it after transient errors, such
+        as deadlocks between concurrent writers. Inside an explicit transaction the
+        error is raised, because only the whole transaction can be repeated.
+
+        Args:
+            query: The statement.
+            params: The statement parameters.
+
+        Returns: A tuple of result rows and column names.
+
+        """
+        attempt = 0
+        while True:
+            try:
+                return self.run(query, params)
+            except TransientError:
+                if attempt >= self.max_retries or db._active_transaction is not None:
+                    raise
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+            sleep(uniform(0, self.retry_delay * 2 ** (attempt - 1)))
+
+    @property
+    def timeline_indexes(self) -> dict:
+        """The composite range indexes of the record timeline by index name."""
+        return {
+            f"{self.record_label}_timeline_{prop}": ("entity_uuid", prop)
+            for prop in ("version", "created_at")
+        }
+
+    def install_timeline_indexes(self) -> None:
+        """
+        Create the composite indexes of the record timeline if they do not exist.
+        """
+        for name, properties in self.timeline_indexes.items():
+            cypher_query(
+                f"""
+                CREATE RANGE INDEX {name} IF NOT EXISTS
+                FOR (record:{self.record_label})
+                ON ({", ".join(f"record.{prop}" for prop in properties)})
+                """
+            )
+
+    def backfill_timeline(self, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Number the records of recorded nodes written before the record timeline existed.
+
+        Versions follow the creation order of the records. Nodes are numbered in
+        pages in uuid order, one transaction per page.
+
+        Args:
+            batch_size: The number of nodes numbered per round-trip.
+
+        Returns: The number of numbered records.
+
+        """
+        numbered = 0
+        after = None
+        while True:
+            results, _ = cypher_query(
+                f"""
+                MATCH (node:{self.node_label})
+                WHERE $after IS NULL OR node.uuid > $after
+                WITH node
+                ORDER BY node.uuid
+                LIMIT $batch_size
+                WITH collect(node) AS nodes
+                CALL {{
+                    WITH nodes
+                    UNWIND nodes AS node
+                    MATCH (node)-[:HAS_RECORD]->(record:{self.record_label})
+                    WITH node, record
+                    ORDER BY record.created_at
+                    WITH node, collect(record) AS records
+                    WHERE any(record IN records WHERE record.version IS NULL)
+                    UNWIND range(0, size(records) - 1) AS i
+                    WITH node, records[i] AS record, i
+                    SET record.entity_uuid = node.uuid, record.version = i + 1
+                    RETURN count(record) AS numbered
+                }}
+                RETURN last(nodes).uuid, numbered
+                """,
+                {"after": after, "batch_size": batch_size},
+            )
+            after, page = results[0]
+            if after is None:
+                return numbered
+            numbered += page
+
+    def deflate_record_data(self, data: dict) -> dict:
+        """
+        Convert record data into database properties of the record class.
+
+        Args:
+            data: The record data keyed by the python attribute names.
+
+        Returns: The deflated properties keyed by the database property names.
+
+        """
+        return self.record_table.deflate_fields(data)
+
+    def _fields(self, data: dict) -> List[dict]:
+        # Attribute and database property names of the recorded fields in data
+        keys = self.record_table.keys
+        return [{"name": name, "key": keys[name]} for name in data if name in keys]
+
+    def _snapshot_properties(self) -> dict:
+        if self.storage == RecordStorageEnum.DELTA:
+            return {"snapshot": True}
+        return {}
+
+    def fold_records(self, records: list) -> List[TRecord]:
+        """
+        Rebuild the state of each record from a snapshot and the following deltas.
+
+        Args:
+            records: Records of one node ordered by version, starting with a snapshot.
+
+        Returns: The records with the full state of their version.
+
+        """
+        states = []
+        data = {}
+        for record in records:
+            instance = self.record_table.inflate(record)
+            if instance.snapshot is False:
+                for name in instance.changed_fields or []:
+                    data[name] = getattr(instance, name)
+            else:
+                data = {name: getattr(instance, name) for name in self.data_fields}
+            for name, value in data.items():
+                setattr(instance, name, value)
+            states.append(instance)
+        return states
+
+    def _materialize(self, kind: str, params: dict) -> List[TRecord]:
+        results, _ = self.run(
+            self.materialize_queries[kind], {"from_version": None} | params
+        )
+        return self.fold_records([record for record, in results])
+
+    def as_of_params(self, uuid: str, timestamp: datetime) -> dict:
+        return {
+            "uuid": str(uuid),
+            "timestamp": self.record_model.created_at.deflate(timestamp),
+        }
+
+    def snapshot_row(self, record: TRecord, state: TRecord) -> dict:
+        """
+        Complete a delta record with its rebuilt state.
+
+        Args:
+            record: The delta record, updated in place.
+            state: The rebuilt state of the record.
+
+        Returns: The row of the statement that stores the state on the record.
+
+        """
+        data = {name: getattr(state, name) for name in self.data_fields}
+        for name, value in data.items():
+            setattr(record, name, value)
+        record.snapshot = True
+        return {"uuid": record.uuid, "data": self.deflate_record_data(data)}
+
+    def _write_snapshots(self, records: List[TRecord]) -> None:
+        # Turn delta records into snapshots by storing the rebuilt state on them
+        rows = []
+        for record in records:
+            state = self._materialize(
+                "version", {"uuid": record.entity_uuid, "version": record.version}
+            )[-1]
+            rows.append(self.snapshot_row(record, state))
+        self.run(self.write_snapshots_query, {"rows": rows})
+
+    def inflate_results(self, results: list) -> List[Tuple[int, TEntity, TRecord]]:
+        """
+        Inflate the rows returned by the create statement.
+
+        Args:
+            results: The result rows.
+
+        Returns: Triples of the item index, the node and the record.
+
+        """
+        return [
+            (index, self.node_table.inflate(node), self.record_table.inflate(record))
+            for index, node, record in results
+        ]
+
+    def inflate_append_results(
+        self, results: list
+    ) -> Tuple[List[Tuple[int, TEntity, Optional[TRecord]]], List[TRecord]]:
+        """
+        Inflate the rows returned by the append statement and count skipped updates
+        and conflicts.
+
+        Args:
+            results: The result rows.
+
+        Returns: Triples of the item index, the node and the record, or None as the
+            record of a conflict, and the written delta records that are due to
+            become snapshots.
+
+        """
+        appended = []
+        written_records = []
+        conflicts = 0
+        for index, node, record, written, conflict in results:
+            node_instance = self.node_table.inflate(node)
+            record_instance = None
+            if conflict:
+                conflicts += 1
+            else:
+                record_instance = self.record_table.inflate(record)
+            appended.append((index, node_instance, record_instance))
+            if written:
+                written_records.append(record_instance)
+
+        with self._lock:
+            self.skipped_updates += len(appended) - len(written_records) - conflicts
+            self.conflicts += conflicts
+
+        due = []
+        if self.storage == RecordStorageEnum.DELTA:
+            due = [
+                record
+                for record in written_records
+                if record.version % self.snapshot_interval == 0
+            ]
+        return appended, due
+
+    def create_row(self, index: int, data: dict) -> dict:
+        """
+        Build the row of the create statement for one node.
+
+        Args:
+            index: The item index returned with the result.
+            data: The validated node data.
+
+        Returns: The statement row.
+
+        """
+        created_at = _now()
+        node = self.node_table.deflate(data) | {"version": 1}
+        return {
+            "index": index,
+            "created_at": created_at,
+            "node": node,
+            "record": self.deflate_record_data(data)
+            | {
+                "uuid": str(uuid4()),
+                "created_at": created_at,
+                "operation": OperationEnum.CREATED.value,
+                "entity_uuid": node["uuid"],
+                "version": 1,
+                "changed_fields": [
+                    name
+                    for name, value in data.items()
+                    if name in self.data_fields and value is not None
+                ],
+            }
+            | self._snapshot_properties(),
+            "has_record_uuid": str(uuid4()),
+            "has_active_record_uuid": str(uuid4()),
+        }
+
+    def append_row(
+        self,
+        index: int,
+        uuid: str,
+        data: dict,
+        operation: OperationEnum,
+        expected_version: Optional[int] = None,
+    ) -> dict:
+        """
+        Build the row of the append statement for one change.
+
+        Args:
+            index: The item index returned with the result.
+            uuid: The uuid of the recorded node.
+            data: The changed record data.
+            operation: The operation of the new record.
+            expected_version: Only append if the node is at this version.
+
+        Returns: The statement row.
+
+        """
+        return {
+            "index": index,
+            "uuid": str(uuid),
+            "expected_version": expected_version,
+            "data": self.deflate_record_data(data),
+            "fields": self._fields(data),
+            "operation": OperationEnum(operation).value,
+            "created_at": _now(),
+            "record_uuid": str(uuid4()),
+            "has_record_uuid": str(uuid4()),
+            "has_active_record_uuid": str(uuid4()),
+            "has_previous_record_uuid": str(uuid4()),
+        }
+
+    def chain_row(
+        self, uuid: str, changes: Iterable[Tuple[float, dict, OperationEnum]]
+    ) -> dict:
+        """
+        Build the row of the backfill statement for the whole history of one node.
+
+        The records are those that creating the node and appending the other
+        changes one by one would write: unchanged updates are skipped, delta records
+        hold the changed fields and every `snapshot_interval` versions the state.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            changes: Triples of the creation time as unix epoch, the validated data
+                and the operation, in version order. The first change creates the
+                node.
+
+        Returns: The statement row.
+
+        """
+        records = []
+        state = {}  # Deflated data of the active record
+        for created_at, data, operation in changes:
+            operation = OperationEnum(operation)
+            deflated = self.deflate_record_data(data)
+            if not records:
+                changed_fields = [
+                    name
+                    for name, value in data.items()
+                    if name in self.data_fields and value is not None
+                ]
+                properties = deflated | self._snapshot_properties()
+            else:
+                changed_fields = [
+                    field["name"]
+                    for field in self._fields(data)
+                    if state.get(field["key"]) != deflated.get(field["key"])
+                ]
+                if operation == OperationEnum.UPDATED and not changed_fields:
+                    continue
+                if self.storage == RecordStorageEnum.DELTA:
+                    properties = deflated | {"snapshot": False}
+                else:
+                    properties = records[-1] | deflated
+            state.update(deflated)
+
+            version = len(records) + 1
+            if (
+                self.storage == RecordStorageEnum.DELTA
+                and version % self.snapshot_interval == 0
+            ):
+                # Like `snapshot_row`, the record also stores the state
+                keys = self.record_table.keys
+                properties |= {
+                    keys[name]: state.get(keys[name]) for name in self.data_fields
+                } | {"snapshot": True}
+            records.append(
+                properties
+                | {
+                    "uuid": str(uuid4()),
+                    "created_at": created_at,
+                    "operation": operation.value,
+                    "changed_fields": changed_fields,
+                    "entity_uuid": str(uuid),
+                    "version": version,
+                }
+            )
+
+        node = self.node_table.deflate({}) | {
+            "uuid": str(uuid),
+            "created_at": records[0]["created_at"],
+            "version": len(records),
+        }
+        return {
+            "node": node,
+            "records": [
+                {"record": record, "has_record_uuid": str(uuid4())}
+                for record in records
+            ],
+            "previous": [
+                {
+                    "record_uuid": record["uuid"],
+                    "previous_uuid": previous["uuid"],
+                    "uuid": str(uuid4()),
+                    "created_at": record["created_at"],
+                }
+                for previous, record in zip(records, records[1:])
+            ],
+            "active": {
+                "record_uuid": records[-1]["uuid"],
+                "uuid": str(uuid4()),
+                "created_at": records[-1]["created_at"],
+            },
+        }
+
+    def create_batches(
+        self, items: Iterable[Tuple[int, dict]], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> Iterator[List[dict]]:
+        """
+        Split create items into rows of create statements.
+
+        Args:
+            items: Pairs of an item index and the validated node data.
+            batch_size: The maximum number of rows per statement.
+
+        Returns: The rows of each statement.
+
+        """
+        rows = []
+        for index, data in items:
+            rows.append(self.create_row(index, data))
+            if len(rows) >= batch_size:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+    def append_batches(
+        self,
+        items: Iterable[Tuple[int, str, dict, OperationEnum]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[List[dict]]:
+        """
+        Split append items into rows of append statements.
+
+        A uuid occurs at most once per statement, so repeated changes of the same node
+        are chained in order instead of forking from the same active record.
+
+        Args:
+            items: Quadruples of an item index, the node uuid, the changed record data
+                and the operation, optionally followed by the expected version.
+            batch_size: The maximum number of rows per statement.
+
+        Returns: The rows of each statement.
+
+        """
+        rows = []
+        uuids = set()
+        for index, uuid, data, operation, *expected_version in items:
+            uuid = str(uuid)
+            if len(rows) >= batch_size or uuid in uuids:
+                yield rows
+                rows = []
+                uuids = set()
+            uuids.add(uuid)
+            rows.append(
+                self.append_row(index, uuid, data, operation, *expected_version)
+            )
+        if rows:
+            yield rows
+
+    def create_records(
+        self, items: Iterable[Tuple[int, dict]], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> Iterator[Tuple[int, TEntity, TRecord]]:
+        """
+        Create recorded nodes together with their first record in UNWIND batches.
+
+        Args:
+            items: Pairs of an item index and the validated node data.
+            batch_size: The maximum number of nodes per statement.
+
+        Returns: Triples of the item index, the created node and its record.
+
+        """
+        for rows in self.create_batches(items, batch_size):
+            results, _ = self.run(self.create_records_query, {"rows": rows})
+            yield from self.inflate_results(results)
+
+    def create_record(self, data: dict) -> Tuple[TEntity, TRecord]:
+        """
+        Create a recorded node together with its first record in one round-trip.
+
+        Args:
+            data: The validated node data.
+
+        Returns: The created node and its record.
+
+        """
+        for _, node, record in self.create_records([(0, data)]):
+            return node, record
+
+    def append_records(
+        self,
+        items: Iterable[Tuple[int, str, dict, OperationEnum]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[Tuple[int, TEntity, TRecord]]:
+        """
+        Append records to the record chains of recorded nodes in UNWIND batches.
+
+        A uuid occurs at most once per statement, so repeated changes of the same node
+        are chained in order instead of forking from the same active record. Updates
+        that change no field of the active record are skipped and counted in
+        `skipped_updates`, their items are returned with the active record. Items
+        whose expected version differs from the node version are not written and
+        counted in `conflicts`.
+
+        Args:
+            items: Quadruples of an item index, the node uuid, the changed record data
+                and the operation, optionally followed by the expected version.
+            batch_size: The maximum number of records per statement.
+
+        Returns: Triples of the item index, the node and the new record, or None as
+            the record of a conflict. Items of unknown nodes are left out.
+
+        """
+        for rows in self.append_batches(items, batch_size):
+            results, _ = self.run_write(self.append_records_query, {"rows": rows})
+            appended, due = self.inflate_append_results(results)
+            if due:
+                self._write_snapshots(due)
+            yield from appended
+
+    def append_record(
+        self,
+        uuid: str,
+        data: dict,
+        operation: OperationEnum,
+        expected_version: Optional[int] = None,
+    ) -> Optional[Tuple[TEntity, Optional[TRecord]]]:
+        """
+        Append a record to the record chain of a recorded node in one round-trip.
+
+        The new record is a copy of the active record merged with the given data, or
+        with delta storage only the given data. An update that changes no field of
+        the active record is not written and returns the active record.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            data: The changed record data.
+            operation: The operation stored on the new record.
+            expected_version: Only append if the node is at this version.
+
+        Returns: The recorded node and the new record, or None as the record if the
+            node is at another version. None if the node does not exist.
+
+        """
+        items = [(0, uuid, data, operation, expected_version)]
+        for _, node, record in self.append_records(items):
+            return node, record
+        return None
+
+    @staticmethod
+    def last(records: List[TRecord]) -> Optional[TRecord]:
+        return records[-1] if records else None
+
+    def _read_record(self, query: str, params: dict) -> Optional[TRecord]:
+        results, _ = self.run(query, params)
+        if not results:
+            return None
+        return self.record_table.inflate(results[0][0])
+
+    def read_record_as_of(self, uuid: str, timestamp: datetime) -> Optional[TRecord]:
+        """
+        Read the record that was active at a point in time with one indexed lookup.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            timestamp: The point in time.
+
+        Returns: The record or None if the node had no record at that time.
+
+        """
+        params = self.as_of_params(uuid, timestamp)
+        if self.storage == RecordStorageEnum.DELTA:
+            return self.last(self._materialize("as_of", params))
+        return self._read_record(self.read_record_as_of_query, params)
+
+    def read_record_version(self, uuid: str, version: int) -> Optional[TRecord]:
+        """
+        Read a record by its version number with one indexed lookup.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            version: The version number of the record.
+
+        Returns: The record or None if the version does not exist.
+
+        """
+        params = {"uuid": str(uuid), "version": version}
+        if self.storage == RecordStorageEnum.DELTA:
+            return self.last(self._materialize("version", params))
+        return self._read_record(self.read_record_version_query, params)
+
+    def read_active_record(self, uuid: str) -> Optional[TRecord]:
+        """
+        Read the active record of a recorded node.
+
+        Args:
+            uuid: The uuid of the recorded node.
+
+        Returns: The active record or None if the node does not exist.
+
+        """
+        params = {"uuid": str(uuid)}
+        if self.storage == RecordStorageEnum.DELTA:
+            return self.last(self._materialize("active", params))
+        return self._read_record(self.read_active_record_query, params)
+
+    def read_history_page(
+        self,
+        uuid: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+        page_size: int = DEFAULT_BATCH_SIZE,
+        newest_first: bool = True,
+        changed_field: Optional[str] = None,
+    ) -> List[TRecord]:
+        """
+        Read one page of the record timeline of a recorded node.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            since: Only records created at or after this point in time.
+            until: Only records created at or before this point in time.
+            after: The (created_at, uuid) key of the last record of the previous page.
+            page_size: The maximum number of records of the page.
+            newest_first: Whether the timeline is read from the newest record on.
+            changed_field: Only records whose operation changed this field.
+
+        Returns: The records of the page in timeline order.
+
+        """
+        results, _ = self.run(
+            self.read_history_page_queries[newest_first],
+            self.history_page_params(
+                uuid, since, until, after, page_size, changed_field, newest_first
+            ),
+        )
+        page = [self.record_table.inflate(record) for record, in results]
+        if self.storage == RecordStorageEnum.DELTA and page:
+            states = self._materialize("version", self.page_state_params(uuid, page))
+            page = self.page_states(page, states)
+        return page
+
+    def history_page_params(
+        self,
+        uuid: str,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        after: Optional[Tuple[datetime, str]],
+        page_size: int,
+        changed_field: Optional[str],
+        newest_first: bool = True,
+    ) -> dict:
+        created_at = self.record_model.created_at
+        # The first page starts after the newest or before the oldest record
+        after_created_at, after_uuid = float("inf" if newest_first else "-inf"), ""
+        if after is not None:
+            after_created_at, after_uuid = created_at.deflate(after[0]), str(after[1])
+        return {
+            "uuid": str(uuid),
+            "since": float("-inf") if since is None else created_at.deflate(since),
+            "until": float("inf") if until is None else created_at.deflate(until),
+            "after_created_at": after_created_at,
+            "after_uuid": after_uuid,
+            "page_size": page_size,
+            "changed_field": changed_field,
+        }
+
+    @staticmethod
+    def page_state_params(uuid: str, page: List[TRecord]) -> dict:
+        # Rebuild the version range of a history page in one statement
+        versions = [record.version for record in page]
+        return {
+            "uuid": str(uuid),
+            "version": max(versions),
+            "from_version": min(versions),
+        }
+
+    @staticmethod
+    def page_states(page: List[TRecord], states: List[TRecord]) -> List[TRecord]:
+        by_version = {state.version: state for state in states}
+        return [by_version[record.version] for record in page]
+
+    def record_states(self, records: List[TRecord]) -> List[TRecord]:
+        """
+        Rebuild the state of records of any recorded nodes, with one statement per
+        node whose records hold only their changes.
+
+        Args:
+            records: The records.
+
+        Returns: The records with the full state of their version, in the same order.
+
+        """
+        if self.storage != RecordStorageEnum.DELTA:
+            return records
+        pages: Dict[str, List[TRecord]] = {}
+        for record in records:
+            if not record.snapshot:
+                pages.setdefault(record.entity_uuid, []).append(record)
+        states = {}
+        for uuid, page in pages.items():
+            for state in self._materialize(
+                "version", self.page_state_params(uuid, page)
+            ):
+                states[uuid, state.version] = state
+        return [
+            states.get((record.entity_uuid, record.version), record)
+            for record in records
+        ]
+
+    def projection_keys(self, fields: Iterable[str]) -> Tuple[str, ...]:
+        """
+        Args:
+            fields: The projected data fields.
+
+        Returns: The database property names read by a projection of the fields.
+
+        """
+        unknown = set(fields) - set(self.data_fields)
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)} in projection")
+        names = dict.fromkeys((*PROJECTION_META_FIELDS, *fields))
+        return tuple(self.record_table.keys[name] for name in names)
+
+    def projected_query(self, kind: tuple, keys: Tuple[str, ...]) -> str:
+        """
+        Compile a record read that returns a map projection of the record instead of
+        the record, so only the projected properties are sent.
+
+        Args:
+            kind: The kind of read, a key of `_read_compilers`.
+            keys: The projected database property names.
+
+        Returns: The statement.
+
+        """
+        query = self._projected_queries.get((kind, keys))
+        if query is None:
+            compiler = self._read_compilers[kind]
+            properties = ", ".join(f".`{key}`" for key in keys)
+            query = compiler(f"record {{{properties}}} AS record")
+            with self._lock:
+                self.projections[query] = (compiler(), keys)
+                self._projected_queries[(kind, keys)] = query
+        return query
+
+    def fold_projections(self, rows: List[dict], fields: Iterable[str]) -> List[dict]:
+        """
+        Rebuild the projected state of each record like `fold_records`, without
+        inflating records.
+
+        Args:
+            rows: Projected records of one node ordered by version, starting with a
+                snapshot.
+            fields: The projected data fields.
+
+        Returns: The inflated values of each record with the projected state of its
+            version.
+
+        """
+        states = []
+        data = {}
+        for row in rows:
+            values = self.record_table.inflate_fields(row)
+            if values.get("snapshot") is False:
+                for name in values.get("changed_fields") or []:
+                    if name in fields:
+                        data[name] = values.get(name)
+            else:
+                data = {name: values.get(name) for name in fields}
+            states.append(values | data)
+        return states
+
+    def read_projection(
+        self, kind: str, params: dict, fields: Tuple[str, ...]
+    ) -> Optional[dict]:
+        """
+        Read the projected state of one record.
+
+        Args:
+            kind: "active", "version" or "as_of".
+            params: The parameters of the read.
+            fields: The projected data fields.
+
+        Returns: The inflated values of the projected record or None if there is no
+            such record.
+
+        """
+        keys = self.projection_keys(fields)
+        if self.storage == RecordStorageEnum.DELTA:
+            results, _ = self.run(
+                self.projected_query(("materialize", kind), keys),
+                {"from_version": None} | params,
+            )
+            return self.last(self.fold_projections([row for row, in results], fields))
+        results, _ = self.run(self.projected_query((kind,), keys), params)
+        if not results:
+            return None
+        return self.record_table.inflate_fields(results[0][0])
+
+    def read_history_projection(
+        self,
+        uuid: str,
+        fields: Tuple[str, ...],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+        page_size: int = DEFAULT_BATCH_SIZE,
+        newest_first: bool = True,
+        changed_field: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        Read one page of the record timeline of a recorded node like
+        `read_history_page`, with only the projected fields.
+
+        Returns: The inflated values of the projected records in timeline order.
+
+        """
+        keys = self.projection_keys(fields)
+        results, _ = self.run(
+            self.projected_query(("history", newest_first), keys),
+            self.history_page_params(
+                uuid, since, until, after, page_size, changed_field, newest_first
+            ),
+        )
+        page = [self.record_table.inflate_fields(row) for row, in results]
+        if self.storage == RecordStorageEnum.DELTA and page:
+            versions = [values["version"] for values in page]
+            results, _ = self.run(
+                self.projected_query(("materialize", "version"), keys),
+                {
+                    "uuid": str(uuid),
+                    "version": max(versions),
+                    "from_version": min(versions),
+                },
+            )
+            states = self.fold_projections([row for row, in results], fields)
+            by_version = {state["version"]: state for state in states}
+            page = [by_version[version] for version in versions]
+        return page
+
+    def snapshot_page(
+        self,
+        timestamp: datetime,
+        after: Optional[str] = None,
+        page_size: int = DEFAULT_BATCH_SIZE,
+        filter: Optional[dict] = None,
+        include_deleted: bool = False,
+    ) -> List[Tuple[str, Optional[TRecord]]]:
+        """
+        Rebuild the state of a page of recorded nodes at a point in time with one
+        statement.
+
+        Args:
+            timestamp: The point in time.
+            after: The uuid of the last node of the previous page or None.
+            page_size: The maximum number of nodes of the page.
+            filter: Only states whose data fields equal these values.
+            include_deleted: Whether to include nodes deleted at that time.
+
+        Returns: Per node in uuid order the node uuid and the record with its state
+            at that time, or None if it had no matching state.
+
+        """
+        filter = filter or {}
+        unknown = set(filter) - set(self.data_fields)
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)} in snapshot filter")
+        deflated = self.deflate_record_data(filter)
+        delta = self.storage == RecordStorageEnum.DELTA
+        results, _ = self.run(
+            self.snapshot_as_of_query,
+            {
+                "timestamp": self.record_model.created_at.deflate(timestamp),
+                "after": after,
+                "page_size": page_size,
+                # Delta records hold only their changes, filter the rebuilt states
+                "filter": {} if delta else deflated,
+                "include_deleted": include_deleted,
+                "deleted": OperationEnum.DELETED.value,
+            },
+        )
+        page = []
+        for uuid, records in results:
+            state = None
+            if records and delta:
+                state = self.fold_records(records)[-1]
+                data = {name: getattr(state, name) for name in filter}
+                if self.deflate_record_data(data) != deflated:
+                    state = None
+            elif records:
+                state = self.record_table.inflate(records[0])
+            page.append((uuid, state))
+        return page
+
+    def retention_page(
+        self, after: Optional[str], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[Tuple[str, str, List[list]]]:
+        """
+        Read the record timelines of a page of recorded nodes for retention.
+
+        Args:
+            after: The uuid of the last node of the previous page or None.
+            batch_size: The maximum number of nodes of the page.
+
+        Returns: Per node in uuid order the node uuid, the uuid of the active record
+            and the records ordered by version as [uuid, version, created_at,
+            snapshot, changed_fields].
+
+        """
+        results, _ = self.run(
+            self.retention_page_query, {"after": after, "batch_size": batch_size}
+        )
+        return [tuple(row) for row in results]
+
+    def compact_records(
+        self, rows: List[dict], rows_per_transaction: int = DEFAULT_BATCH_SIZE
+    ) -> None:
+        """
+        Merge removed records into the kept records that follow them, in batches of
+        transactions.
+
+        Args:
+            rows: Per kept record its `uuid`, the merged `data`, `changed_fields`
+                and `snapshot` and the `previous_uuid` of the previous kept record,
+                with `link_uuid` and `created_at` of the new link.
+            rows_per_transaction: The number of rows committed per transaction.
+
+        """
+        self.run(
+            self.compact_records_query,
+            {"rows": rows, "rows_per_transaction": rows_per_transaction},
+        )
+
+    def delete_records(
+        self, uuids: List[str], rows_per_transaction: int = DEFAULT_BATCH_SIZE
+    ) -> None:
+        """
+        Delete records and their relationships in batches of transactions.
+
+        Args:
+            uuids: The uuids of the records.
+            rows_per_transaction: The number of records deleted per transaction.
+
+        """
+        self.run(
+            self.delete_records_query,
+            {"uuids": uuids, "rows_per_transaction": rows_per_transaction},
+        )
+
+    def delta_properties(self, records: List[dict]) -> List[dict]:
+        """
+        Convert the full-copy records of one node into delta records.
+
+        Args:
+            records: The record properties of the node ordered by version.
+
+        Returns: The properties of the delta records, in the same order.
+
+        """
+        names = {key: name for name, key in self.record_table.keys.items()}
+        converted = []
+        previous = {}
+        for properties in records:
+            properties = dict(properties)
+            data = {
+                key: value
+                for key, value in properties.items()
+                if names.get(key) not in RECORD_META_FIELDS
+            }
+            if (
+                properties["version"] == 1
+                or properties["version"] % self.snapshot_interval == 0
+            ):
+                properties["snapshot"] = True
+            else:
+                changed = {key for key in data if previous.get(key) != data[key]} | {
+                    key for key in previous if key not in data
+                }
+                properties = {
+                    key: value
+                    for key, value in properties.items()
+                    if key not in data or key in changed
+                }
+                properties["snapshot"] = False
+                properties["changed_fields"] = [
+                    names.get(key, key) for key in sorted(changed)
+                ]
+            previous = data
+            converted.append(properties)
+        return converted
+
+    def migrate_to_delta(self, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Convert full-copy record histories into delta storage.
+
+        Records keep their properties if their version is 1 or a multiple of the
+        snapshot interval and hold only their changed fields otherwise. Nodes whose
+        records already carry the `snapshot` property are skipped, so the migration
+        can be resumed.
+
+        Args:
+            batch_size: The number of nodes converted per round-trip.
+
+        Returns: The number of converted records.
+
+        """
+        self.backfill_timeline(batch_size)
+        converted = 0
+        after = None
+        while True:
+            results, _ = cypher_query(
+                f"""
+                MATCH (node:{self.node_label})
+                WHERE $after IS NULL OR node.uuid > $after
+                WITH node
+                ORDER BY node.uuid
+                LIMIT $batch_size
+                MATCH (node)-[:HAS_RECORD]->(record:{self.record_label})
+                WITH node, record
+                ORDER BY record.version
+                RETURN node.uuid, collect(record)
+                ORDER BY node.uuid
+                """,
+                {"after": after, "batch_size": batch_size},
+            )
+            if not results:
+                return converted
+
+            rows = []
+            for _, records in results:
+                if any(record.get("snapshot") is not None for record in records):
+                    continue
+                rows.extend(
+                    {"uuid": properties["uuid"], "properties": properties}
+                    for properties in self.delta_properties(
+                        [dict(record.items()) for record in records]
+                    )
+                )
+
+            if rows:
+                cypher_query(
+                    f"""
+                    UNWIND $rows AS row
+                    MATCH (record:{self.record_label} {{uuid: row.uuid}})
+                    SET record = row.properties
+                    """,
+                    {"rows": rows},
+                )
+            converted += len(rows)
+            after = results[-1][0]
@@ -1,3 +1,18 @@
 from .node_record_service import NodeRecordService
-from .recorded_node_services import RecordedNodeService
+from .read_cache import ReadCache
+from .recorded_node_services import RecordedNodeService, VersionConflict
+from .async_recorded_node_service import AsyncRecordedNodeService
+from .recorded_edge_service import RecordedEdgeService
 from .service_factory import ServiceFactory
+from .schema_manager import SchemaManager
+from .buffered_recorder import BufferedRecorder
+from .retention import RetentionJob, RetentionPolicy, RetentionProgress
+from .change_feed import Change, ChangeCursor, ChangeFeed
+from .history_transfer import (
+    ExportManifest,
+    HistoryExporter,
+    HistoryImporter,
+    ImportReport,
+    time_partitions,
+)
+from .bulk_loader import BackfillChange, BulkLoader, BulkLoadProgress
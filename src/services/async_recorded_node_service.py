@@ -0,0 +1,250 @@
+import asyncio
+from datetime import datetime
+from typing import (
+    Awaitable,
+    Callable,
+    Type,
+    TypeVar,
+    Generic,
+    Optional,
+    Iterable,
+    AsyncIterator,
+    Tuple,
+    List,
+)
+from pydantic import ValidationError, BaseModel
+from src.repositories import AsyncNodeRepository, AsyncRecordChainRepository
+from src.repositories.record_chain_repository import DEFAULT_BATCH_SIZE
+from src.types import OperationEnum
+from src.models.pydantic_models import NodeModel, ItemInvalid, ItemNotFound
+from src.models.neomodel_entities import RecordedNode, NodeRecord
+
+TCreate = TypeVar("TCreate", bound=BaseModel)  # Pydantic create class
+TRead = TypeVar("TRead", bound=NodeModel)  # Pydantic read class
+TUpdate = TypeVar("TUpdate", bound=BaseModel)
+TItem = TypeVar("TItem")
+TOutcome = TypeVar("TOutcome")
+
+TEntity = TypeVar("TEntity", bound=RecordedNode)
+TRecord = TypeVar("TRecord", bound=NodeRecord)
+
+DEFAULT_CONCURRENCY = 32
+
+
+class AsyncRecordedNodeService(Generic[TEntity, TRecord, TRead]):
+    """
+    Awaitable counterpart of `RecordedNodeService` on a neo4j `AsyncDriver`.
+
+    It runs the same compiled statements, so both services can be used on the same
+    graph.
+    """
+
+    def __init__(
+        self,
+        repository: AsyncNodeRepository,
+        record_chain_repo: AsyncRecordChainRepository,
+        create_model: Type[TCreate],
+        update_model: Type[TUpdate],
+        record_read_model: Type[BaseModel],
+    ) -> None:
+        self.repository = repository
+        self.record_chain_repo = record_chain_repo
+        self.create_model = create_model
+        self.update_model = update_model
+        self.record_read_model = record_read_model
+
+    @property
+    def skipped_updates(self) -> int:
+        """Number of updates that changed no field and were therefore not written."""
+        return self.record_chain_repo.skipped_updates
+
+    def _read_record_model(self, record_instance) -> Optional[BaseModel]:
+        if record_instance is None:
+            return None
+        return self.record_read_model.model_validate(record_instance)
+
+    async def create(self, data: dict) -> TRead:
+        try:
+            validated_data = self.create_model.model_validate(data)
+        except ValidationError as e:
+            raise ValueError("Validation error while creating entity") from e
+
+        node_instance, _ = await self.record_chain_repo.create_record(
+            validated_data.model_dump()
+        )
+        return self.repository.read_model.model_validate(node_instance)
+
+    async def read(self, uuid: str) -> TRead:
+        return await self.repository.read(uuid)
+
+    async def read_active_record(self, uuid: str) -> BaseModel:
+        record_instance = await self.record_chain_repo.read_active_record(uuid)
+        if record_instance is None:
+            raise ValueError(f"Node with uuid {uuid} not found")
+        return self._read_record_model(record_instance)
+
+    async def read_as_of(self, uuid: str, timestamp: datetime) -> Optional[BaseModel]:
+        return self._read_record_model(
+            await self.record_chain_repo.read_record_as_of(uuid, timestamp)
+        )
+
+    async def read_version(self, uuid: str, version: int) -> Optional[BaseModel]:
+        return self._read_record_model(
+            await self.record_chain_repo.read_record_version(uuid, version)
+        )
+
+    async def iter_history(
+        self,
+        uuid: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        page_size: int = DEFAULT_BATCH_SIZE,
+        newest_first: bool = True,
+        changed_field: Optional[str] = None,
+    ) -> AsyncIterator[BaseModel]:
+        after = None
+        while True:
+            page = await self.record_chain_repo.read_history_page(
+                uuid, since, until, after, page_size, newest_first, changed_field
+            )
+            for record_instance in page:
+                yield self._read_record_model(record_instance)
+            if len(page) < page_size:
+                return
+            after = (page[-1].created_at, page[-1].uuid)
+
+    async def append_record(
+        self, uuid: str, data: dict, operation: OperationEnum
+    ) -> TRead:
+        try:
+            validated_data = self.update_model.model_validate(data)
+        except ValidationError as e:
+            raise ValueError("Validation error while recording entity") from e
+
+        result = await self.record_chain_repo.append_record(
+            uuid, validated_data.model_dump(exclude_unset=True), operation
+        )
+        if result is None:
+            raise ValueError(f"Node with uuid {uuid} not found")
+
+        node_instance, _ = result
+        return self.repository.read_model.model_validate(node_instance)
+
+    async def update(self, uuid: str, data: dict) -> TRead:
+        return await self.append_record(uuid, data, OperationEnum.UPDATED)
+
+    async def delete(self, uuid: str) -> TRead:
+        return await self.append_record(uuid, {}, OperationEnum.DELETED)
+
+    async def create_many(
+        self, items: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[TRead | ItemInvalid]:
+        outcomes = []
+        valid_items = []
+        for index, data in enumerate(items):
+            try:
+                validated_data = self.create_model.model_validate(data)
+            except ValidationError as e:
+                outcomes.append(ItemInvalid(index=index, error=str(e)))
+                continue
+            outcomes.append(None)
+            valid_items.append((index, validated_data.model_dump()))
+
+        async for index, node_instance, _ in self.record_chain_repo.create_records(
+            valid_items, batch_size
+        ):
+            outcomes[index] = self.repository.read_model.model_validate(node_instance)
+        return outcomes
+
+    async def _append_many(
+        self,
+        items: Iterable[Tuple[str, dict]],
+        operation: OperationEnum,
+        batch_size: int,
+    ) -> List[TRead | ItemNotFound | ItemInvalid]:
+        outcomes = []
+        valid_items = []
+        for index, (uuid, data) in enumerate(items):
+            try:
+                validated_data = self.update_model.model_validate(data)
+            except ValidationError as e:
+                outcomes.append(ItemInvalid(index=index, error=str(e)))
+                continue
+            outcomes.append(ItemNotFound(uuid=str(uuid)))
+            valid_items.append(
+                (index, uuid, validated_data.model_dump(exclude_unset=True), operation)
+            )
+
+        async for index, node_instance, _ in self.record_chain_repo.append_records(
+            valid_items, batch_size
+        ):
+            outcomes[index] = self.repository.read_model.model_validate(node_instance)
+        return outcomes
+
+    async def update_many(
+        self, items: Iterable[Tuple[str, dict]], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[TRead | ItemNotFound | ItemInvalid]:
+        return await self._append_many(items, OperationEnum.UPDATED, batch_size)
+
+    async def delete_many(
+        self, uuids: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[TRead | ItemNotFound]:
+        return await self._append_many(
+            ((uuid, {}) for uuid in uuids), OperationEnum.DELETED, batch_size
+        )
+
+    async def fan_out(
+        self,
+        func: Callable[[TItem], Awaitable[TOutcome]],
+        items: Iterable[TItem],
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[TOutcome | Exception]:
+        """
+        Await a service method for many items with a bounded number in flight.
+
+        Example:
+            records = await service.fan_out(service.read_active_record, uuids)
+
+        Args:
+            func: The coroutine function called with each item.
+            items: The items.
+            concurrency: The maximum number of calls in flight.
+
+        Returns: One outcome per item in input order. Exceptions raised by a call are
+            returned in place of its outcome.
+
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(item: TItem) -> TOutcome:
+            async with semaphore:
+                return await func(item)
+
+        return await asyncio.gather(
+            *(call(item) for item in items), return_exceptions=True
+        )
+
+    async def read_concurrently(
+        self, uuids: Iterable[str], concurrency: int = DEFAULT_CONCURRENCY
+    ) -> List[TRead | ItemNotFound]:
+        """
+        Read many recorded nodes with a bounded number of reads in flight.
+
+        Args:
+            uuids: The uuids of the nodes.
+            concurrency: The maximum number of reads in flight.
+
+        Returns: One outcome per uuid in input order, either the read model of the
+            node or an `ItemNotFound` for unknown uuids.
+
+        """
+        uuids = list(uuids)
+        outcomes = await self.fan_out(self.read, uuids, concurrency)
+        for index, outcome in enumerate(outcomes):
+            if isinstance(outcome, ValueError) and not isinstance(
+                outcome, ValidationError
+            ):
+                outcomes[index] = ItemNotFound(uuid=str(uuids[index]))
+            elif isinstance(outcome, Exception):
+                raise outcome
+        return outcomes
@@ -0,0 +1,283 @@
+from concurrent.futures import Future, InvalidStateError
+from itertools import groupby
+from pydantic import BaseModel
+from queue import Full
+from src.repositories.record_chain_repository import DEFAULT_BATCH_SIZE
+from src.services.recorded_node_services import RecordedNodeService
+from src.types import OperationEnum
+from threading import Condition, Lock, Thread
+from time import monotonic, perf_counter
+from typing import Optional, List
+
+
+class BufferedRecorderMetrics(BaseModel):
+    queue_depth: int
+    max_queue_depth: int
+    flush_count: int
+    flushed_operations: int
+    merged_updates: int
+    failed_operations: int
+    last_flush_latency_ms: float
+    max_flush_latency_ms: float
+    total_flush_latency_ms: float
+
+
+class _Operation:
+    __slots__ = ("operation", "uuid", "data", "futures")
+
+    def __init__(
+        self, operation: OperationEnum, uuid: Optional[str], data: dict, future: Future
+    ):
+        self.operation = operation
+        self.uuid = uuid
+        self.data = data
+        self.futures = [future]
+
+
+class BufferedRecorder:
+    """
+    Write-behind recorder for a service built by `ServiceFactory.create_service`.
+
+    Create, update and delete calls are queued in memory and written by a background
+    thread with the batch APIs of the service, either when `max_batch_size` operations
+    are queued or `flush_interval_ms` milliseconds after the first queued operation.
+    Each call returns a future that resolves to the outcome of its batch item.
+
+    Example:
+        with BufferedRecorder(person_service, merge_updates=True) as recorder:
+            recorder.update(uuid, {"age": 58})
+    """
+
+    def __init__(
+        self,
+        service: RecordedNodeService,
+        max_batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval_ms: float = 100,
+        max_queue_size: int = 10 * DEFAULT_BATCH_SIZE,
+        merge_updates: bool = False,
+        put_timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            service: The service the operations are written with.
+            max_batch_size: The number of queued operations that triggers a flush.
+            flush_interval_ms: The maximum time an operation stays queued.
+            max_queue_size: The maximum number of queued operations. Further calls
+                block until a flush frees space.
+            merge_updates: Whether consecutive updates of the same uuid within one
+                flush window are merged into one record.
+            put_timeout: The maximum time in seconds a call blocks on a full queue
+                before raising `queue.Full`. None blocks until space is available.
+        """
+        if max_queue_size < max_batch_size:
+            raise ValueError("max_queue_size must not be smaller than max_batch_size")
+
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.merge_updates = merge_updates
+        self.put_timeout = put_timeout
+
+        self._pending: List[_Operation] = []
+        self._last_by_uuid: dict = {}
+        self._window_started: Optional[float] = None
+        self._closed = False
+        self._condition = Condition()
+        self._write_lock = Lock()
+
+        self._max_queue_depth = 0
+        self._flush_count = 0
+        self._flushed_operations = 0
+        self._merged_updates = 0
+        self._failed_operations = 0
+        self._last_flush_latency = 0.0
+        self._max_flush_latency = 0.0
+        self._total_flush_latency = 0.0
+
+        self._thread = Thread(target=self._run, name="BufferedRecorder", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "BufferedRecorder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def create(self, data: dict) -> Future:
+        return self._enqueue(OperationEnum.CREATED, None, data)
+
+    def update(self, uuid: str, data: dict) -> Future:
+        return self._enqueue(OperationEnum.UPDATED, str(uuid), data)
+
+    def delete(self, uuid: str) -> Future:
+        return self._enqueue(OperationEnum.DELETED, str(uuid), {})
+
+    def _enqueue(
+        self, operation: OperationEnum, uuid: Optional[str], data: dict
+    ) -> Future:
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("BufferedRecorder is closed")
+
+            # Merge into the last queued update of the same uuid
+            last = self._last_by_uuid.get(uuid) if uuid is not None else None
+            if (
+                self.merge_updates
+                and operation == OperationEnum.UPDATED
+                and last is not None
+                and last.operation == OperationEnum.UPDATED
+            ):
+                last.data = last.data | data
+                last.futures.append(future)
+                self._merged_updates += 1
+                return future
+
+            # Backpressure
+            if not self._condition.wait_for(
+                lambda: len(self._pending) < self.max_queue_size or self._closed,
+                timeout=self.put_timeout,
+            ):
+                raise Full("BufferedRecorder queue is full")
+            if self._closed:
+                raise RuntimeError("BufferedRecorder is closed")
+
+            queued = _Operation(operation, uuid, data, future)
+            self._pending.append(queued)
+            if uuid is not None:
+                self._last_by_uuid[uuid] = queued
+            self._max_queue_depth = max(self._max_queue_depth, len(self._pending))
+            if self._window_started is None:
+                self._window_started = monotonic()
+                self._condition.notify_all()
+            elif len(self._pending) >= self.max_batch_size:
+                self._condition.notify_all()
+        return future
+
+    def _take(self) -> List[_Operation]:
+        with self._condition:
+            batch = self._pending
+            self._pending = []
+            self._last_by_uuid = {}
+            self._window_started = None
+            self._condition.notify_all()
+        return batch
+
+    @staticmethod
+    def _start(queued: _Operation) -> bool:
+        # Cancelled futures are dropped, the others can no longer be cancelled
+        queued.futures = [
+            future for future in queued.futures if future.set_running_or_notify_cancel()
+        ]
+        return bool(queued.futures)
+
+    @staticmethod
+    def _fail(batch: List[_Operation], error: Exception) -> None:
+        for queued in batch:
+            for future in queued.futures:
+                try:
+                    future.set_exception(error)
+                except InvalidStateError:
+                    continue
+
+    def _write(self, batch: List[_Operation]) -> None:
+        # Operations whose futures were all cancelled are not written
+        batch = [queued for queued in batch if self._start(queued)]
+        if not batch:
+            return
+
+        start = perf_counter()
+        failed = 0
+        for operation, group in groupby(batch, key=lambda queued: queued.operation):
+            group = list(group)
+            try:
+                if operation == OperationEnum.CREATED:
+                    outcomes = self.service.create_many(
+                        [queued.data for queued in group], self.max_batch_size
+                    )
+                elif operation == OperationEnum.UPDATED:
+                    outcomes = self.service.update_many(
+                        [(queued.uuid, queued.data) for queued in group],
+                        self.max_batch_size,
+                    )
+                else:
+                    outcomes = self.service.delete_many(
+                        [queued.uuid for queued in group], self.max_batch_size
+                    )
+            except Exception as e:
+                failed += len(group)
+                self._fail(group, e)
+                continue
+
+            for queued, outcome in zip(group, outcomes):
+                for future in queued.futures:
+                    future.set_result(outcome)
+        latency = perf_counter() - start
+
+        with self._condition:
+            self._flush_count += 1
+            self._flushed_operations += len(batch)
+            self._failed_operations += failed
+            self._last_flush_latency = latency
+            self._max_flush_latency = max(self._max_flush_latency, latency)
+            self._total_flush_latency += latency
+
+    def _flush_due(self) -> bool:
+        return self._closed or len(self._pending) >= self.max_batch_size
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._flush_due():
+                    if self._window_started is None:
+                        self._condition.wait()
+                        continue
+                    remaining = self._window_started + self.flush_interval - monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # The futures of the batch hold the error, the recorder keeps running
+                continue
+
+    def flush(self) -> None:
+        """
+        Write all queued operations and wait until they are written.
+        """
+        with self._write_lock:
+            batch = self._take()
+            try:
+                self._write(batch)
+            except Exception as e:
+                self._fail(batch, e)
+                raise
+
+    def close(self) -> None:
+        """
+        Stop the background thread and write the remaining operations.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self.flush()
+
+    @property
+    def metrics(self) -> BufferedRecorderMetrics:
+        with self._condition:
+            return BufferedRecorderMetrics(
+                queue_depth=len(self._pending),
+                max_queue_depth=self._max_queue_depth,
+                flush_count=self._flush_count,
+                flushed_operations=self._flushed_operations,
+                merged_updates=self._merged_updates,
+                failed_operations=self._failed_operations,
+                last_flush_latency_ms=self._last_flush_latency * 1000,
+                max_flush_latency_ms=self._max_flush_latency * 1000,
+                total_flush_latency_ms=self._total_flush_latency * 1000,
+            )
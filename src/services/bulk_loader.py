@@ -0,0 +1,438 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from pydantic import BaseModel, Field, ValidationError
+from src.core.database import ConnectionManager, ConnectionSettings
+from src.repositories.memory_repositories import MemoryStore
+from src.repositories.record_chain_repository import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_SNAPSHOT_INTERVAL,
+)
+from src.services.history_transfer import read_rows
+from src.services.recorded_node_services import RecordedNodeService
+from src.services.service_factory import ServiceFactory
+from src.types import BackendEnum, OperationEnum, RecordStorageEnum
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from zlib import crc32
+
+SCATTER_MANIFEST = "scatter.json"
+
+
+class BackfillChange(BaseModel):
+    """One change of the history of a recorded node."""
+
+    uuid: str = Field(..., description="The uuid of the recorded node")
+    operation: OperationEnum = OperationEnum.UPDATED
+    created_at: datetime = Field(..., description="When the change happened")
+    data: dict = Field(default_factory=dict, description="The created or changed data")
+
+
+class PartitionCheckpoint(BaseModel):
+    partition: int
+    entities: int = Field(
+        0, description="The number of processed nodes in uuid order, the resume point"
+    )
+    created: int = Field(0, description="The number of written nodes")
+    existing: int = Field(0, description="The number of nodes skipped as existing")
+    records: int = Field(0, description="The number of written records")
+    skipped_updates: int = Field(0, description="Updates that changed no field")
+    invalid: int = Field(0, description="Changes that failed validation or ordering")
+    statements: int = 0
+    done: bool = False
+
+
+class BulkLoadProgress(BaseModel):
+    partitions: int
+    partitions_done: int = 0
+    entities: int = 0
+    created: int = 0
+    existing: int = 0
+    records: int = 0
+    skipped_updates: int = 0
+    invalid: int = 0
+    statements: int = 0
+    elapsed: float = Field(0.0, description="The seconds since the load started")
+    records_per_second: float = Field(
+        0.0, description="The records written per second by this run"
+    )
+
+    @property
+    def done(self) -> bool:
+        return self.partitions_done == self.partitions
+
+
+def partition_of(uuid: str, partitions: int) -> int:
+    """
+    Returns: The partition of a node uuid, the same in every process.
+    """
+    return crc32(str(uuid).encode()) % partitions
+
+
+def _partition_path(directory: Path, partition: int) -> Path:
+    return directory / f"partition-{partition:04d}.jsonl"
+
+
+def _checkpoint_path(directory: Path, partition: int) -> Path:
+    return directory / f"partition-{partition:04d}.checkpoint.json"
+
+
+def _read_checkpoint(directory: Path, partition: int) -> PartitionCheckpoint:
+    path = _checkpoint_path(directory, partition)
+    if not path.exists():
+        return PartitionCheckpoint(partition=partition)
+    return PartitionCheckpoint.model_validate_json(path.read_text())
+
+
+def _write_checkpoint(directory: Path, checkpoint: PartitionCheckpoint) -> None:
+    # Replaced atomically, so a crash leaves the previous checkpoint
+    path = _checkpoint_path(directory, checkpoint.partition)
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(checkpoint.model_dump_json())
+    temporary.replace(path)
+
+
+class _PartitionTask(NamedTuple):
+    # Everything a worker process needs to load one partition
+    model_class: type
+    node_class: type
+    record_class: type
+    storage: RecordStorageEnum
+    snapshot_interval: int
+    backend: BackendEnum
+    settings: Optional[ConnectionSettings]
+    directory: str
+    partition: int
+    batch_size: int
+
+
+def _histories(path: Path) -> Dict[str, List[BackfillChange]]:
+    histories: Dict[str, List[BackfillChange]] = {}
+    for rows in read_rows(path):
+        for row in rows:
+            change = BackfillChange.model_validate(row)
+            histories.setdefault(change.uuid, []).append(change)
+    return histories
+
+
+def _validated(
+    service: RecordedNodeService, history: List[BackfillChange]
+) -> Tuple[List[Tuple[float, dict, OperationEnum]], int]:
+    # The changes as `create` and `update` would record them, in time order.
+    # Like there, changes of a node that is not created yet are not recorded.
+    created_at = service.record_chain_repo.record_model.created_at
+    changes = []
+    invalid = 0
+    for change in sorted(history, key=lambda change: change.created_at):
+        operation = OperationEnum(change.operation)
+        if (operation == OperationEnum.CREATED) == bool(changes):
+            invalid += 1
+            continue
+        try:
+            if operation == OperationEnum.CREATED:
+                data = service.create_model.model_validate(change.data).model_dump()
+            elif operation == OperationEnum.UPDATED:
+                data = service.update_model.model_validate(change.data).model_dump(
+                    exclude_unset=True
+                )
+            else:
+                data = {}
+        except ValidationError:
+            invalid += 1
+            continue
+        changes.append((created_at.deflate(change.created_at), data, operation))
+    return changes, invalid
+
+
+def _write_partition(
+    service: RecordedNodeService, directory: Path, partition: int, batch_size: int
+) -> PartitionCheckpoint:
+    chain = service.record_chain_repo
+    checkpoint = _read_checkpoint(directory, partition)
+    if checkpoint.done:
+        return checkpoint
+
+    histories = _histories(_partition_path(directory, partition))
+    uuids = sorted(histories)
+    pending = PartitionCheckpoint(partition=partition)
+    rows = []
+    records = 0
+
+    def flush() -> None:
+        nonlocal checkpoint, pending, rows, records
+        if rows:
+            results, _ = chain.run_write(chain.backfill_chains_query, {"rows": rows})
+            created = set(results[0][0])
+            for row in rows:
+                if row["node"]["uuid"] in created:
+                    pending.created += 1
+                    pending.records += len(row["records"])
+                else:
+                    pending.existing += 1
+            pending.statements += 1
+        # The statement committed, move the resume point past its nodes
+        checkpoint = PartitionCheckpoint(
+            partition=partition,
+            **{
+                name: getattr(checkpoint, name) + getattr(pending, name)
+                for name in PartitionCheckpoint.model_fields
+                if name not in ("partition", "done")
+            },
+        )
+        _write_checkpoint(directory, checkpoint)
+        pending = PartitionCheckpoint(partition=partition)
+        rows = []
+        records = 0
+
+    for uuid in uuids[checkpoint.entities :]:
+        changes, invalid = _validated(service, histories[uuid])
+        pending.entities += 1
+        pending.invalid += invalid
+        if changes:
+            row = chain.chain_row(uuid, changes)
+            pending.skipped_updates += len(changes) - len(row["records"])
+            rows.append(row)
+            records += len(row["records"])
+        if records >= batch_size:
+            flush()
+    flush()
+    checkpoint.done = True
+    _write_checkpoint(directory, checkpoint)
+    return checkpoint
+
+
+def _load_partition(
+    task: _PartitionTask, store: Optional[MemoryStore] = None
+) -> PartitionCheckpoint:
+    # Entry point of the worker processes
+    service = ServiceFactory.create_service(
+        task.model_class,
+        task.node_class,
+        task.record_class,
+        storage=task.storage,
+        snapshot_interval=task.snapshot_interval,
+        backend=task.backend,
+        store=store,
+    )
+    directory = Path(task.directory)
+    if task.settings is None:
+        return _write_partition(service, directory, task.partition, task.batch_size)
+
+    manager = ConnectionManager(task.settings)
+    try:
+        with manager.session():
+            return _write_partition(service, directory, task.partition, task.batch_size)
+    finally:
+        manager.close()
+
+
+class BulkLoader:
+    """
+    Backfills the histories of many recorded nodes in parallel, with the records
+    that replaying the changes through `RecordedNodeService.create` and `update`
+    would write, apart from the uuids of the records and relationships.
+
+    The changes are first scattered by node uuid into partition files of a work
+    directory. Worker processes then load the partitions: each reads the changes of
+    its partition, builds the record chain of every node locally and writes the
+    chains with batched UNWIND statements on its own driver, so no statement
+    reads or locks another chain. Changes keep the time of `created_at`.
+
+    After every statement a worker stores a checkpoint of its partition. Running
+    `load` again with the same directory skips the scatter and the loaded nodes. The
+    statement skips nodes that already exist, so a statement repeated after a crash
+    writes nothing twice, and nodes recorded before the backfill are kept.
+
+    Worker processes are spawned, so the model classes must be importable. Install
+    the schema with `SchemaManager` first, the statement looks up records by uuid.
+
+    Example:
+        loader = BulkLoader(Person, PersonNode, PersonRecord, workers=8)
+        progress = loader.load("backfill", changes, on_progress=print)
+    """
+
+    def __init__(
+        self,
+        model_class,
+        node_class,
+        record_class,
+        storage: RecordStorageEnum = RecordStorageEnum.FULL,
+        snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+        workers: Optional[int] = None,
+        partitions: Optional[int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        settings: Optional[ConnectionSettings] = None,
+        backend: BackendEnum = BackendEnum.NEO4J,
+        store: Optional[MemoryStore] = None,
+    ) -> None:
+        """
+        Args:
+            model_class: The pydantic model of the recorded data.
+            node_class: The neomodel class of the recorded node.
+            record_class: The neomodel class of the node records.
+            storage: The record storage of the service.
+            snapshot_interval: The snapshot interval of the service.
+            workers: The number of worker processes, defaults to the CPU count.
+                With one worker or the memory backend the partitions are loaded in
+                this process.
+            partitions: The number of partitions, defaults to four per worker.
+            batch_size: The minimum number of records per statement.
+            settings: The connection of the worker processes, defaults to the
+                NEO4J_* environment variables. Loads in this process use the active
+                connection unless settings are given.
+            backend: Whether to load into Neo4j or into a `MemoryStore`.
+            store: With the memory backend, the store or None for the default store.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.partitions = partitions or self.workers * 4
+        self.batch_size = batch_size
+        self.backend = BackendEnum(backend)
+        self.store = store
+        self.in_process = self.workers == 1 or self.backend == BackendEnum.MEMORY
+        if settings is None and not self.in_process:
+            settings = ConnectionSettings.from_env()
+        self.settings = settings
+        self.classes = (model_class, node_class, record_class)
+        self.storage = RecordStorageEnum(storage)
+        self.snapshot_interval = snapshot_interval
+
+    def _scatter(
+        self, directory: Path, changes: Iterable[Union[BackfillChange, dict]]
+    ) -> None:
+        files = [
+            open(_partition_path(directory, partition), "w", encoding="utf-8")
+            for partition in range(self.partitions)
+        ]
+        count = 0
+        try:
+            for change in changes:
+                if not isinstance(change, BackfillChange):
+                    change = BackfillChange.model_validate(change)
+                partition = partition_of(change.uuid, self.partitions)
+                files[partition].write(change.model_dump_json() + "\n")
+                count += 1
+        finally:
+            for file in files:
+                file.close()
+        # Written last, it marks the partition files as complete
+        (directory / SCATTER_MANIFEST).write_text(
+            json.dumps({"partitions": self.partitions, "changes": count})
+        )
+
+    def progress(
+        self, directory: Union[str, Path], start: float = 0.0, initial_records: int = 0
+    ) -> BulkLoadProgress:
+        """
+        Sum up the checkpoints of the partitions.
+
+        Args:
+            directory: The work directory of the load.
+            start: The `perf_counter` time the run started.
+            initial_records: The records already written when the run started.
+
+        Returns: The progress of the load.
+
+        """
+        directory = Path(directory)
+        progress = BulkLoadProgress(partitions=self.partitions)
+        for partition in range(self.partitions):
+            checkpoint = _read_checkpoint(directory, partition)
+            progress.partitions_done += checkpoint.done
+            for name in (
+                "entities",
+                "created",
+                "existing",
+                "records",
+                "skipped_updates",
+                "invalid",
+                "statements",
+            ):
+                setattr(
+                    progress, name, getattr(progress, name) + getattr(checkpoint, name)
+                )
+        if start:
+            progress.elapsed = perf_counter() - start
+            if progress.elapsed > 0:
+                progress.records_per_second = (
+                    progress.records - initial_records
+                ) / progress.elapsed
+        return progress
+
+    def load(
+        self,
+        directory: Union[str, Path],
+        changes: Optional[Iterable[Union[BackfillChange, dict]]] = None,
+        on_progress: Optional[Callable[[BulkLoadProgress], None]] = None,
+        progress_interval: float = 5.0,
+    ) -> BulkLoadProgress:
+        """
+        Load the changes, or resume the load of a work directory.
+
+        Args:
+            directory: The work directory for the partition files and checkpoints,
+                created if missing.
+            changes: The changes in any order, `BackfillChange` instances or their
+                dicts. Not read when the directory holds a complete scatter.
+            on_progress: Called with the progress every `progress_interval` seconds
+                and when a partition is done.
+            progress_interval: The seconds between progress reports.
+
+        Returns: The progress of the finished load.
+
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest = directory / SCATTER_MANIFEST
+        if manifest.exists():
+            self.partitions = json.loads(manifest.read_text())["partitions"]
+        elif changes is None:
+            raise ValueError(f"{directory} holds no scattered changes to resume")
+        else:
+            self._scatter(directory, changes)
+
+        tasks = [
+            _PartitionTask(
+                *self.classes,
+                storage=self.storage,
+                snapshot_interval=self.snapshot_interval,
+                backend=self.backend,
+                settings=self.settings,
+                directory=str(directory),
+                partition=partition,
+                batch_size=self.batch_size,
+            )
+            for partition in range(self.partitions)
+        ]
+        initial_records = self.progress(directory).records
+        start = perf_counter()
+
+        def report() -> None:
+            if on_progress is not None:
+                on_progress(self.progress(directory, start, initial_records))
+
+        if self.in_process:
+            for task in tasks:
+                _load_partition(task, self.store)
+                report()
+            return self.progress(directory, start, initial_records)
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self.workers, mp_context=context) as pool:
+            futures = {pool.submit(_load_partition, task) for task in tasks}
+            try:
+                while futures:
+                    finished, futures = wait(
+                        futures, progress_interval, return_when=FIRST_COMPLETED
+                    )
+                    for future in finished:
+                        future.result()
+                    report()
+            except BaseException:
+                # The checkpoints of the other partitions stay valid for a restart
+                for future in futures:
+                    future.cancel()
+                raise
+        return self.progress(directory, start, initial_records)
@@ -0,0 +1,294 @@
+from pydantic import BaseModel, Field
+from src.core.database import cypher_query
+from src.repositories.memory_repositories import MemoryStore
+from src.repositories.record_chain_repository import DEFAULT_BATCH_SIZE, _now
+from src.services.recorded_edge_service import RecordedEdgeService
+from src.services.recorded_node_services import RecordedNodeService
+from src.services.service_factory import ServiceFactory
+from src.types import OperationEnum
+from threading import Lock
+from time import monotonic, sleep
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+
+class ChangeCursor(BaseModel):
+    """
+    The position in a change feed: the (created_at, uuid) key of the last returned
+    record. The feed continues with the records after it.
+    """
+
+    created_at: float = Field(..., description="Record creation time as unix epoch")
+    uuid: str
+
+    @property
+    def token(self) -> str:
+        """The cursor as a string, to be stored by the consumer."""
+        return f"{self.created_at!r}/{self.uuid}"
+
+    @classmethod
+    def from_token(cls, token: str) -> "ChangeCursor":
+        created_at, uuid = token.split("/", 1)
+        return cls(created_at=float(created_at), uuid=uuid)
+
+
+class Change(BaseModel):
+    label: str = Field(..., description="The label of the record")
+    cursor: ChangeCursor
+    record: Any = Field(..., description="The record read model of the service")
+
+
+class ChangeFeed:
+    """
+    Reads the node and edge records of a set of services in the order they were
+    created, after a durable (created_at, uuid) cursor.
+
+    Each page is one statement with one branch per record label. A branch is a
+    range scan of the `created_at` index of the label, which `SchemaManager`
+    installs. With delta storage the records of a page are rebuilt to their full
+    state, with one more statement per node.
+
+    Records of concurrent transactions can commit out of creation order. Set
+    `settle` to the longest write transaction, so that a page only contains records
+    older than that and a cursor never passes a record that is still uncommitted.
+
+    Example:
+        feed = ChangeFeed.from_factory()
+        for change in feed.follow(ChangeCursor.from_token(stored_token)):
+            publish(change.record)
+            stored_token = change.cursor.token
+    """
+
+    def __init__(
+        self,
+        services: Iterable[Union[RecordedNodeService, RecordedEdgeService]],
+        settle: float = 0.0,
+    ) -> None:
+        self.settle = settle
+        self.services: Dict[str, Union[RecordedNodeService, RecordedEdgeService]] = {}
+        self.aliases: Dict[str, str] = {}  # Record label by node label or rel type
+        for service in services:
+            if isinstance(service, RecordedEdgeService):
+                chain = service.edge_chain_repo
+                self.aliases[chain.rel_type] = chain.record_label
+            else:
+                chain = service.record_chain_repo
+                self.aliases[chain.node_label] = chain.record_label
+            self.services[chain.record_label] = service
+
+        stores = {id(self._store(service)) for service in self.services.values()}
+        if len(stores) > 1:
+            raise ValueError("The services of a change feed must share one backend")
+        self._queries: Dict[Tuple[str, ...], str] = {}
+        self._lock = Lock()
+
+    @classmethod
+    def from_factory(cls, settle: float = 0.0) -> "ChangeFeed":
+        """
+        Returns: A change feed over every service registered with the
+            `ServiceFactory`.
+        """
+        return cls(ServiceFactory.registered_services(), settle)
+
+    @staticmethod
+    def _store(service) -> Optional[MemoryStore]:
+        if isinstance(service, RecordedEdgeService):
+            return getattr(service.edge_chain_repo, "store", None)
+        return getattr(service.record_chain_repo, "store", None)
+
+    def _labels(self, labels: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        if labels is None:
+            return tuple(sorted(self.services))
+        selected = set()
+        for label in labels:
+            label = self.aliases.get(label, label)
+            if label not in self.services:
+                raise ValueError(f"No service records the label {label}")
+            selected.add(label)
+        return tuple(sorted(selected))
+
+    def _query(self, labels: Tuple[str, ...]) -> str:
+        query = self._queries.get(labels)
+        if query is not None:
+            return query
+        branches = [
+            f"""
+                MATCH (record:{label})
+                WHERE record.created_at >= $after_created_at
+                    AND record.created_at <= $until
+                    AND (
+                        record.created_at > $after_created_at
+                        OR record.uuid > $after_uuid
+                    )
+                    AND ($operations IS NULL OR record.operation IN $operations)
+                RETURN '{label}' AS label, record
+                ORDER BY record.created_at, record.uuid
+                LIMIT $page_size
+            """
+            for label in labels
+        ]
+        query = f"""
+            CALL {{
+                {"UNION ALL".join(branches)}
+            }}
+            RETURN label, record
+            ORDER BY record.created_at, record.uuid
+            LIMIT $page_size
+        """
+        with self._lock:
+            self._queries[labels] = query
+        return query
+
+    def _inflate(self, results: List[list]) -> List[Any]:
+        instances = []
+        rows: Dict[str, List[int]] = {}  # Row indexes by node record label
+        for index, (label, record) in enumerate(results):
+            service = self.services[label]
+            if isinstance(service, RecordedEdgeService):
+                instances.append(service.edge_chain_repo.record_table.inflate(record))
+            else:
+                instances.append(service.record_chain_repo.record_table.inflate(record))
+                rows.setdefault(label, []).append(index)
+
+        # Delta records hold only their changes, so they are rebuilt per service
+        for label, indexes in rows.items():
+            chain = self.services[label].record_chain_repo
+            states = chain.record_states([instances[index] for index in indexes])
+            for index, state in zip(indexes, states):
+                instances[index] = state
+
+        models = []
+        for (label, _), instance in zip(results, instances):
+            service = self.services[label]
+            if isinstance(service, RecordedEdgeService):
+                models.append(service.record_read_model.model_validate(instance))
+            else:
+                read_model = service.record_service.repository.read_model
+                models.append(read_model.model_validate(instance))
+        return models
+
+    def read_page(
+        self,
+        cursor: Optional[ChangeCursor] = None,
+        labels: Optional[Iterable[str]] = None,
+        operations: Optional[Iterable[OperationEnum]] = None,
+        page_size: int = DEFAULT_BATCH_SIZE,
+    ) -> List[Change]:
+        """
+        Read the next records after a cursor.
+
+        Args:
+            cursor: The cursor of the last consumed change or None to start from the
+                first record.
+            labels: Only records of these record labels, node labels or
+                relationship types. None reads all services.
+            operations: Only records of these operations.
+            page_size: The maximum number of changes.
+
+        Returns: The changes in (created_at, uuid) order. The cursor of the last
+            change continues the feed.
+
+        """
+        selected = self._labels(labels)
+        if not selected:
+            return []
+        after = (cursor.created_at, cursor.uuid) if cursor else (float("-inf"), "")
+        until = _now() - self.settle
+        operation_values = None
+        if operations is not None:
+            operation_values = [OperationEnum(op).value for op in operations]
+
+        store = self._store(next(iter(self.services.values())))
+        if store is not None:
+            with store.lock:
+                results = store.changes(
+                    list(selected), after, until, operation_values, page_size
+                )
+        else:
+            results, _ = cypher_query(
+                self._query(selected),
+                {
+                    "after_created_at": after[0],
+                    "after_uuid": after[1],
+                    "until": until,
+                    "operations": operation_values,
+                    "page_size": page_size,
+                },
+            )
+
+        return [
+            Change(
+                label=label,
+                cursor=ChangeCursor(
+                    created_at=record["created_at"], uuid=record["uuid"]
+                ),
+                record=model,
+            )
+            for (label, record), model in zip(results, self._inflate(results))
+        ]
+
+    def iter_changes(
+        self,
+        cursor: Optional[ChangeCursor] = None,
+        labels: Optional[Iterable[str]] = None,
+        operations: Optional[Iterable[OperationEnum]] = None,
+        page_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[Change]:
+        """
+        Iterate page by page over the changes after a cursor up to now. The
+        arguments are those of `read_page`.
+        """
+        while True:
+            page = self.read_page(cursor, labels, operations, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            cursor = page[-1].cursor
+
+    def follow(
+        self,
+        cursor: Optional[ChangeCursor] = None,
+        labels: Optional[Iterable[str]] = None,
+        operations: Optional[Iterable[OperationEnum]] = None,
+        page_size: int = DEFAULT_BATCH_SIZE,
+        poll_interval: float = 1.0,
+        idle_timeout: Optional[float] = None,
+        stop: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[Change]:
+        """
+        Long-poll the feed: yield changes as they are recorded.
+
+        Args:
+            cursor: The cursor of the last consumed change or None.
+            labels: Only records of these labels.
+            operations: Only records of these operations.
+            page_size: The maximum number of changes per statement.
+            poll_interval: The seconds to wait after an empty page.
+            idle_timeout: Stop after this many seconds without a change. None
+                follows until `stop` returns True.
+            stop: Checked before every poll, stops the iteration when True.
+
+        Returns: An iterator over the changes.
+
+        """
+        idle_since = monotonic()
+        while stop is None or not stop():
+            page = self.read_page(cursor, labels, operations, page_size)
+            if page:
+                yield from page
+                cursor = page[-1].cursor
+                idle_since = monotonic()
+                if len(page) == page_size:
+                    continue
+            elif idle_timeout is not None and monotonic() - idle_since >= idle_timeout:
+                return
+            sleep(poll_interval)
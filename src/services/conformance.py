@@ -0,0 +1,630 @@
+from datetime import datetime, timedelta, timezone
+from neomodel import IntegerProperty, StringProperty
+from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
+from src.models.neomodel_entities import EdgeRecord, NodeRecord, RecordedNode
+from src.models.pydantic_models import (
+    EdgeModel,
+    ItemConflict,
+    ItemInvalid,
+    ItemNotFound,
+    NodeModel,
+)
+from src.repositories.memory_repositories import MemoryStore
+from src.services.bulk_loader import BulkLoader
+from src.services.change_feed import ChangeCursor, ChangeFeed
+from src.services.recorded_node_services import VersionConflict
+from src.services.service_factory import ServiceFactory
+from src.types import BackendEnum, OperationEnum, RecordStorageEnum
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List, Optional
+from uuid import UUID, uuid4
+
+
+class ConformanceModel(NodeModel):
+    name: str
+    count: Optional[int] = None
+
+
+class ConformanceNode(RecordedNode): ...
+
+
+class ConformanceRecord(NodeRecord):
+    name = StringProperty()
+    count = IntegerProperty()
+
+
+class ConformanceMigratedNode(RecordedNode): ...
+
+
+class ConformanceMigratedRecord(NodeRecord):
+    name = StringProperty()
+    count = IntegerProperty()
+
+
+class ConformanceEdgeModel(EdgeModel):
+    weight: Optional[int] = None
+
+
+class ConformanceEdgeRecord(EdgeRecord):
+    weight = IntegerProperty()
+
+
+class ConformanceError(Exception):
+    pass
+
+
+class ConformanceReport(BaseModel):
+    backend: BackendEnum
+    storage: RecordStorageEnum
+    passed: List[str] = Field(default_factory=list)
+    failed: Dict[str, str] = Field(
+        default_factory=dict, description="Error message by check name"
+    )
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+def _expect(condition: bool, message: str) -> None:
+    if not condition:
+        raise ConformanceError(message)
+
+
+class ConformanceSuite:
+    """
+    Checks that a recorder backend has the semantics of the in-memory reference
+    backend.
+
+    Every check works on nodes it creates itself, so the suite can run against a
+    database holding other data. Run it against the Neo4j backend with a configured
+    connection and against the memory backend with a fresh store.
+
+    Example:
+        report = ConformanceSuite(BackendEnum.NEO4J, RecordStorageEnum.DELTA).run()
+        assert report.ok, report.failed
+    """
+
+    def __init__(
+        self,
+        backend: BackendEnum = BackendEnum.MEMORY,
+        storage: RecordStorageEnum = RecordStorageEnum.FULL,
+        store: Optional[MemoryStore] = None,
+    ) -> None:
+        self.backend = BackendEnum(backend)
+        self.storage = RecordStorageEnum(storage)
+        if self.backend == BackendEnum.MEMORY and store is None:
+            store = MemoryStore()
+        self.store = store
+        self.service = ServiceFactory.create_service(
+            ConformanceModel,
+            ConformanceNode,
+            ConformanceRecord,
+            storage=self.storage,
+            # A short interval exercises snapshots with delta storage
+            snapshot_interval=2,
+            backend=self.backend,
+            store=store,
+        )
+        self.edge_service = ServiceFactory.create_edge_service(
+            ConformanceEdgeModel,
+            "CONFORMANCE_LINK",
+            ConformanceNode,
+            ConformanceNode,
+            ConformanceEdgeRecord,
+            backend=self.backend,
+            store=store,
+        )
+
+    @property
+    def checks(self) -> Dict[str, Callable[[], None]]:
+        return {
+            name[len("check_") :]: getattr(self, name)
+            for name in dir(self)
+            if name.startswith("check_")
+        }
+
+    def run(self) -> ConformanceReport:
+        """
+        Returns: The passed checks and the error of each failed check.
+        """
+        report = ConformanceReport(backend=self.backend, storage=self.storage)
+        for name, check in self.checks.items():
+            try:
+                check()
+            except Exception as e:
+                report.failed[name] = f"{type(e).__name__}: {e}"
+            else:
+                report.passed.append(name)
+        return report
+
+    def _create(self, name: str = "created", count: Optional[int] = 1) -> str:
+        return str(self.service.create({"name": name, "count": count}).uuid)
+
+    def check_create_and_read(self) -> None:
+        uuid = self._create()
+        _expect(str(self.service.read(uuid).uuid) == uuid, "read returns another node")
+        record = self.service.read_active_record(uuid)
+        _expect(record.version == 1, f"first version is {record.version}")
+        _expect(record.operation == OperationEnum.CREATED.value, "not a create record")
+        _expect((record.name, record.count) == ("created", 1), "record data not stored")
+        _expect(
+            record.changed_fields == ["name", "count"],
+            f"changed fields {record.changed_fields}",
+        )
+
+    def check_unknown_uuid(self) -> None:
+        uuid = str(uuid4())
+        for action in (
+            lambda: self.service.read(uuid),
+            lambda: self.service.read_active_record(uuid),
+            lambda: self.service.update(uuid, {"name": "missing"}),
+        ):
+            try:
+                action()
+            except ValueError:
+                continue
+            raise ConformanceError("unknown uuid did not raise ValueError")
+        _expect(self.service.read_version(uuid, 1) is None, "unknown version found")
+
+    def check_update(self) -> None:
+        uuid = self._create()
+        self.service.update(uuid, {"name": "updated"})
+        record = self.service.read_active_record(uuid)
+        _expect(record.version == 2, f"updated version is {record.version}")
+        _expect(
+            (record.name, record.count) == ("updated", 1),
+            f"update merged into {record.name}, {record.count}",
+        )
+        _expect(record.changed_fields == ["name"], f"{record.changed_fields}")
+
+    def check_update_to_null(self) -> None:
+        uuid = self._create()
+        self.service.update(uuid, {"count": None})
+        record = self.service.read_active_record(uuid)
+        _expect(record.count is None, f"count is {record.count}")
+        _expect(record.changed_fields == ["count"], f"{record.changed_fields}")
+
+    def check_unchanged_update_is_skipped(self) -> None:
+        uuid = self._create()
+        skipped = self.service.skipped_updates
+        self.service.update(uuid, {"name": "created", "count": 1})
+        _expect(self.service.skipped_updates == skipped + 1, "update not skipped")
+        _expect(
+            self.service.read_active_record(uuid).version == 1,
+            "unchanged update wrote a record",
+        )
+
+    def check_unchanged_update_after_other_change(self) -> None:
+        # With delta storage the active record does not hold the unchanged fields
+        uuid = self._create("created", 0)
+        self.service.update(uuid, {"count": 1})
+        self.service.update(uuid, {"name": "created"})
+        self.service.update(uuid, {"count": 1})
+        version = self.service.read_active_record(uuid).version
+        _expect(version == 2, f"unchanged updates wrote up to version {version}")
+
+    def check_delete(self) -> None:
+        uuid = self._create()
+        self.service.delete(uuid)
+        record = self.service.read_active_record(uuid)
+        _expect(record.operation == OperationEnum.DELETED.value, "not a delete record")
+        _expect(record.version == 2, f"delete version is {record.version}")
+        _expect(record.name == "created", "delete dropped the data")
+        _expect(str(self.service.read(uuid).uuid) == uuid, "deleted node is gone")
+
+    def _create_edge(self, weight: Optional[int] = 1) -> str:
+        start, end = self._create("start"), self._create("end")
+        edge = self.edge_service.create(
+            {"start_uuid": start, "end_uuid": end, "weight": weight}
+        )
+        return str(edge.uuid)
+
+    def _edge_versions(self, uuid: str) -> List[int]:
+        return [record.version for record in self.edge_service.read_history(uuid)]
+
+    def check_edge_create_and_update(self) -> None:
+        uuid = self._create_edge()
+        self.edge_service.update(uuid, {"weight": 2})
+        edge = self.edge_service.update(uuid, {"weight": 3})
+        _expect((edge.version, edge.weight) == (3, 3), f"updated edge {edge}")
+        _expect(self.edge_service.read(uuid).weight == 3, "edge data not stored")
+        history = self.edge_service.read_history(uuid)
+        _expect(
+            [(record.version, record.weight) for record in history]
+            == [(1, 1), (2, 2), (3, 3)],
+            f"edge history {history}",
+        )
+
+    def check_edge_delete(self) -> None:
+        uuid = self._create_edge()
+        self.edge_service.delete(uuid)
+        try:
+            self.edge_service.read(uuid)
+        except ValueError:
+            pass
+        else:
+            raise ConformanceError("deleted edge is still readable")
+        history = self.edge_service.read_history(uuid)
+        _expect(
+            [record.operation for record in history]
+            == [OperationEnum.CREATED.value, OperationEnum.DELETED.value],
+            f"deleted edge history {history}",
+        )
+        _expect(history[-1].weight == 1, "delete dropped the edge data")
+
+    def check_edge_unknown_node(self) -> None:
+        outcomes = self.edge_service.create_many(
+            [{"start_uuid": self._create(), "end_uuid": str(uuid4())}]
+        )
+        _expect(isinstance(outcomes[0], ItemNotFound), f"outcome {outcomes[0]}")
+
+    def check_edge_updates_chain_in_order(self) -> None:
+        uuid = self._create_edge()
+        outcomes = self.edge_service.update_many(
+            [(uuid, {"weight": weight}) for weight in range(2, 6)]
+        )
+        _expect(
+            [outcome.version for outcome in outcomes] == [2, 3, 4, 5],
+            f"batch versions {outcomes}",
+        )
+        with ThreadPoolExecutor(4) as pool:
+            list(
+                pool.map(
+                    lambda weight: self.edge_service.update(uuid, {"weight": weight}),
+                    range(6, 14),
+                )
+            )
+        versions = self._edge_versions(uuid)
+        _expect(versions == list(range(1, 14)), f"edge chain forked: {versions}")
+
+    def check_expected_version(self) -> None:
+        uuid = self._create()
+        node = self.service.update(uuid, {"count": 2}, expected_version=1)
+        _expect(node.version == 2, f"node version is {node.version}")
+        conflicts = self.service.conflicts
+        try:
+            self.service.update(uuid, {"count": 3}, expected_version=1)
+        except VersionConflict:
+            pass
+        else:
+            raise ConformanceError("stale expected version did not conflict")
+        _expect(self.service.conflicts == conflicts + 1, "conflict not counted")
+        outcomes = self.service.update_many(
+            [(uuid, {"count": 4}, 1), (uuid, {"count": 5}, 2), (uuid, {"count": 6})]
+        )
+        _expect(
+            isinstance(outcomes[0], ItemConflict) and outcomes[0].version == 2,
+            f"batch conflict is {outcomes[0]}",
+        )
+        _expect(
+            [outcome.version for outcome in outcomes[1:]] == [3, 4],
+            f"batch versions {outcomes[1:]}",
+        )
+        node = self.service.modify(uuid, lambda record: {"count": record.count + 1})
+        record = self.service.read_active_record(uuid)
+        _expect((node.version, record.count) == (5, 7), f"modify wrote {record}")
+
+    def check_diff_and_revert(self) -> None:
+        uuid = self._create()
+        self.service.update(uuid, {"count": 2})
+        self.service.update(uuid, {"name": "changed"})
+        self.service.update(uuid, {"count": 3})
+        diff = self.service.diff(uuid, 1)
+        _expect(
+            diff == {"name": ("created", "changed"), "count": (1, 3)}, f"diff {diff}"
+        )
+        diff = self.service.diff(uuid, 2, 3)
+        _expect(diff == {"name": ("created", "changed")}, f"diff of 2 and 3 {diff}")
+        node = self.service.revert(uuid, 2, expected_version=4)
+        record = self.service.read_active_record(uuid)
+        _expect(
+            (node.version, record.name, record.count) == (5, "created", 2),
+            f"reverted to {record}",
+        )
+        _expect(record.changed_fields == ["name", "count"], f"{record.changed_fields}")
+        skipped = self.service.skipped_updates
+        self.service.revert(uuid, 5)
+        _expect(self.service.skipped_updates == skipped + 1, "revert to active wrote")
+
+    def check_read_version(self) -> None:
+        uuid = self._create()
+        for index in range(5):
+            self.service.update(uuid, {"count": index + 10})
+        for version in range(1, 7):
+            record = self.service.read_version(uuid, version)
+            expected = 1 if version == 1 else version + 8
+            _expect(
+                record is not None and record.count == expected,
+                f"version {version} has count {record and record.count}",
+            )
+        _expect(self.service.read_version(uuid, 7) is None, "version 7 exists")
+
+    def check_read_as_of(self) -> None:
+        before = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        uuid = self._create()
+        self.service.update(uuid, {"name": "latest"})
+        _expect(self.service.read_as_of(uuid, before) is None, "record before create")
+        record = self.service.read_as_of(uuid, datetime.now(timezone.utc))
+        _expect(record is not None and record.version == 2, "as of now is not latest")
+        first = self.service.read_version(uuid, 1)
+        record = self.service.read_as_of(uuid, first.created_at)
+        _expect(record is not None and record.name == "created", "as of first")
+
+    def check_read_many(self) -> None:
+        first, second = self._create("first"), self._create("second")
+        missing = str(uuid4())
+        outcomes = self.service.read_many([second, missing, first, second])
+        _expect(
+            [getattr(outcome, "uuid", None) for outcome in outcomes]
+            == [UUID(second), missing, UUID(first), UUID(second)],
+            f"read_many returned {outcomes}",
+        )
+        _expect(isinstance(outcomes[1], ItemNotFound), "miss is not ItemNotFound")
+
+    def check_snapshot_as_of(self) -> None:
+        name = f"snapshot {uuid4()}"
+        kept, deleted = self._create(name, 1), self._create(name, 1)
+        self.service.delete(deleted)
+        self.service.update(kept, {"count": 3})
+        middle = self.service.read_version(kept, 2).created_at
+        for index in range(3):
+            self.service.update(kept, {"count": index + 4})
+
+        def counts(timestamp, **kwargs) -> dict:
+            return {
+                uuid: record.count
+                for uuid, record in self.service.snapshot_as_of(
+                    timestamp, {"name": name}, page_size=2, **kwargs
+                )
+            }
+
+        now = datetime.now(timezone.utc)
+        _expect(counts(now) == {kept: 6}, f"snapshot now is {counts(now)}")
+        _expect(counts(middle) == {kept: 3}, f"snapshot before is {counts(middle)}")
+        _expect(
+            counts(now, include_deleted=True) == {kept: 6, deleted: 1},
+            "deleted node missing",
+        )
+        _expect(
+            not list(self.service.snapshot_as_of(now, {"name": name, "count": 1})),
+            "filter matched a stale state",
+        )
+
+    def check_bulk_load(self) -> None:
+        changes = [
+            (OperationEnum.CREATED, {"name": "loaded", "count": 1}),
+            (OperationEnum.UPDATED, {"count": 2}),
+            (OperationEnum.UPDATED, {"count": 2}),
+            (OperationEnum.UPDATED, {"count": "invalid"}),
+            (OperationEnum.UPDATED, {"count": None}),
+            (OperationEnum.DELETED, {}),
+            (OperationEnum.UPDATED, {"name": "restored", "count": 3}),
+        ]
+        replayed = self._create("loaded", 1)
+        for operation, data in changes[1:]:
+            try:
+                self.service.append_record(replayed, data, operation)
+            except ValueError:
+                continue
+
+        loaded = str(uuid4())
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        # Out of order, the loader sorts the changes of a node by time
+        backfill = [
+            {
+                "uuid": loaded,
+                "operation": operation,
+                "created_at": start + timedelta(seconds=index),
+                "data": data,
+            }
+            for index, (operation, data) in reversed(list(enumerate(changes)))
+        ]
+        loader = BulkLoader(
+            ConformanceModel,
+            ConformanceNode,
+            ConformanceRecord,
+            storage=self.storage,
+            snapshot_interval=2,
+            workers=1,
+            partitions=2,
+            batch_size=2,
+            backend=self.backend,
+            store=self.store,
+        )
+        with TemporaryDirectory() as directory:
+            progress = loader.load(directory, backfill)
+            _expect(
+                (progress.created, progress.records, progress.skipped_updates)
+                == (1, 5, 1)
+                and progress.invalid == 1,
+                f"load progress {progress}",
+            )
+            resumed = loader.load(directory)
+            _expect(resumed.records_per_second == 0, "resumed load wrote again")
+        with TemporaryDirectory() as directory:
+            repeated = loader.load(directory, backfill)
+            _expect(repeated.existing == 1, "loaded node written twice")
+
+        def history(uuid: str) -> list:
+            return [
+                record.model_dump(exclude={"uuid", "created_at"})
+                for record in self.service.iter_history(uuid, newest_first=False)
+            ]
+
+        _expect(history(loaded) == history(replayed), f"loaded {history(loaded)}")
+        _expect(
+            self.service.read(loaded).version == self.service.read(replayed).version,
+            "node versions differ",
+        )
+        record = self.service.read_as_of(loaded, start + timedelta(seconds=2))
+        _expect(record.count == 2, f"loaded state as of {record}")
+
+    def check_migrate_to_delta(self) -> None:
+        # Own labels, since the migration converts every node of its label
+        full, delta = (
+            ServiceFactory.create_service(
+                ConformanceModel,
+                ConformanceMigratedNode,
+                ConformanceMigratedRecord,
+                storage=storage,
+                snapshot_interval=2,
+                backend=self.backend,
+                store=self.store,
+            )
+            for storage in (RecordStorageEnum.FULL, RecordStorageEnum.DELTA)
+        )
+        uuid = str(full.create({"name": "migrated", "count": 0}).uuid)
+        for data in ({"count": 1}, {"name": "renamed"}, {"count": None}, {"count": 2}):
+            full.update(uuid, data)
+        states = [
+            full.read_version(uuid, version).model_dump(exclude={"changed_fields"})
+            for version in range(1, 6)
+        ]
+
+        converted = delta.record_chain_repo.migrate_to_delta(batch_size=1)
+        _expect(converted >= 5, f"{converted} records converted")
+        migrated = [
+            delta.read_version(uuid, version).model_dump(exclude={"changed_fields"})
+            for version in range(1, 6)
+        ]
+        _expect(migrated == states, f"migrated states {migrated}")
+        record = delta.read_version(uuid, 3)
+        _expect(record.changed_fields == ["name"], f"{record.changed_fields}")
+        _expect(
+            delta.record_chain_repo.migrate_to_delta() == 0, "migration not resumable"
+        )
+        delta.update(uuid, {"count": 3})
+        _expect(delta.read_active_record(uuid).version == 6, "update after migration")
+
+    def check_projections(self) -> None:
+        uuid = self._create("projected", 1)
+        for index in range(4):
+            self.service.update(uuid, {"name": f"name {index}"})
+        node = self.service.read(uuid, fields=["count"])
+        _expect((str(node.uuid), node.count) == (uuid, 1), f"projected read {node}")
+        _expect("name" not in type(node).model_fields, "projection has other fields")
+        record = self.service.read_active_record(uuid, fields=["name"])
+        _expect((record.version, record.name) == (5, "name 3"), f"active {record}")
+        record = self.service.read_version(uuid, 2, fields=["count"])
+        _expect((record.version, record.count) == (2, 1), f"version 2 {record}")
+        record = self.service.read_as_of(uuid, record.created_at, fields=["name"])
+        _expect(record.name == "name 0", f"as of version 2 is {record.name}")
+        full = list(self.service.iter_history(uuid, newest_first=False))
+        projected = list(
+            self.service.iter_history(
+                uuid, page_size=2, newest_first=False, fields=["name", "count"]
+            )
+        )
+        _expect(
+            [(p.uuid, p.version, p.name, p.count) for p in projected]
+            == [(r.uuid, r.version, r.name, r.count) for r in full],
+            "projected history differs",
+        )
+        try:
+            self.service.read(uuid, fields=["missing"])
+        except ValueError:
+            return
+        raise ConformanceError("unknown projected field did not raise ValueError")
+
+    def check_history_pages(self) -> None:
+        uuid = self._create()
+        for index in range(6):
+            self.service.update(uuid, {"name": f"name {index}", "count": index % 2})
+        full = list(self.service.iter_history(uuid, page_size=100))
+        paged = list(self.service.iter_history(uuid, page_size=2))
+        _expect(
+            [record.uuid for record in paged] == [record.uuid for record in full],
+            "pages differ from the full history",
+        )
+        _expect(
+            sorted(record.version for record in full) == list(range(1, 8)),
+            "history is incomplete",
+        )
+        oldest_first = list(
+            self.service.iter_history(uuid, page_size=3, newest_first=False)
+        )
+        _expect(
+            [record.uuid for record in oldest_first]
+            == [record.uuid for record in reversed(full)],
+            "oldest first is not the reversed history",
+        )
+        for record in full:
+            state = self.service.read_version(uuid, record.version)
+            _expect(
+                (record.name, record.count) == (state.name, state.count),
+                f"history version {record.version} differs from read_version",
+            )
+        changed = list(self.service.iter_history(uuid, changed_field="count"))
+        _expect(
+            {record.version for record in changed}
+            == {
+                record.version
+                for record in full
+                if "count" in (record.changed_fields or [])
+            },
+            "changed field filter is incomplete",
+        )
+
+    def check_change_feed(self) -> None:
+        start = datetime.now(timezone.utc).timestamp() - 1
+        uuid = self._create("fed", 1)
+        self.service.update(uuid, {"count": 2})
+        self.service.update(uuid, {"name": "renamed"})
+        self.service.update(uuid, {"count": None})
+        history = {record.uuid for record in self.service.iter_history(uuid)}
+        feed = ChangeFeed([self.service, self.edge_service])
+        changes = [
+            change.record
+            for change in feed.iter_changes(
+                ChangeCursor(created_at=start, uuid=""),
+                labels=["ConformanceNode"],
+                page_size=2,
+            )
+            if change.record.uuid in history
+        ]
+        _expect(
+            [record.version for record in changes] == [1, 2, 3, 4],
+            f"feed versions {[record.version for record in changes]}",
+        )
+        for record in changes:
+            state = self.service.read_version(uuid, record.version)
+            _expect(
+                (record.name, record.count) == (state.name, state.count),
+                f"feed version {record.version} is {record.name}, {record.count}",
+            )
+
+    def check_batch_outcomes(self) -> None:
+        created = self.service.create_many(
+            [{"name": "first"}, {"count": 1}, {"name": "third", "count": 3}]
+        )
+        _expect(isinstance(created[1], ItemInvalid), "invalid item was created")
+        _expect(created[1].index == 1, "invalid item has another index")
+        first, third = str(created[0].uuid), str(created[2].uuid)
+
+        unknown = str(uuid4())
+        updated = self.service.update_many(
+            [
+                (first, {"count": 1}),
+                (unknown, {"count": 1}),
+                (first, {"count": 2}),
+                (third, {"count": "many"}),
+            ]
+        )
+        _expect(isinstance(updated[1], ItemNotFound), "unknown uuid was updated")
+        _expect(updated[1].uuid == unknown, "not found item has another uuid")
+        _expect(isinstance(updated[3], ItemInvalid), "invalid update was written")
+        record = self.service.read_active_record(first)
+        _expect(
+            (record.version, record.count) == (3, 2),
+            "repeated uuids are not chained in order",
+        )
+
+        deleted = self.service.delete_many([third, unknown])
+        _expect(isinstance(deleted[1], ItemNotFound), "unknown uuid was deleted")
+        _expect(
+            self.service.read_active_record(third).operation
+            == OperationEnum.DELETED.value,
+            "batch delete not recorded",
+        )
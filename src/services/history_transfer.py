@@ -0,0 +1,564 @@
+import json
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from pydantic import BaseModel, Field
+from src.core.database import cypher_query
+from src.repositories.memory_repositories import MemoryStore
+from src.repositories.record_chain_repository import DEFAULT_BATCH_SIZE
+from src.services.recorded_edge_service import RecordedEdgeService
+from src.services.recorded_node_services import RecordedNodeService
+from src.types import TransferFormatEnum
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+NODE_COLUMNS = ("labels", "properties")
+RELATIONSHIP_COLUMNS = (
+    "type",
+    "start_label",
+    "start_uuid",
+    "end_label",
+    "end_uuid",
+    "properties",
+)
+
+
+def _name(name: str) -> str:
+    if not _NAME.match(name):
+        raise ValueError(f"Invalid label or relationship type {name}")
+    return name
+
+
+def time_partitions(
+    since: datetime, until: datetime, step: timedelta
+) -> List[Tuple[datetime, datetime]]:
+    """
+    Split a time range into consecutive partitions that can be exported in
+    parallel.
+
+    Args:
+        since: The start of the range, included.
+        until: The end of the range, excluded.
+        step: The length of a partition.
+
+    Returns: The (since, until) pairs of the partitions.
+
+    """
+    partitions = []
+    while since < until:
+        partitions.append((since, min(since + step, until)))
+        since += step
+    return partitions
+
+
+class _JsonLinesWriter:
+    def __init__(self, path: Path, columns: Tuple[str, ...]) -> None:
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows: List[dict]) -> None:
+        self.file.writelines(json.dumps(row) + "\n" for row in rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Parquet transfers need pyarrow, install it or use "
+            "TransferFormatEnum.JSONL"
+        ) from e
+    return pyarrow, pyarrow.parquet
+
+
+def _default_format() -> TransferFormatEnum:
+    # Parquet when pyarrow is installed, since it is an optional dependency
+    try:
+        _pyarrow()
+    except ImportError:
+        return TransferFormatEnum.JSONL
+    return TransferFormatEnum.PARQUET
+
+
+class _ParquetWriter:
+    # Properties differ per label, so they are stored as JSON strings
+    def __init__(self, path: Path, columns: Tuple[str, ...]) -> None:
+        pa, pq = _pyarrow()
+        self.pa = pa
+        self.schema = pa.schema(
+            [
+                (
+                    column,
+                    pa.list_(pa.string()) if column == "labels" else pa.string(),
+                )
+                for column in columns
+            ]
+        )
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows: List[dict]) -> None:
+        if not rows:
+            return
+        rows = [row | {"properties": json.dumps(row["properties"])} for row in rows]
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+_WRITERS = {
+    TransferFormatEnum.JSONL: _JsonLinesWriter,
+    TransferFormatEnum.PARQUET: _ParquetWriter,
+}
+
+
+def read_rows(
+    path: Union[str, Path], chunk_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[List[dict]]:
+    """
+    Read an exported file chunk by chunk.
+
+    Args:
+        path: A `.jsonl` or `.parquet` file written by `HistoryExporter`.
+        chunk_size: The maximum number of rows per chunk.
+
+    Returns: An iterator over the chunks of rows.
+
+    """
+    path = Path(path)
+    if path.suffix == f".{TransferFormatEnum.PARQUET.value}":
+        _, pq = _pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield [
+                row | {"properties": json.loads(row["properties"])}
+                for row in batch.to_pylist()
+            ]
+        return
+
+    with open(path, encoding="utf-8") as file:
+        chunk = []
+        for line in file:
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class ExportManifest(BaseModel):
+    label: str = Field(..., description="The node label or relationship type")
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    nodes_path: str
+    relationships_path: str
+    nodes: int = 0
+    relationships: int = 0
+
+
+class ImportReport(BaseModel):
+    nodes: int = 0
+    relationships: int = 0
+    statements: int = 0
+
+
+class _Source(BaseModel):
+    # One chunked scan of an export: entity nodes, records or recorded edges
+    label: str
+    relationship: bool = Field(False, description="Whether it scans relationships")
+    start_label: Optional[str] = None
+    end_label: Optional[str] = None
+    incoming: Tuple[str, ...] = ()  # Relationship types exported with the node
+    outgoing: Tuple[str, ...] = ()
+
+
+class HistoryExporter:
+    """
+    Streams the recorded history of a service into files: a nodes file with the
+    entity nodes or edge records and their records, and a relationships file with
+    the recorder relationships and recorded edges.
+
+    Each relationship is exported with the record or edge it belongs to, so the
+    files of partitions by label and time range can be exported in parallel and
+    imported together. The time range applies to `created_at`, reads are keyset
+    pages of `chunk_size` rows over the created_at indexes.
+
+    Example:
+        for since, until in time_partitions(start, end, timedelta(days=1)):
+            HistoryExporter(person_service).export("backup", since=since, until=until)
+        HistoryImporter().import_directory("backup")
+    """
+
+    def __init__(
+        self,
+        service: Union[RecordedNodeService, RecordedEdgeService],
+        chunk_size: int = 1000,
+    ) -> None:
+        self.service = service
+        self.chunk_size = chunk_size
+        if isinstance(service, RecordedEdgeService):
+            chain = service.edge_chain_repo
+            self.label = chain.rel_type
+            self.link_labels = {
+                chain.rel_type: (chain.start_label, chain.end_label),
+                chain.recorded_rel_type: (chain.start_label, chain.record_label),
+                chain.records_rel_type: (chain.record_label, chain.end_label),
+            }
+            self.sources = [
+                _Source(
+                    label=chain.rel_type,
+                    relationship=True,
+                    start_label=chain.start_label,
+                    end_label=chain.end_label,
+                ),
+                _Source(
+                    label=chain.record_label,
+                    incoming=(chain.recorded_rel_type,),
+                    outgoing=(chain.records_rel_type, "HAS_PREVIOUS_RECORD"),
+                ),
+            ]
+        else:
+            chain = service.record_chain_repo
+            self.label = chain.node_label
+            self.link_labels = {
+                "HAS_RECORD": (chain.node_label, chain.record_label),
+                "HAS_ACTIVE_RECORD": (chain.node_label, chain.record_label),
+            }
+            self.sources = [
+                _Source(label=chain.node_label),
+                _Source(
+                    label=chain.record_label,
+                    incoming=("HAS_RECORD", "HAS_ACTIVE_RECORD"),
+                    outgoing=("HAS_PREVIOUS_RECORD",),
+                ),
+            ]
+        self.link_labels["HAS_PREVIOUS_RECORD"] = (
+            chain.record_label,
+            chain.record_label,
+        )
+        self.created_at = chain.record_model.created_at
+        self.store: Optional[MemoryStore] = getattr(chain, "store", None)
+        self.queries = {source.label: self._compile(source) for source in self.sources}
+
+    @staticmethod
+    def _compile(source: _Source) -> str:
+        def in_range(variable: str) -> str:
+            return f"""
+                {variable}.created_at >= $since AND {variable}.created_at < $until
+                AND (
+                    {variable}.created_at > $after_created_at
+                    OR (
+                        {variable}.created_at = $after_created_at
+                        AND {variable}.uuid > $after_uuid
+                    )
+                )
+            """
+
+        if source.relationship:
+            return f"""
+                MATCH (start:{source.start_label})
+                    -[edge:{source.label}]->(end:{source.end_label})
+                WHERE {in_range("edge")}
+                RETURN edge.created_at AS created_at, edge.uuid AS uuid, null, null,
+                    [[type(edge), start.uuid, end.uuid, properties(edge)]]
+                ORDER BY created_at, uuid
+                LIMIT $chunk_size
+            """
+
+        links = "[]"
+        if source.incoming or source.outgoing:
+            links = f"""
+                [(start)-[link:{"|".join(source.incoming)}]->(node)
+                    | [type(link), start.uuid, node.uuid, properties(link)]]
+                + [(node)-[link:{"|".join(source.outgoing)}]->(end)
+                    | [type(link), node.uuid, end.uuid, properties(link)]]
+            """
+        return f"""
+            MATCH (node:{source.label})
+            WHERE {in_range("node")}
+            WITH node
+            ORDER BY node.created_at, node.uuid
+            LIMIT $chunk_size
+            RETURN node.created_at AS created_at, node.uuid AS uuid, labels(node),
+                properties(node), {links}
+            ORDER BY created_at, uuid
+        """
+
+    def _memory_rows(
+        self, source: _Source, since: float, until: float, after: tuple
+    ) -> List[list]:
+        store = self.store
+        with store.lock:
+            if source.relationship:
+                rows = []
+                for start, (rel_type, end, properties) in store.relationships.values():
+                    if rel_type == source.label:
+                        rows.append(
+                            [
+                                properties["created_at"],
+                                properties["uuid"],
+                                None,
+                                None,
+                                [[rel_type, start, end, dict(properties)]],
+                            ]
+                        )
+            else:
+                incoming: Dict[str, List[list]] = {}
+                for start, (rel_type, end, properties) in store.relationships.values():
+                    if rel_type in source.incoming:
+                        incoming.setdefault(end, []).append(
+                            [rel_type, start, end, dict(properties)]
+                        )
+                rows = [
+                    [
+                        node["created_at"],
+                        uuid,
+                        sorted(store.labels[uuid]),
+                        dict(node),
+                        incoming.get(uuid, [])
+                        + [
+                            [rel_type, uuid, end, dict(properties)]
+                            for rel_type, end, properties in store.outgoing.get(
+                                uuid, ()
+                            )
+                            if rel_type in source.outgoing
+                        ],
+                    ]
+                    for uuid, node in store.nodes.items()
+                    if source.label in store.labels[uuid]
+                ]
+        rows = [
+            row for row in rows if since <= row[0] < until and (row[0], row[1]) > after
+        ]
+        rows.sort(key=lambda row: (row[0], row[1]))
+        return rows[: self.chunk_size]
+
+    def _chunks(self, source: _Source, since: float, until: float) -> Iterator[list]:
+        after = (float("-inf"), "")
+        while True:
+            if self.store is not None:
+                rows = self._memory_rows(source, since, until, after)
+            else:
+                rows, _ = cypher_query(
+                    self.queries[source.label],
+                    {
+                        "since": since,
+                        "until": until,
+                        "after_created_at": after[0],
+                        "after_uuid": after[1],
+                        "chunk_size": self.chunk_size,
+                    },
+                )
+            if rows:
+                yield rows
+            if len(rows) < self.chunk_size:
+                return
+            after = (rows[-1][0], rows[-1][1])
+
+    def export(
+        self,
+        directory: Union[str, Path],
+        format: Optional[TransferFormatEnum] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> ExportManifest:
+        """
+        Export the history created in a time range.
+
+        Args:
+            directory: The directory of the files, created if missing.
+            format: Parquet, which needs pyarrow, or JSON Lines. Defaults to
+                Parquet if pyarrow is installed and JSON Lines otherwise.
+            since: Only nodes and relationships created at or after this time.
+            until: Only nodes and relationships created before this time.
+
+        Returns: The paths and row counts of the written files.
+
+        """
+        format = _default_format() if format is None else TransferFormatEnum(format)
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        # Like the record reads, naive bounds are UTC
+        start = float("-inf") if since is None else self.created_at.deflate(since)
+        end = float("inf") if until is None else self.created_at.deflate(until)
+        name = self.label
+        if since is not None or until is not None:
+            # Partitions of one label get distinct files
+            name += "." + "-".join(
+                "" if value is None else value.strftime("%Y%m%dT%H%M%S")
+                for value in (since, until)
+            )
+
+        manifest = ExportManifest(
+            label=self.label,
+            since=since,
+            until=until,
+            nodes_path=str(directory / f"{name}.nodes.{format.value}"),
+            relationships_path=str(directory / f"{name}.relationships.{format.value}"),
+        )
+        writer = _WRITERS[format]
+        nodes = writer(Path(manifest.nodes_path), NODE_COLUMNS)
+        relationships = writer(Path(manifest.relationships_path), RELATIONSHIP_COLUMNS)
+        try:
+            for source in self.sources:
+                for rows in self._chunks(source, start, end):
+                    node_rows = [
+                        {"labels": sorted(labels), "properties": dict(properties)}
+                        for _, _, labels, properties, _ in rows
+                        if labels is not None
+                    ]
+                    relationship_rows = [
+                        {
+                            "type": rel_type,
+                            "start_label": self.link_labels[rel_type][0],
+                            "start_uuid": start_uuid,
+                            "end_label": self.link_labels[rel_type][1],
+                            "end_uuid": end_uuid,
+                            "properties": dict(properties),
+                        }
+                        for *_, links in rows
+                        for rel_type, start_uuid, end_uuid, properties in links
+                    ]
+                    nodes.write(node_rows)
+                    relationships.write(relationship_rows)
+                    manifest.nodes += len(node_rows)
+                    manifest.relationships += len(relationship_rows)
+        finally:
+            nodes.close()
+            relationships.close()
+        return manifest
+
+
+class HistoryImporter:
+    """
+    Rebuilds exported histories with batched UNWIND writes.
+
+    Nodes and relationships are merged on their uuid with their exported
+    properties, so an interrupted import can be repeated. All nodes files are
+    imported before the relationships files.
+    """
+
+    def __init__(
+        self, batch_size: int = DEFAULT_BATCH_SIZE, store: Optional[MemoryStore] = None
+    ) -> None:
+        """
+        Args:
+            batch_size: The number of rows per statement.
+            store: Import into this memory store instead of Neo4j.
+        """
+        self.batch_size = batch_size
+        self.store = store
+        self._queries: Dict[Tuple, str] = {}
+
+    def _node_query(self, labels: Tuple[str, ...]) -> str:
+        if labels not in self._queries:
+            self._queries[
+                labels
+            ] = f"""
+                UNWIND $rows AS row
+                MERGE (node:{":".join(_name(label) for label in labels)}
+                    {{uuid: row.properties.uuid}})
+                SET node = row.properties
+            """
+        return self._queries[labels]
+
+    def _relationship_query(self, key: Tuple[str, str, str]) -> str:
+        if key not in self._queries:
+            rel_type, start_label, end_label = (_name(name) for name in key)
+            self._queries[
+                key
+            ] = f"""
+                UNWIND $rows AS row
+                MATCH (start:{start_label} {{uuid: row.start_uuid}})
+                MATCH (end:{end_label} {{uuid: row.end_uuid}})
+                MERGE (start)-[link:{rel_type} {{uuid: row.properties.uuid}}]->(end)
+                SET link = row.properties
+            """
+        return self._queries[key]
+
+    def _write_nodes(self, rows: List[dict], report: ImportReport) -> None:
+        if self.store is not None:
+            with self.store.lock:
+                for row in rows:
+                    self._memory_node(row["labels"], row["properties"])
+            return
+
+        groups: Dict[Tuple[str, ...], List[dict]] = {}
+        for row in rows:
+            groups.setdefault(tuple(row["labels"]), []).append(row)
+        for labels, group in groups.items():
+            cypher_query(self._node_query(labels), {"rows": group})
+            report.statements += 1
+
+    def _memory_node(self, labels: List[str], properties: dict) -> None:
+        store = self.store
+        uuid = properties["uuid"]
+        key = properties.get("entity_uuid") or properties.get("edge_uuid")
+        if uuid in store.nodes:
+            store.nodes[uuid].clear()
+            store.nodes[uuid].update(properties)
+            store.labels[uuid] = frozenset(labels)
+        elif key is not None and properties.get("version") is not None:
+            store.add_record(labels, properties, key)
+            store.timelines[key].sort(key=lambda record: record["version"])
+        else:
+            store.add_node(labels, properties)
+
+    def _write_relationships(self, rows: List[dict], report: ImportReport) -> None:
+        if self.store is not None:
+            with self.store.lock:
+                for row in rows:
+                    if row["properties"]["uuid"] in self.store.relationships:
+                        self.store.unrelate(row["properties"]["uuid"])
+                    self.store.relate(
+                        row["start_uuid"],
+                        row["type"],
+                        row["end_uuid"],
+                        row["properties"],
+                    )
+            return
+
+        groups: Dict[Tuple[str, str, str], List[dict]] = {}
+        for row in rows:
+            key = (row["type"], row["start_label"], row["end_label"])
+            groups.setdefault(key, []).append(row)
+        for key, group in groups.items():
+            cypher_query(self._relationship_query(key), {"rows": group})
+            report.statements += 1
+
+    def import_files(self, paths: Iterable[Union[str, Path]]) -> ImportReport:
+        """
+        Import exported files.
+
+        Args:
+            paths: The nodes and relationships files of one or more exports.
+
+        Returns: The numbers of imported nodes, relationships and statements.
+
+        """
+        paths = [Path(path) for path in paths]
+        report = ImportReport()
+        for kind in ("nodes", "relationships"):
+            for path in sorted(path for path in paths if f".{kind}." in path.name):
+                for rows in read_rows(path, self.batch_size):
+                    if kind == "nodes":
+                        self._write_nodes(rows, report)
+                        report.nodes += len(rows)
+                    else:
+                        self._write_relationships(rows, report)
+                        report.relationships += len(rows)
+        return report
+
+    def import_directory(self, directory: Union[str, Path]) -> ImportReport:
+        """
+        Import every exported file of a directory.
+        """
+        return self.import_files(
+            path
+            for path in Path(directory).iterdir()
+            if path.suffix[1:] in {format.value for format in TransferFormatEnum}
+        )
@@ -1,5 +1,6 @@
 from typing import Type, TypeVar, Generic
 from pydantic import ValidationError, BaseModel
+from src.core.instrumentation import ValidationSpan, instrumented
 from src.repositories import NodeRepository
 from src.models.pydantic_models import (
     NodeModel,
@@ -29,15 +30,18 @@ class NodeRecordService(Generic[TRead]):
         self.repository = repository
         self.create_model = create_model
 
+    @instrumented
     def create(self, data: dict) -> TRead:
         # Validierung und Konvertierung der Eingabedaten in ein Pydantic-Objekt
 
         try:
-            validated_data = self.create_model.model_validate(data)
+            with ValidationSpan():
+                validated_data = self.create_model.model_validate(data)
         except ValidationError as e:
             raise ValueError("Validation error while creating entity") from e
 
         return self.repository.create(validated_data)
 
+    @instrumented
     def read(self, uuid: str) -> TRead:
         return self.repository.read(uuid)
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from pydantic import BaseModel
+from threading import Lock
+from time import monotonic
+from typing import Optional
+
+DEFAULT_CACHE_SIZE = 10_000
+DEFAULT_CACHE_TTL = 60.0
+
+
+class ReadCacheStats(BaseModel):
+    size: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class _CacheEntry:
+    __slots__ = ("node", "record", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.node: Optional[BaseModel] = None
+        self.record: Optional[BaseModel] = None
+        self.expires_at = expires_at
+
+
+class ReadCache:
+    """
+    Bounded LRU cache of the read model and active record of recorded nodes.
+
+    Entries are evicted when the cache is full or `ttl` seconds after they were last
+    written. The service that owns the cache updates it with its own writes. Writes
+    of other processes become visible after the TTL at the latest.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_CACHE_SIZE,
+        ttl: Optional[float] = DEFAULT_CACHE_TTL,
+    ) -> None:
+        """
+        Args:
+            max_size: The maximum number of cached nodes.
+            ttl: The time in seconds an entry stays valid. None keeps entries until
+                they are evicted by size.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be positive")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _expires_at(self) -> float:
+        return monotonic() + self.ttl if self.ttl is not None else float("inf")
+
+    def _get(self, uuid: str, slot: str) -> Optional[BaseModel]:
+        key = str(uuid)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= monotonic():
+                del self._entries[key]
+                self._evictions += 1
+                entry = None
+            value = getattr(entry, slot) if entry is not None else None
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def _put(self, uuid: str, slot: str, value: Optional[BaseModel]) -> None:
+        key = str(uuid)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if value is None:
+                    return
+                entry = self._entries[key] = _CacheEntry(self._expires_at())
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+            elif value is not None:
+                entry.expires_at = self._expires_at()
+            setattr(entry, slot, value)
+            self._entries.move_to_end(key)
+
+    def get_node(self, uuid: str) -> Optional[BaseModel]:
+        """Returns: The cached read model of the node or None."""
+        return self._get(uuid, "node")
+
+    def get_record(self, uuid: str) -> Optional[BaseModel]:
+        """Returns: The cached active record of the node or None."""
+        return self._get(uuid, "record")
+
+    def put_node(self, uuid: str, node: BaseModel) -> None:
+        self._put(uuid, "node", node)
+
+    def put_record(self, uuid: str, record: BaseModel) -> None:
+        self._put(uuid, "record", record)
+
+    def invalidate_record(self, uuid: str) -> None:
+        """Drop the cached active record of a node and keep its read model."""
+        self._put(uuid, "record", None)
+
+    def invalidate(self, uuid: str) -> None:
+        with self._lock:
+            self._entries.pop(str(uuid), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self) -> ReadCacheStats:
+        with self._lock:
+            return ReadCacheStats(
+                size=len(self._entries),
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+            )
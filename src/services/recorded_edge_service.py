@@ -0,0 +1,226 @@
+from typing import Type, TypeVar, Generic, Iterable, Tuple, List
+from pydantic import ValidationError, BaseModel
+from src.core.instrumentation import ValidationSpan, instrumented
+from src.repositories import EdgeRecordChainRepository
+from src.repositories.record_chain_repository import DEFAULT_BATCH_SIZE
+from src.types import OperationEnum
+from src.models.pydantic_models import EdgeModel, ItemInvalid, ItemNotFound
+from src.models.neomodel_entities import EdgeRecord
+
+TCreate = TypeVar("TCreate", bound=BaseModel)  # Pydantic create class
+TRead = TypeVar("TRead", bound=EdgeModel)  # Pydantic read class
+TUpdate = TypeVar("TUpdate", bound=BaseModel)
+
+TEdgeRecord = TypeVar("TEdgeRecord", bound=EdgeRecord)
+
+# Fields of the create model that select the nodes instead of holding edge data
+EDGE_ENDPOINT_FIELDS = {"start_uuid", "end_uuid"}
+
+
+class RecordedEdgeService(Generic[TEdgeRecord, TRead]):
+    """
+    Creates, updates and deletes relationships between recorded nodes and records
+    every change in an `EdgeRecord` chain. Each change is one Cypher statement and
+    runs in one transaction.
+    """
+
+    def __init__(
+        self,
+        edge_chain_repo: EdgeRecordChainRepository,
+        create_model: Type[TCreate],
+        read_model: Type[TRead],
+        update_model: Type[TUpdate],
+        record_read_model: Type[BaseModel],
+    ) -> None:
+        self.edge_chain_repo = edge_chain_repo
+        self.create_model = create_model
+        self.read_model = read_model
+        self.update_model = update_model
+        self.record_read_model = record_read_model
+
+    @instrumented
+    def create(self, data: dict) -> TRead:
+        """
+        Create a relationship and its first record.
+
+        Args:
+            data: The uuids of the start and end node and the edge data.
+
+        Returns: The recorded edge.
+
+        """
+        outcome = self.create_many([data])[0]
+        if isinstance(outcome, ItemInvalid):
+            raise ValueError(f"Validation error while creating edge: {outcome.error}")
+        if isinstance(outcome, ItemNotFound):
+            raise ValueError(f"Node with uuid {outcome.uuid} not found")
+        return outcome
+
+    @instrumented
+    def read(self, uuid: str) -> TRead:
+        edge = self.edge_chain_repo.read_edge(uuid)
+        if edge is None:
+            raise ValueError(f"Edge with uuid {uuid} not found")
+        return self.read_model.model_validate(edge)
+
+    @instrumented
+    def read_between(self, start_uuid: str, end_uuid: str) -> List[TRead]:
+        """
+        Read the relationships from a start node to an end node.
+
+        Args:
+            start_uuid: The uuid of the start node.
+            end_uuid: The uuid of the end node.
+
+        Returns: The recorded edges ordered by creation time.
+
+        """
+        return [
+            self.read_model.model_validate(edge)
+            for edge in self.edge_chain_repo.read_edges_between(start_uuid, end_uuid)
+        ]
+
+    @instrumented
+    def read_history(self, uuid: str) -> List[BaseModel]:
+        """
+        Read the records of a relationship, also after it was deleted.
+
+        Args:
+            uuid: The uuid of the edge.
+
+        Returns: The record read models ordered by version.
+
+        """
+        return [
+            self.record_read_model.model_validate(record)
+            for record in self.edge_chain_repo.read_history(uuid)
+        ]
+
+    @instrumented
+    def append_record(self, uuid: str, data: dict, operation: OperationEnum) -> TRead:
+        outcome = self._append_many([(uuid, data)], operation, DEFAULT_BATCH_SIZE)[0]
+        if isinstance(outcome, ItemInvalid):
+            raise ValueError(f"Validation error while recording edge: {outcome.error}")
+        if isinstance(outcome, ItemNotFound):
+            raise ValueError(f"Edge with uuid {uuid} not found")
+        return outcome
+
+    @instrumented
+    def update(self, uuid: str, data: dict) -> TRead:
+        return self.append_record(uuid, data, OperationEnum.UPDATED)
+
+    @instrumented
+    def delete(self, uuid: str) -> TRead:
+        return self.append_record(uuid, {}, OperationEnum.DELETED)
+
+    @instrumented
+    def create_many(
+        self, items: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[TRead | ItemNotFound | ItemInvalid]:
+        """
+        Create relationships and their first records in UNWIND batches.
+
+        Args:
+            items: The uuids of the start and end node and the edge data per edge.
+            batch_size: The maximum number of edges per statement.
+
+        Returns: One outcome per item in input order, either the read model of the
+            created edge, an `ItemNotFound` with the uuid of a missing node or an
+            `ItemInvalid` for data that failed validation.
+
+        """
+        outcomes = []
+        valid_items = []
+        for index, data in enumerate(items):
+            try:
+                with ValidationSpan():
+                    validated_data = self.create_model.model_validate(data)
+            except ValidationError as e:
+                outcomes.append(ItemInvalid(index=index, error=str(e)))
+                continue
+            outcomes.append(None)
+            valid_items.append(
+                (
+                    index,
+                    validated_data.start_uuid,
+                    validated_data.end_uuid,
+                    validated_data.model_dump(exclude=EDGE_ENDPOINT_FIELDS),
+                )
+            )
+
+        endpoints = {index: (start, end) for index, start, end, _ in valid_items}
+        for index, has_start, has_end, edge, _ in self.edge_chain_repo.create_edges(
+            valid_items, batch_size
+        ):
+            if edge is None:
+                start_uuid, end_uuid = endpoints[index]
+                outcomes[index] = ItemNotFound(
+                    uuid=str(end_uuid if has_start else start_uuid)
+                )
+                continue
+            outcomes[index] = self.read_model.model_validate(edge)
+        return outcomes
+
+    def _append_many(
+        self,
+        items: Iterable[Tuple[str, dict]],
+        operation: OperationEnum,
+        batch_size: int,
+    ) -> List[TRead | ItemNotFound | ItemInvalid]:
+        outcomes = []
+        valid_items = []
+        for index, (uuid, data) in enumerate(items):
+            try:
+                with ValidationSpan():
+                    validated_data = self.update_model.model_validate(data)
+            except ValidationError as e:
+                outcomes.append(ItemInvalid(index=index, error=str(e)))
+                continue
+            outcomes.append(ItemNotFound(uuid=str(uuid)))
+            valid_items.append(
+                (index, uuid, validated_data.model_dump(exclude_unset=True), operation)
+            )
+
+        for index, edge, _ in self.edge_chain_repo.append_edges(
+            valid_items, batch_size
+        ):
+            outcomes[index] = self.read_model.model_validate(edge)
+        return outcomes
+
+    @instrumented
+    def update_many(
+        self, items: Iterable[Tuple[str, dict]], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[TRead | ItemNotFound | ItemInvalid]:
+        """
+        Record updates of many relationships in UNWIND batches.
+
+        Args:
+            items: Pairs of an edge uuid and its changed data. A uuid may occur more
+                than once, its updates are recorded in input order.
+            batch_size: The maximum number of records per statement.
+
+        Returns: One outcome per item in input order, either the read model of the
+            edge, an `ItemNotFound` for unknown uuids or an `ItemInvalid` for data
+            that failed validation.
+
+        """
+        return self._append_many(items, OperationEnum.UPDATED, batch_size)
+
+    @instrumented
+    def delete_many(
+        self, uuids: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[TRead | ItemNotFound]:
+        """
+        Delete many relationships in UNWIND batches and record the deletes.
+
+        Args:
+            uuids: The uuids of the edges to delete.
+            batch_size: The maximum number of records per statement.
+
+        Returns: One outcome per uuid in input order, either the read model of the
+            edge as it was deleted or an `ItemNotFound` for unknown uuids.
+
+        """
+        return self._append_many(
+            ((uuid, {}) for uuid in uuids), OperationEnum.DELETED, batch_size
+        )
@@ -1,29 +1,44 @@
-from typing import Type, TypeVar, Generic
+from datetime import datetime
+from random import uniform
+from time import sleep
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Type,
+    TypeVar,
+    Generic,
+    Optional,
+    Iterable,
+    Iterator,
+    Tuple,
+    List,
+)
 from pydantic import ValidationError, BaseModel
-from src.repositories import NodeRepository, EdgeRepository
-from src.types import OperationEnum
+from src.core.instrumentation import ValidationSpan, instrumented
+from src.repositories import NodeRepository, RecordChainRepository
+from src.repositories.record_chain_repository import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_SNAPSHOT_INTERVAL,
+)
+from src.types import OperationEnum, RecordStorageEnum
 from src.models.pydantic_models import (
     NodeModel,
-    HasRecordCreate,
-    HasRecordRead,
-    HasRecordUpdate,
-    HasActiveRecordRead,
-    HasActiveRecordCreate,
-    HasActiveRecordUpdate,
-    HasPreviousRecordCreate,
-    HasPreviousRecordRead,
-    HasPreviousRecordUpdate,
+    ItemConflict,
+    ItemInvalid,
+    ItemNotFound,
+    RecordReadModel,
+    create_projection_model,
 )
 from src.models.neomodel_entities import (
     RecorderEdge,
     RecordedNode,
     NodeRecord,
-    HasRecord,
-    HasActiveRecord,
-    HasPreviousRecord,
 )
 
 from src.services import NodeRecordService
+from src.services.read_cache import ReadCache
 
 TNodeRepo = TypeVar("TNodeRepo", bound=NodeRepository)
 TCreate = TypeVar("TCreate", bound=BaseModel)  # Pydantic create class
@@ -35,182 +50,655 @@ TRecord = TypeVar("TRecord", bound=NodeRecord)
 TRelationship = TypeVar("TRelationship", bound=RecorderEdge)
 
 
+class VersionConflict(ValueError):
+    """A change was not recorded because the node was at another version."""
+
+
 class RecordedNodeService(Generic[TEntity, TRecord, TRead]):
     def __init__(
         self,
         repository: TNodeRepo,
         record_service: NodeRecordService,
         create_model: Type[TCreate],
+        update_model: Optional[Type[TUpdate]] = None,
+        storage: RecordStorageEnum = RecordStorageEnum.FULL,
+        snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+        cache: Optional[ReadCache] = None,
+        record_chain_repo: Optional[RecordChainRepository] = None,
     ) -> None:
         self.repository = repository
         self.record_service = record_service
         self.create_model = create_model
+        self.update_model = update_model or record_service.create_model
+        self.cache = cache
+
+        if record_chain_repo is None:
+            record_chain_repo = RecordChainRepository[TEntity, TRecord](
+                node_model=self.repository.node_model,
+                record_model=self.record_service.repository.node_model,
+                storage=storage,
+                snapshot_interval=snapshot_interval,
+            )
+        self.record_chain_repo = record_chain_repo
+
+    def disable_cache(self) -> None:
+        """
+        Stop caching reads of this service and drop the cached entries.
+        """
+        if self.cache is not None:
+            self.cache.clear()
+        self.cache = None
+
+    def _cache_write(self, node: TRead, record_instance: TRecord) -> None:
+        # Write-through of the node and the record written for it
+        if self.cache is None:
+            return
+        self.cache.put_node(node.uuid, node)
+        if self.record_chain_repo.storage == RecordStorageEnum.FULL:
+            self.cache.put_record(
+                node.uuid,
+                self.record_service.repository.read_model.model_validate(
+                    record_instance
+                ),
+            )
+        else:
+            # Delta records hold only the changed fields
+            self.cache.invalidate_record(node.uuid)
 
-        self.has_record_repo = EdgeRepository[
-            HasRecord,
-            TEntity,
-            TRecord,
-            HasRecordCreate,
-            HasRecordRead,
-            HasRecordUpdate,  # TODO: HasRecordUpdate is unused
-        ](
-            rel_model=HasRecord,
-            start_node_model=self.repository.node_model,
-            end_node_model=self.record_service.repository.node_model,
-            create_model=HasRecordCreate,
-            read_model=HasRecordRead,
-        )
-
-        self.has_active_record_repo = EdgeRepository[
-            HasActiveRecord,
-            TEntity,
-            TRecord,
-            HasActiveRecordCreate,
-            HasActiveRecordRead,
-            HasActiveRecordUpdate,
-        ](
-            rel_model=HasActiveRecord,
-            start_node_model=self.repository.node_model,
-            end_node_model=self.record_service.repository.node_model,
-            create_model=HasActiveRecordCreate,
-            read_model=HasActiveRecordRead,
-        )
-
-        self.has_previous_record_repo = EdgeRepository[
-            HasPreviousRecord,
-            TRecord,
-            TRecord,
-            HasPreviousRecordCreate,
-            HasPreviousRecordRead,
-            HasPreviousRecordUpdate,
-        ](
-            rel_model=HasPreviousRecord,
-            start_node_model=self.record_service.repository.node_model,
-            end_node_model=self.record_service.repository.node_model,
-            create_model=HasPreviousRecordCreate,
-            read_model=HasPreviousRecordRead,
-        )
-
+    @instrumented
     def create_node(self, data: dict) -> TRead:
         # Validierung und Konvertierung der Eingabedaten in ein Pydantic-Objekt
         try:
-            validated_data = self.create_model.model_validate(data)
+            with ValidationSpan():
+                validated_data = self.create_model.model_validate(data)
         except ValidationError as e:
             raise ValueError("Validation error while creating entity") from e
 
         return self.repository.create(validated_data)
 
+    @instrumented
     def create(self, data: dict) -> TRead:
-        # Create recorded node
-        read_node = self.create_node(data)
-
-        # Create node record
-        record_data = data | {"operation": OperationEnum.CREATED}
-        read_record = self.record_service.create(record_data)
+        try:
+            with ValidationSpan():
+                validated_data = self.create_model.model_validate(data)
+        except ValidationError as e:
+            raise ValueError("Validation error while creating entity") from e
 
-        # Connect recorded node by has record edge to node record
-        has_record_create = HasRecordCreate(
-            start_uuid=read_node.uuid, end_uuid=read_record.uuid
+        # Create recorded node, first record and record edges in one statement
+        node_instance, record_instance = self.record_chain_repo.create_record(
+            validated_data.model_dump()
         )
-        self.has_record_repo.create("records", has_record_create)
-
-        # Connect recorded node by has active record edge to node record
-        has_active_record_create = HasActiveRecordCreate(
-            start_uuid=read_node.uuid, end_uuid=read_record.uuid
+        node = self.repository.read_model.model_validate(node_instance)
+        self._cache_write(node, record_instance)
+        return node
+
+    def _projection_model(self, fields: Tuple[str, ...]) -> Type[BaseModel]:
+        # Partial record read model with the record metadata and the fields
+        return create_projection_model(
+            self.record_service.repository.read_model,
+            fields,
+            tuple(RecordReadModel.model_fields),
         )
-        self.has_active_record_repo.create("active_record", has_active_record_create)
-
-        # Return the recorded node
-        return read_node
-
-    def read(self, uuid: str) -> TRead:
-        return self.repository.read(uuid)
-
-    def update(self, uuid: str, data: dict) -> TRead | False:
-        read_node = self.repository.read(uuid)
-        if read_node:
-
-            # Get has active record edge
-            read_has_active_record = self.has_active_record_repo.read(
-                relationship="active_record",
-                uuid=read_node.uuid,
-            )
-
-            # Get old data from active record node
-            read_active_record = self.record_service.read(
-                uuid=read_has_active_record.end_uuid
-            )
-            old_data = read_active_record.dict()
-            del old_data["uuid"]
-            del old_data["created_at"]
-
-            # Create node record
-            record_data = old_data | data | {"operation": OperationEnum.UPDATED}
-            read_record = self.record_service.create(record_data)
-
-            # Connect recorded node by has record edge to node record
-            rel_data = HasRecordCreate(
-                start_uuid=read_node.uuid, end_uuid=read_record.uuid
-            )
-            self.has_record_repo.create("records", rel_data)
 
-            # Connect recorded node by has active record edge to node record
-            has_active_record_update = HasActiveRecordUpdate(
-                start_uuid=read_node.uuid, end_uuid=read_record.uuid
+    def _read_projection(
+        self, kind: str, params: dict, fields: Iterable[str]
+    ) -> Optional[BaseModel]:
+        fields = tuple(fields)
+        values = self.record_chain_repo.read_projection(kind, params, fields)
+        if values is None:
+            return None
+        return self._projection_model(fields).model_validate(values)
+
+    @instrumented
+    def read(self, uuid: str, fields: Optional[Iterable[str]] = None) -> TRead:
+        """
+        Read a recorded node.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            fields: Read only these data fields of its active state instead of the
+                node.
+
+        Returns: The read model of the node, or with fields a projection with the
+            node uuid and the fields.
+
+        """
+        if fields is not None:
+            fields = tuple(fields)
+            values = self.record_chain_repo.read_projection(
+                "active", {"uuid": str(uuid)}, fields
             )
-            read_has_active_record = self.has_active_record_repo.update(
-                "active_record", has_active_record_update
+            if values is None:
+                raise ValueError(f"Node with uuid {uuid} not found")
+            projection_model = create_projection_model(
+                self.record_service.repository.read_model, fields
             )
+            return projection_model.model_validate(values | {"uuid": uuid})
+
+        if self.cache is None:
+            return self.repository.read(uuid)
+
+        node = self.cache.get_node(uuid)
+        if node is None:
+            node = self.repository.read(uuid)
+            self.cache.put_node(uuid, node)
+        return node
+
+    @instrumented
+    def read_many(self, uuids: Iterable[str]) -> List[TRead | ItemNotFound]:
+        """
+        Read many recorded nodes with one lookup for all uuids missing from the
+        cache.
+
+        Args:
+            uuids: The uuids of the nodes.
+
+        Returns: One outcome per uuid in input order, either the read model of the
+            node or an `ItemNotFound` for unknown uuids.
+
+        """
+        uuids = [str(uuid) for uuid in uuids]
+        found: Dict[str, TRead] = {}
+        if self.cache is not None:
+            for uuid in uuids:
+                node = self.cache.get_node(uuid)
+                if node is not None:
+                    found[uuid] = node
+
+        missing = list(dict.fromkeys(uuid for uuid in uuids if uuid not in found))
+        if missing:
+            nodes = self.repository.read_many(missing)
+            found.update(nodes)
+            if self.cache is not None:
+                for uuid, node in nodes.items():
+                    self.cache.put_node(uuid, node)
+        return [found.get(uuid) or ItemNotFound(uuid=uuid) for uuid in uuids]
+
+    @instrumented
+    def read_active_record(
+        self, uuid: str, fields: Optional[Iterable[str]] = None
+    ) -> BaseModel:
+        """
+        Read the active record of a recorded node.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            fields: Read only these data fields, as a projection of the record.
+
+        Returns: The record read model of the active record.
+
+        """
+        if self.cache is not None:
+            record = self.cache.get_record(uuid)
+            if record is not None:
+                if fields is not None:
+                    return self._projection_model(tuple(fields)).model_validate(record)
+                return record
+
+        if fields is not None:
+            record = self._read_projection("active", {"uuid": str(uuid)}, fields)
+            if record is None:
+                raise ValueError(f"Node with uuid {uuid} not found")
+            return record
+
+        record_instance = self.record_chain_repo.read_active_record(uuid)
+        if record_instance is None:
+            raise ValueError(f"Node with uuid {uuid} not found")
+        record = self.record_service.repository.read_model.model_validate(
+            record_instance
+        )
+        if self.cache is not None:
+            self.cache.put_record(uuid, record)
+        return record
 
-            has_previous_record_create = HasPreviousRecordCreate(
-                start_uuid=read_active_record.uuid,
-                end_uuid=read_has_active_record.end_uuid,
+    @instrumented
+    def read_as_of(
+        self,
+        uuid: str,
+        timestamp: datetime,
+        fields: Optional[Iterable[str]] = None,
+    ) -> Optional[BaseModel]:
+        """
+        Read the record of a recorded node that was active at a point in time.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            timestamp: The point in time.
+            fields: Read only these data fields, as a projection of the record.
+
+        Returns: The record read model or None if the node had no record at that time.
+
+        """
+        if fields is not None:
+            return self._read_projection(
+                "as_of", self.record_chain_repo.as_of_params(uuid, timestamp), fields
             )
-            self.has_previous_record_repo.create("previous", has_previous_record_create)
-
-            return read_node
-        return False
-
-    def delete(self, uuid: str) -> TRead | False:
-        read_node = self.repository.read(uuid)
-        if read_node:
-
-            # Get has active record edge
-            read_has_active_record = self.has_active_record_repo.read(
-                relationship="active_record",
-                uuid=read_node.uuid,
+        record_instance = self.record_chain_repo.read_record_as_of(uuid, timestamp)
+        if record_instance is None:
+            return None
+        return self.record_service.repository.read_model.model_validate(record_instance)
+
+    @instrumented
+    def read_version(
+        self, uuid: str, version: int, fields: Optional[Iterable[str]] = None
+    ) -> Optional[BaseModel]:
+        """
+        Read a record of a recorded node by its version number.
+
+        The first record of a node has version 1, every change increments it by one.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            version: The version number of the record.
+            fields: Read only these data fields, as a projection of the record.
+
+        Returns: The record read model or None if the version does not exist.
+
+        """
+        if fields is not None:
+            return self._read_projection(
+                "version", {"uuid": str(uuid), "version": version}, fields
             )
+        record_instance = self.record_chain_repo.read_record_version(uuid, version)
+        if record_instance is None:
+            return None
+        return self.record_service.repository.read_model.model_validate(record_instance)
 
-            # Get old data from active record node
-            read_active_record = self.record_service.read(
-                uuid=read_has_active_record.end_uuid
+    @instrumented
+    def iter_history(
+        self,
+        uuid: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        page_size: int = DEFAULT_BATCH_SIZE,
+        newest_first: bool = True,
+        changed_field: Optional[str] = None,
+        fields: Optional[Iterable[str]] = None,
+    ) -> Iterator[BaseModel]:
+        """
+        Iterate lazily over the records of a recorded node.
+
+        The records are fetched page by page with keyset pagination over
+        (created_at, uuid), so only one page is held in memory at a time.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            since: Only records created at or after this point in time.
+            until: Only records created at or before this point in time.
+            page_size: The number of records fetched per round-trip.
+            newest_first: Whether to start with the newest record.
+            changed_field: Only records whose operation changed this field.
+            fields: Read only these data fields, as projections of the records.
+
+        Returns: An iterator over the record read models.
+
+        """
+        if fields is not None:
+            fields = tuple(fields)
+            projection_model = self._projection_model(fields)
+            after = None
+            while True:
+                page = self.record_chain_repo.read_history_projection(
+                    uuid,
+                    fields,
+                    since,
+                    until,
+                    after,
+                    page_size,
+                    newest_first,
+                    changed_field,
+                )
+                for values in page:
+                    yield projection_model.model_validate(values)
+                if len(page) < page_size:
+                    return
+                after = (page[-1]["created_at"], page[-1]["uuid"])
+
+        read_model = self.record_service.repository.read_model
+        after = None
+        while True:
+            page = self.record_chain_repo.read_history_page(
+                uuid, since, until, after, page_size, newest_first, changed_field
             )
-            old_data = read_active_record.dict()
-            del old_data["uuid"]
-            del old_data["created_at"]
-
-            # Create node record
-            record_data = old_data | {"operation": OperationEnum.DELETED}
-            read_record = self.record_service.create(record_data)
-
-            # Connect recorded node by has record edge to node record
-            rel_data = HasRecordCreate(
-                start_uuid=read_node.uuid, end_uuid=read_record.uuid
+            for record_instance in page:
+                yield read_model.model_validate(record_instance)
+            if len(page) < page_size:
+                return
+            after = (page[-1].created_at, page[-1].uuid)
+
+    @instrumented
+    def snapshot_as_of(
+        self,
+        timestamp: datetime,
+        filter: Optional[dict] = None,
+        include_deleted: bool = False,
+        page_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[Tuple[str, BaseModel]]:
+        """
+        Iterate over the state of every recorded node of the service at a point in
+        time.
+
+        The states are rebuilt on the server, one statement per page of
+        `page_size` nodes in uuid order, so only one page is held in memory.
+
+        Args:
+            timestamp: The point in time.
+            filter: Only states whose data fields equal these values.
+            include_deleted: Whether to include nodes deleted at that time.
+            page_size: The number of nodes per round-trip.
+
+        Returns: An iterator over pairs of a node uuid and the record read model
+            active at that time.
+
+        """
+        read_model = self.record_service.repository.read_model
+        after = None
+        while True:
+            page = self.record_chain_repo.snapshot_page(
+                timestamp, after, page_size, filter, include_deleted
             )
-            self.has_record_repo.create("records", rel_data)
+            for uuid, record_instance in page:
+                if record_instance is not None:
+                    yield uuid, read_model.model_validate(record_instance)
+            if len(page) < page_size:
+                return
+            after = page[-1][0]
+
+    def _conflict(self, node: TRead) -> None:
+        # Another writer changed the node, refresh what is cached about it
+        if self.cache is not None:
+            self.cache.put_node(node.uuid, node)
+            self.cache.invalidate_record(node.uuid)
+
+    @instrumented
+    def append_record(
+        self,
+        uuid: str,
+        data: dict,
+        operation: OperationEnum,
+        expected_version: Optional[int] = None,
+    ) -> TRead:
+        """
+        Record a change of a recorded node with one compiled Cypher statement.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            data: The changed data, merged into the data of the active record.
+            operation: The operation of the new record.
+            expected_version: Only record the change if the node is still at this
+                version, e.g. the version of the node that the change is based on.
+
+        Returns: The recorded node.
+
+        """
+        try:
+            with ValidationSpan():
+                validated_data = self.update_model.model_validate(data)
+        except ValidationError as e:
+            raise ValueError("Validation error while recording entity") from e
 
-            # Connect recorded node by has active record edge to node record
-            has_active_record_update = HasActiveRecordUpdate(
-                start_uuid=read_node.uuid, end_uuid=read_record.uuid
-            )
-            read_has_active_record = self.has_active_record_repo.update(
-                "active_record", has_active_record_update
+        result = self.record_chain_repo.append_record(
+            uuid,
+            validated_data.model_dump(exclude_unset=True),
+            operation,
+            expected_version,
+        )
+        if result is None:
+            raise ValueError(f"Node with uuid {uuid} not found")
+
+        node_instance, record_instance = result
+        node = self.repository.read_model.model_validate(node_instance)
+        if record_instance is None:
+            self._conflict(node)
+            raise VersionConflict(
+                f"Node with uuid {uuid} is at version {node.version}, "
+                f"expected version {expected_version}"
             )
+        self._cache_write(node, record_instance)
+        return node
+
+    @property
+    def skipped_updates(self) -> int:
+        """Number of updates that changed no field and were therefore not written."""
+        return self.record_chain_repo.skipped_updates
+
+    @property
+    def conflicts(self) -> int:
+        """Number of changes not recorded because the node was at another version."""
+        return self.record_chain_repo.conflicts
+
+    @property
+    def write_retries(self) -> int:
+        """Number of write statements repeated after a transient error."""
+        return self.record_chain_repo.retries
+
+    @instrumented
+    def update(
+        self, uuid: str, data: dict, expected_version: Optional[int] = None
+    ) -> TRead | False:
+        return self.append_record(uuid, data, OperationEnum.UPDATED, expected_version)
+
+    @instrumented
+    def delete(
+        self, uuid: str, expected_version: Optional[int] = None
+    ) -> TRead | False:
+        return self.append_record(uuid, {}, OperationEnum.DELETED, expected_version)
+
+    @instrumented
+    def modify(
+        self,
+        uuid: str,
+        change: Callable[[BaseModel], dict],
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ) -> TRead:
+        """
+        Record a change computed from the active record, with optimistic
+        concurrency. If another writer records a change first, the active record is
+        read again and the change recomputed, after a backoff with full jitter.
+
+        Example:
+            service.modify(uuid, lambda record: {"count": record.count + 1})
+
+        Args:
+            uuid: The uuid of the recorded node.
+            change: Returns the changed data for the active record.
+            max_retries: The maximum number of repetitions after a conflict.
+
+        Returns: The recorded node.
+
+        """
+        retry_delay = self.record_chain_repo.retry_delay
+        for attempt in range(max_retries + 1):
+            record = self.read_active_record(uuid)
+            try:
+                return self.update(
+                    uuid, change(record), expected_version=record.version
+                )
+            except VersionConflict:
+                if attempt == max_retries:
+                    raise
+            sleep(uniform(0, retry_delay * 2**attempt))
+
+    def _seek(self, uuid: str, version: Optional[int]) -> BaseModel:
+        # The state of a version, or of the active record for None
+        if version is None:
+            return self.read_active_record(uuid)
+        record = self.read_version(uuid, version)
+        if record is None:
+            raise ValueError(f"Node with uuid {uuid} has no version {version}")
+        return record
+
+    @instrumented
+    def diff(
+        self, uuid: str, from_version: int, to_version: Optional[int] = None
+    ) -> Dict[str, Tuple[Any, Any]]:
+        """
+        Compare the data of a recorded node at two versions.
+
+        Each version is one seek on the (entity_uuid, version) timeline index, so
+        the cost does not grow with the number of versions between them.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            from_version: The version to compare from.
+            to_version: The version to compare to, None for the active record.
+
+        Returns: The pair of the old and the new value by name of every data field
+            that differs.
+
+        """
+        old, new = self._seek(uuid, from_version), self._seek(uuid, to_version)
+        return {
+            name: (getattr(old, name), getattr(new, name))
+            for name in self.record_chain_repo.data_fields
+            if getattr(old, name) != getattr(new, name)
+        }
+
+    @instrumented
+    def revert(
+        self, uuid: str, version: int, expected_version: Optional[int] = None
+    ) -> TRead:
+        """
+        Record an update that restores the data of an earlier version, read with
+        one indexed seek. Reverting to the data of the active record records nothing.
+
+        Args:
+            uuid: The uuid of the recorded node.
+            version: The version whose data is restored.
+            expected_version: Only revert if the node is still at this version.
+
+        Returns: The recorded node.
+
+        """
+        record = self._seek(uuid, version)
+        return self.update(
+            uuid,
+            {
+                name: getattr(record, name)
+                for name in self.record_chain_repo.data_fields
+            },
+            expected_version,
+        )
 
-            has_previous_record_create = HasPreviousRecordCreate(
-                start_uuid=read_active_record.uuid,
-                end_uuid=read_has_active_record.end_uuid,
+    @instrumented
+    def create_many(
+        self, items: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[TRead | ItemInvalid]:
+        """
+        Create recorded nodes and their first records in UNWIND batches.
+
+        Args:
+            items: The data of the nodes to create.
+            batch_size: The maximum number of nodes per statement.
+
+        Returns: One outcome per item in input order, either the read model of the
+            created node or an `ItemInvalid` for data that failed validation.
+
+        """
+        outcomes = []
+        valid_items = []
+        for index, data in enumerate(items):
+            try:
+                with ValidationSpan():
+                    validated_data = self.create_model.model_validate(data)
+            except ValidationError as e:
+                outcomes.append(ItemInvalid(index=index, error=str(e)))
+                continue
+            outcomes.append(None)
+            valid_items.append((index, validated_data.model_dump()))
+
+        for (
+            index,
+            node_instance,
+            record_instance,
+        ) in self.record_chain_repo.create_records(valid_items, batch_size):
+            outcomes[index] = self.repository.read_model.model_validate(node_instance)
+            self._cache_write(outcomes[index], record_instance)
+        return outcomes
+
+    def _append_many(
+        self,
+        items: Iterable[tuple],
+        operation: OperationEnum,
+        batch_size: int,
+    ) -> List[TRead | ItemNotFound | ItemInvalid | ItemConflict]:
+        outcomes = []
+        valid_items = []
+        expected_versions = {}
+        for index, (uuid, data, *expected_version) in enumerate(items):
+            try:
+                with ValidationSpan():
+                    validated_data = self.update_model.model_validate(data)
+            except ValidationError as e:
+                outcomes.append(ItemInvalid(index=index, error=str(e)))
+                continue
+            outcomes.append(ItemNotFound(uuid=str(uuid)))
+            valid_items.append(
+                (
+                    index,
+                    uuid,
+                    validated_data.model_dump(exclude_unset=True),
+                    operation,
+                    *expected_version,
+                )
             )
-            self.has_previous_record_repo.create("previous", has_previous_record_create)
-
-        return False
+            if expected_version:
+                expected_versions[index] = expected_version[0]
+
+        for (
+            index,
+            node_instance,
+            record_instance,
+        ) in self.record_chain_repo.append_records(valid_items, batch_size):
+            node = self.repository.read_model.model_validate(node_instance)
+            if record_instance is None:
+                self._conflict(node)
+                outcomes[index] = ItemConflict(
+                    uuid=str(node.uuid),
+                    expected_version=expected_versions[index],
+                    version=node.version,
+                )
+                continue
+            outcomes[index] = node
+            self._cache_write(node, record_instance)
+        return outcomes
+
+    @instrumented
+    def update_many(
+        self, items: Iterable[tuple], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[TRead | ItemNotFound | ItemInvalid | ItemConflict]:
+        """
+        Record updates of many recorded nodes in UNWIND batches.
+
+        Args:
+            items: Pairs of a node uuid and its changed data, or triples with the
+                expected version of the node as third element. A uuid may occur more
+                than once, its updates are recorded in input order.
+            batch_size: The maximum number of records per statement.
+
+        Returns: One outcome per item in input order, either the read model of the
+            node, an `ItemNotFound` for unknown uuids, an `ItemInvalid` for data
+            that failed validation or an `ItemConflict` for nodes at another
+            version.
+
+        """
+        return self._append_many(items, OperationEnum.UPDATED, batch_size)
+
+    @instrumented
+    def delete_many(
+        self, uuids: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[TRead | ItemNotFound]:
+        """
+        Record deletes of many recorded nodes in UNWIND batches.
+
+        Args:
+            uuids: The uuids of the nodes to delete.
+            batch_size: The maximum number of records per statement.
+
+        Returns: One outcome per uuid in input order, either the read model of the
+            node or an `ItemNotFound` for unknown uuids.
+
+        """
+        return self._append_many(
+            ((uuid, {}) for uuid in uuids), OperationEnum.DELETED, batch_size
+        )
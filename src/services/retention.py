@@ -0,0 +1,260 @@
+from datetime import timedelta
+from math import floor
+from pydantic import BaseModel, Field, model_validator
+from src.repositories.record_chain_repository import (
+    DEFAULT_BATCH_SIZE,
+    RecordChainRepository,
+    _now,
+)
+from src.services.recorded_node_services import RecordedNodeService
+from src.types import RecordStorageEnum
+from time import sleep
+from typing import Dict, List, Literal, Optional, Tuple
+from uuid import uuid4
+
+DOWNSAMPLE_SECONDS = {"hour": 3600, "day": 86400}
+
+
+class RetentionPolicy(BaseModel):
+    """
+    Which records of a recorded node are kept. A record is kept if any rule keeps
+    it, the active record is always kept.
+    """
+
+    keep_last: Optional[int] = Field(
+        None, ge=1, description="Keep the records of the last N versions"
+    )
+    keep_newer_than: Optional[timedelta] = Field(
+        None, description="Keep the records younger than this age"
+    )
+    downsample: Optional[Literal["hour", "day"]] = Field(
+        None, description="Keep the last record per hour or day beyond an age"
+    )
+    downsample_after: timedelta = Field(
+        timedelta(0), description="The age from which records are downsampled"
+    )
+
+    @model_validator(mode="after")
+    def check_rules(self) -> "RetentionPolicy":
+        if self.keep_last is None and self.keep_newer_than is None:
+            if self.downsample is None:
+                raise ValueError("A retention policy needs at least one rule")
+        return self
+
+    def kept(self, records: List[list], active_uuid: str, now: float) -> set:
+        """
+        Args:
+            records: The records of a node ordered by version as [uuid, version,
+                created_at, snapshot, changed_fields].
+            active_uuid: The uuid of the active record.
+            now: The reference time as unix epoch.
+
+        Returns: The uuids of the kept records.
+
+        """
+        kept = {active_uuid}
+        if self.keep_last is not None:
+            last_version = max(record[1] for record in records)
+            kept.update(
+                uuid
+                for uuid, version, *_ in records
+                if version > last_version - self.keep_last
+            )
+        if self.keep_newer_than is not None:
+            limit = now - self.keep_newer_than.total_seconds()
+            kept.update(
+                uuid for uuid, _, created_at, *_ in records if created_at >= limit
+            )
+        if self.downsample is not None:
+            limit = now - self.downsample_after.total_seconds()
+            size = DOWNSAMPLE_SECONDS[self.downsample]
+            buckets: Dict[int, str] = {}
+            for uuid, _, created_at, *_ in records:
+                if created_at >= limit:
+                    kept.add(uuid)
+                else:
+                    # Ordered by version, the last record of a bucket wins
+                    buckets[floor(created_at / size)] = uuid
+            kept.update(buckets.values())
+        return kept
+
+
+class RetentionProgress(BaseModel):
+    after: Optional[str] = Field(
+        None, description="The uuid of the last processed node, the resume point"
+    )
+    nodes: int = 0
+    deleted: int = Field(0, description="The number of deleted records")
+    compacted: int = Field(0, description="The number of records merged into")
+    unversioned: int = Field(
+        0, description="The number of skipped nodes with records without a version"
+    )
+    done: bool = False
+
+
+class RetentionJob:
+    """
+    Applies a retention policy to the record chains of a recorded node service.
+
+    The job walks the nodes in uuid order, `batch_size` nodes per batch. Removed
+    records are merged into the kept record that follows them: it gets the union of
+    their changed fields and a `HAS_PREVIOUS_RECORD` link to the previous kept
+    record. With delta storage it also becomes a snapshot, so the remaining deltas
+    still rebuild every kept version. Writes and deletes run as
+    `CALL { } IN TRANSACTIONS`, committing `rows_per_transaction` rows at a time,
+    so they must not run inside an explicit transaction.
+
+    Merges are written before deletes, so an interrupted batch can be repeated.
+    Pass the returned progress to `run` to resume. Nodes with records written before
+    the record timeline existed are skipped and counted as `unversioned` until
+    `RecordChainRepository.backfill_timeline` numbers their records.
+
+    Example:
+        job = RetentionJob(service, RetentionPolicy(keep_last=100), pause=0.5)
+        progress = job.run(max_batches=10)
+        while not progress.done:
+            progress = job.run(progress, max_batches=10)
+    """
+
+    def __init__(
+        self,
+        service: RecordedNodeService,
+        policy: RetentionPolicy,
+        batch_size: int = 100,
+        rows_per_transaction: int = DEFAULT_BATCH_SIZE,
+        pause: float = 0.0,
+    ) -> None:
+        self.service = service
+        self.policy = policy
+        self.batch_size = batch_size
+        self.rows_per_transaction = rows_per_transaction
+        self.pause = pause
+
+    @property
+    def chain(self) -> RecordChainRepository:
+        return self.service.record_chain_repo
+
+    def plan(
+        self, uuid: str, active_uuid: str, records: List[list], now: float
+    ) -> Tuple[List[dict], List[str]]:
+        """
+        Plan the retention of the records of one node.
+
+        Args:
+            uuid: The uuid of the node.
+            active_uuid: The uuid of its active record.
+            records: Its records as returned by `retention_page`.
+            now: The reference time as unix epoch.
+
+        Returns: The merge rows of the kept records that follow removed records and
+            the uuids of the removed records.
+
+        """
+        kept = self.policy.kept(records, active_uuid, now)
+        rows = []
+        removed = []
+        changed_fields: List[str] = []
+        previous_uuid = None
+        gap = False
+        for record_uuid, version, _, snapshot, fields in records:
+            for name in fields or []:
+                if name not in changed_fields:
+                    changed_fields.append(name)
+            if record_uuid not in kept:
+                removed.append(record_uuid)
+                gap = True
+                continue
+
+            if gap:
+                rows.append(
+                    self._merge_row(
+                        uuid, record_uuid, version, snapshot, changed_fields
+                    )
+                    | {"previous_uuid": previous_uuid}
+                )
+            previous_uuid = record_uuid
+            changed_fields = []
+            gap = False
+        return rows, removed
+
+    def _merge_row(
+        self,
+        uuid: str,
+        record_uuid: str,
+        version: int,
+        snapshot: Optional[bool],
+        changed_fields: List[str],
+    ) -> dict:
+        data = {}
+        if self.chain.storage == RecordStorageEnum.DELTA:
+            if snapshot is False:
+                state = self.chain._materialize(
+                    "version", {"uuid": uuid, "version": version}
+                )[-1]
+                data = self.chain.deflate_record_data(
+                    {name: getattr(state, name) for name in self.chain.data_fields}
+                )
+            snapshot = True
+        return {
+            "uuid": record_uuid,
+            "data": data,
+            "changed_fields": changed_fields,
+            "snapshot": snapshot,
+            "link_uuid": str(uuid4()),
+            "created_at": _now(),
+        }
+
+    def run(
+        self,
+        progress: Optional[RetentionProgress] = None,
+        max_batches: Optional[int] = None,
+    ) -> RetentionProgress:
+        """
+        Apply the policy batch by batch.
+
+        Args:
+            progress: The progress of an earlier run to resume or None to start.
+            max_batches: Stop after this many batches, None runs to the end.
+
+        Returns: The progress, `done` once every node was processed.
+
+        """
+        progress = (progress or RetentionProgress()).model_copy()
+        now = _now()
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            page = self.chain.retention_page(progress.after, self.batch_size)
+            if not page:
+                progress.done = True
+                return progress
+
+            rows, removed, changed = [], [], []
+            for uuid, active_uuid, records in page:
+                if any(record[1] is None for record in records):
+                    progress.unversioned += 1
+                    continue
+                node_rows, node_removed = self.plan(uuid, active_uuid, records, now)
+                rows.extend(node_rows)
+                removed.extend(node_removed)
+                if node_rows:
+                    changed.append(uuid)
+            if rows:
+                self.chain.compact_records(rows, self.rows_per_transaction)
+            if removed:
+                self.chain.delete_records(removed, self.rows_per_transaction)
+            if self.service.cache is not None:
+                # The active record may have become a snapshot
+                for uuid in changed:
+                    self.service.cache.invalidate_record(uuid)
+
+            progress.after = page[-1][0]
+            progress.nodes += len(page)
+            progress.deleted += len(removed)
+            progress.compacted += len(rows)
+            batches += 1
+            if len(page) < self.batch_size:
+                progress.done = True
+                return progress
+            if self.pause:
+                sleep(self.pause)
+        return progress
@@ -0,0 +1,268 @@
+from pydantic import BaseModel, Field
+from src.core.database import cypher_query
+from src.services.recorded_node_services import RecordedNodeService
+from src.services.recorded_edge_service import RecordedEdgeService
+from src.services.service_factory import ServiceFactory
+from typing import Dict, Iterable, List, Literal, Optional, Tuple, Union
+
+# Relationships written by the recorder for every recorded node class
+RECORDER_RELATIONSHIPS = ("HAS_RECORD", "HAS_ACTIVE_RECORD", "HAS_PREVIOUS_RECORD")
+
+
+class SchemaItem(BaseModel):
+    name: str = Field(..., description="The name used when the item is created")
+    kind: Literal["uniqueness", "range"]
+    entity_type: Literal["NODE", "RELATIONSHIP"]
+    label: str = Field(..., description="The node label or relationship type")
+    properties: Tuple[str, ...]
+
+    @property
+    def key(self) -> Tuple:
+        return self.kind, self.entity_type, self.label, self.properties
+
+    def create_statement(self) -> str:
+        if self.entity_type == "NODE":
+            pattern = f"(entity:{self.label})"
+        else:
+            pattern = f"()-[entity:{self.label}]-()"
+        properties = ", ".join(f"entity.{prop}" for prop in self.properties)
+        if self.kind == "uniqueness":
+            return (
+                f"CREATE CONSTRAINT {self.name} IF NOT EXISTS "
+                f"FOR {pattern} REQUIRE ({properties}) IS UNIQUE"
+            )
+        return (
+            f"CREATE RANGE INDEX {self.name} IF NOT EXISTS "
+            f"FOR {pattern} ON ({properties})"
+        )
+
+
+class SchemaReport(BaseModel):
+    online: List[str] = Field(default_factory=list)
+    missing: List[str] = Field(default_factory=list)
+    populating: Dict[str, float] = Field(
+        default_factory=dict, description="Population percentage by item name"
+    )
+    failed: List[str] = Field(default_factory=list)
+
+    @property
+    def ready(self) -> bool:
+        return not (self.missing or self.populating or self.failed)
+
+
+class SchemaManager:
+    """
+    Installs the constraints and indexes the recorder relies on for a set of
+    services and reports their state.
+
+    Per recorded node and record label it requires a uniqueness constraint on
+    `uuid`, range indexes on the node `created_at`, on the record `created_at` and
+    `operation` and the record timeline indexes. The recorder relationships get range
+    indexes on `uuid` and `created_at`. Recorded edge services add a uniqueness
+    constraint on the edge record `uuid`, range indexes on its `created_at` and
+    (`edge_uuid`, `version`) and range indexes
+    on `uuid` and `created_at` of the recorded relationship and of the relationships
+    linking its records. Installation is idempotent, existing equivalent items are kept
+    whatever their name.
+
+    Example:
+        ServiceFactory.register(PersonModel, Person, PersonRecord)
+        report = SchemaManager.from_factory().install()
+    """
+
+    def __init__(
+        self, services: Iterable[Union[RecordedNodeService, RecordedEdgeService]]
+    ) -> None:
+        self.services = list(services)
+
+    @classmethod
+    def from_factory(cls) -> "SchemaManager":
+        """
+        Returns: A schema manager for every service registered with the
+            `ServiceFactory`.
+        """
+        return cls(ServiceFactory.registered_services())
+
+    def required_items(self) -> List[SchemaItem]:
+        """
+        Returns: The constraints and indexes required by the services, without
+            duplicates.
+        """
+        items: Dict[Tuple, SchemaItem] = {}
+
+        def add(item: SchemaItem) -> None:
+            items.setdefault(item.key, item)
+
+        def add_relationship_indexes(rel_type: str) -> None:
+            for prop in ("uuid", "created_at"):
+                add(
+                    SchemaItem(
+                        name=f"{rel_type}_{prop}",
+                        kind="range",
+                        entity_type="RELATIONSHIP",
+                        label=rel_type,
+                        properties=(prop,),
+                    )
+                )
+
+        for service in self.services:
+            if isinstance(service, RecordedEdgeService):
+                edge_chain = service.edge_chain_repo
+                add(
+                    SchemaItem(
+                        name=f"{edge_chain.record_label}_uuid_unique",
+                        kind="uniqueness",
+                        entity_type="NODE",
+                        label=edge_chain.record_label,
+                        properties=("uuid",),
+                    )
+                )
+                add(
+                    SchemaItem(
+                        name=f"{edge_chain.record_label}_timeline_version",
+                        kind="range",
+                        entity_type="NODE",
+                        label=edge_chain.record_label,
+                        properties=("edge_uuid", "version"),
+                    )
+                )
+                add(
+                    SchemaItem(
+                        name=f"{edge_chain.record_label}_created_at",
+                        kind="range",
+                        entity_type="NODE",
+                        label=edge_chain.record_label,
+                        properties=("created_at",),
+                    )
+                )
+                for rel_type in (
+                    edge_chain.rel_type,
+                    edge_chain.recorded_rel_type,
+                    edge_chain.records_rel_type,
+                    "HAS_PREVIOUS_RECORD",
+                ):
+                    add_relationship_indexes(rel_type)
+                continue
+
+            chain = service.record_chain_repo
+            for label in (chain.node_label, chain.record_label):
+                add(
+                    SchemaItem(
+                        name=f"{label}_uuid_unique",
+                        kind="uniqueness",
+                        entity_type="NODE",
+                        label=label,
+                        properties=("uuid",),
+                    )
+                )
+            for label, prop in (
+                (chain.node_label, "created_at"),
+                (chain.record_label, "created_at"),
+                (chain.record_label, "operation"),
+            ):
+                add(
+                    SchemaItem(
+                        name=f"{label}_{prop}",
+                        kind="range",
+                        entity_type="NODE",
+                        label=label,
+                        properties=(prop,),
+                    )
+                )
+            for name, properties in chain.timeline_indexes.items():
+                add(
+                    SchemaItem(
+                        name=name,
+                        kind="range",
+                        entity_type="NODE",
+                        label=chain.record_label,
+                        properties=properties,
+                    )
+                )
+
+            for rel_type in RECORDER_RELATIONSHIPS:
+                add_relationship_indexes(rel_type)
+        return list(items.values())
+
+    def install(self) -> SchemaReport:
+        """
+        Create the missing constraints and indexes. The server builds new indexes
+        in the background.
+
+        Returns: The state of the required items after installation.
+
+        """
+        report = self.report()
+        missing = set(report.missing)
+        for item in self.required_items():
+            if item.name in missing:
+                cypher_query(item.create_statement())
+        return self.report()
+
+    def await_online(self, timeout: float = 300) -> SchemaReport:
+        """
+        Wait until all indexes are online.
+
+        Args:
+            timeout: The maximum time in seconds to wait.
+
+        Returns: The state of the required items.
+
+        """
+        cypher_query("CALL db.awaitIndexes($timeout)", {"timeout": int(timeout)})
+        return self.report()
+
+    @staticmethod
+    def _existing() -> Tuple[Dict[Tuple, Tuple[str, Optional[float]]], set]:
+        indexes, _ = cypher_query(
+            """
+            SHOW INDEXES
+            YIELD type, entityType, labelsOrTypes, properties, state, populationPercent
+            RETURN type, entityType, labelsOrTypes, properties, state, populationPercent
+            """
+        )
+        constraints, _ = cypher_query(
+            """
+            SHOW CONSTRAINTS YIELD type, entityType, labelsOrTypes, properties
+            RETURN type, entityType, labelsOrTypes, properties
+            """
+        )
+
+        states = {}
+        for type_, entity_type, labels, properties, state, percent in indexes:
+            if type_ != "RANGE" or not labels or len(labels) != 1:
+                continue
+            states[(entity_type, labels[0], tuple(properties))] = (state, percent)
+
+        unique = {
+            (entity_type, labels[0], tuple(properties))
+            for type_, entity_type, labels, properties in constraints
+            if "UNIQUENESS" in type_ and labels and len(labels) == 1
+        }
+        return states, unique
+
+    def report(self) -> SchemaReport:
+        """
+        Returns: Which required constraints and indexes are online, missing, still
+            populating or failed.
+        """
+        states, unique = self._existing()
+        report = SchemaReport()
+        for item in self.required_items():
+            target = (item.entity_type, item.label, item.properties)
+            if item.kind == "uniqueness" and target not in unique:
+                report.missing.append(item.name)
+                continue
+            if target not in states:
+                report.missing.append(item.name)
+                continue
+
+            # Uniqueness constraints are backed by a range index
+            state, percent = states[target]
+            if state == "ONLINE":
+                report.online.append(item.name)
+            elif state == "POPULATING":
+                report.populating[item.name] = percent or 0.0
+            else:
+                report.failed.append(item.name)
+        return report
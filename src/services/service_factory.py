@@ -1,34 +1,360 @@
-from src.repositories import NodeRepository
-from src.services import RecordedNodeService, NodeRecordService
+from neo4j import AsyncDriver
+from src.repositories import (
+    NodeRepository,
+    AsyncNodeRepository,
+    AsyncRecordChainRepository,
+    EdgeRecordChainRepository,
+    RecordChainRepository,
+)
+from src.repositories.memory_repositories import (
+    MemoryEdgeRecordChainRepository,
+    MemoryNodeRepository,
+    MemoryRecordChainRepository,
+    MemoryStore,
+)
+from src.repositories.record_chain_repository import DEFAULT_SNAPSHOT_INTERVAL
+from src.services.read_cache import ReadCache, DEFAULT_CACHE_TTL
+from src.types import BackendEnum, RecordStorageEnum
+from src.services import (
+    RecordedNodeService,
+    NodeRecordService,
+    AsyncRecordedNodeService,
+    RecordedEdgeService,
+)
+from threading import RLock
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type
+from pydantic import BaseModel
 from src.models.pydantic_models import (
     create_entity_create_model,
     create_entity_read_model,
     create_entity_update_model,
     create_record_create_model,
     create_record_read_model,
+    create_edge_create_model,
+    create_edge_read_model,
+    create_edge_record_read_model,
 )
 
 
+class EntityModels(NamedTuple):
+    """The pydantic models generated for a recorded data model."""
+
+    create: Type[BaseModel]
+    read: Type[BaseModel]
+    update: Type[BaseModel]
+    record_create: Type[BaseModel]
+    record_read: Type[BaseModel]
+
+
+class EdgeModels(NamedTuple):
+    """The pydantic models generated for a recorded edge data model."""
+
+    create: Type[BaseModel]
+    read: Type[BaseModel]
+    update: Type[BaseModel]
+    record_read: Type[BaseModel]
+
+
 class ServiceFactory:
     """
     Factory class for dynamically generating service instances.
+
+    The generated models are built once per data model and `get_service` returns
+    one shared service per classes and options. Register the services of an
+    application and call `warm_up` at startup to build them before the first request.
     """
 
+    _lock = RLock()
+    _models: Dict[type, EntityModels] = {}
+    _edge_models: Dict[type, EdgeModels] = {}
+    _services: Dict[Tuple, RecordedNodeService] = {}
+    _edge_services: Dict[Tuple, RecordedEdgeService] = {}
+    _registered: Dict[Tuple, None] = {}
+
+    @classmethod
+    def get_models(cls, model_class) -> EntityModels:
+        """
+        Args:
+            model_class: The pydantic model of the recorded data.
+
+        Returns: The memoised models generated for the data model.
+
+        """
+        models = cls._models.get(model_class)
+        if models is not None:
+            return models
+        with cls._lock:
+            if model_class not in cls._models:
+                cls._models[model_class] = EntityModels(
+                    create=create_entity_create_model(model_class),
+                    read=create_entity_read_model(model_class),
+                    update=create_entity_update_model(model_class),
+                    record_create=create_record_create_model(model_class),
+                    record_read=create_record_read_model(model_class),
+                )
+            return cls._models[model_class]
+
+    @classmethod
+    def get_edge_models(cls, model_class) -> EdgeModels:
+        """
+        Args:
+            model_class: The pydantic model of the recorded edge data.
+
+        Returns: The memoised models generated for the edge data model.
+
+        """
+        models = cls._edge_models.get(model_class)
+        if models is not None:
+            return models
+        with cls._lock:
+            if model_class not in cls._edge_models:
+                cls._edge_models[model_class] = EdgeModels(
+                    create=create_edge_create_model(model_class),
+                    read=create_edge_read_model(model_class),
+                    update=create_entity_update_model(model_class),
+                    record_read=create_edge_record_read_model(model_class),
+                )
+            return cls._edge_models[model_class]
+
     @staticmethod
-    def create_service(model_class, node_class, record_class):
-        # Dynamic generation of CRUD models
-        create_model = create_entity_create_model(model_class)
-        read_model = create_entity_read_model(model_class)
-        update_model = create_entity_update_model(model_class)
-        record_create_model = create_record_create_model(model_class)
-        record_read_model = create_record_read_model(model_class)
+    def _service_key(
+        model_class,
+        node_class,
+        record_class,
+        storage: RecordStorageEnum,
+        snapshot_interval: int,
+        cache_size: int,
+        cache_ttl: Optional[float],
+        backend: BackendEnum,
+        store: Optional[MemoryStore],
+    ) -> Tuple:
+        return (
+            model_class,
+            node_class,
+            record_class,
+            RecordStorageEnum(storage),
+            snapshot_interval,
+            cache_size,
+            cache_ttl,
+            BackendEnum(backend),
+            store,
+        )
+
+    @classmethod
+    def register(
+        cls,
+        model_class,
+        node_class,
+        record_class,
+        storage: RecordStorageEnum = RecordStorageEnum.FULL,
+        snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+        cache_size: int = 0,
+        cache_ttl: Optional[float] = DEFAULT_CACHE_TTL,
+        backend: BackendEnum = BackendEnum.NEO4J,
+        store: Optional[MemoryStore] = None,
+    ) -> None:
+        """
+        Register a service to be built by `warm_up`. The arguments are those of
+        `create_service`.
+        """
+        key = cls._service_key(
+            model_class,
+            node_class,
+            record_class,
+            storage,
+            snapshot_interval,
+            cache_size,
+            cache_ttl,
+            backend,
+            store,
+        )
+        with cls._lock:
+            cls._registered[key] = None
+
+    @classmethod
+    def get_service(
+        cls,
+        model_class,
+        node_class,
+        record_class,
+        storage: RecordStorageEnum = RecordStorageEnum.FULL,
+        snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+        cache_size: int = 0,
+        cache_ttl: Optional[float] = DEFAULT_CACHE_TTL,
+        backend: BackendEnum = BackendEnum.NEO4J,
+        store: Optional[MemoryStore] = None,
+    ):
+        """
+        Get the shared service for the classes and options, building and registering
+        it on first use. The arguments are those of `create_service`.
+
+        Returns: The service.
+
+        """
+        key = cls._service_key(
+            model_class,
+            node_class,
+            record_class,
+            storage,
+            snapshot_interval,
+            cache_size,
+            cache_ttl,
+            backend,
+            store,
+        )
+        service = cls._services.get(key)
+        if service is not None:
+            return service
+        with cls._lock:
+            if key not in cls._services:
+                cls._services[key] = cls.create_service(*key)
+                cls._registered[key] = None
+            return cls._services[key]
+
+    @classmethod
+    def warm_up(cls) -> List[RecordedNodeService]:
+        """
+        Build every registered service that was not built yet.
+
+        Returns: The registered services.
+
+        """
+        with cls._lock:
+            keys = list(cls._registered)
+        return [cls.get_service(*key) for key in keys]
+
+    @classmethod
+    def get_edge_service(
+        cls,
+        model_class,
+        rel_type: str,
+        start_node_class,
+        end_node_class,
+        record_class,
+        backend: BackendEnum = BackendEnum.NEO4J,
+        store: Optional[MemoryStore] = None,
+    ):
+        """
+        Get the shared edge service for the classes and options, building it on
+        first use. The arguments are those of `create_edge_service`.
+
+        Returns: The service.
+
+        """
+        key = (
+            model_class,
+            rel_type,
+            start_node_class,
+            end_node_class,
+            record_class,
+            BackendEnum(backend),
+            store,
+        )
+        service = cls._edge_services.get(key)
+        if service is not None:
+            return service
+        with cls._lock:
+            if key not in cls._edge_services:
+                cls._edge_services[key] = cls.create_edge_service(*key)
+            return cls._edge_services[key]
+
+    @classmethod
+    def registered_services(cls) -> List[RecordedNodeService | RecordedEdgeService]:
+        """
+        Returns: The registered node services, built by `warm_up`, and the shared
+            edge services.
+        """
+        services = cls.warm_up()
+        with cls._lock:
+            return services + list(cls._edge_services.values())
+
+    @classmethod
+    def invalidate(cls, model_class=None, node_class=None, record_class=None) -> None:
+        """
+        Drop memoised models and services so that they are rebuilt on next use.
+        Services stay registered.
+
+        Args:
+            model_class: Only drop entries of this data model.
+            node_class: Only drop services of this node class, edge services
+                with this start or end node class.
+            record_class: Only drop services of this record class.
+
+        """
+        selected = (model_class, node_class, record_class)
+        with cls._lock:
+            for key in list(cls._services):
+                if all(
+                    wanted is None or wanted is actual
+                    for wanted, actual in zip(selected, key)
+                ):
+                    del cls._services[key]
+            for key in list(cls._edge_services):
+                model, _, start_node, end_node, record = key[:5]
+                if (
+                    model_class in (None, model)
+                    and record_class in (None, record)
+                    and (node_class is None or node_class in (start_node, end_node))
+                ):
+                    del cls._edge_services[key]
+            if node_class is None and record_class is None:
+                for models in (cls._models, cls._edge_models):
+                    for key in list(models):
+                        if model_class is None or model_class is key:
+                            del models[key]
+
+    @classmethod
+    def create_service(
+        cls,
+        model_class,
+        node_class,
+        record_class,
+        storage: RecordStorageEnum = RecordStorageEnum.FULL,
+        snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+        cache_size: int = 0,
+        cache_ttl: Optional[float] = DEFAULT_CACHE_TTL,
+        backend: BackendEnum = BackendEnum.NEO4J,
+        store: Optional[MemoryStore] = None,
+    ):
+        """
+        Create a recorded node service.
+
+        Args:
+            model_class: The pydantic model of the recorded data.
+            node_class: The neomodel class of the recorded node.
+            record_class: The neomodel class of the node records.
+            storage: Whether records hold full copies or only the changed fields.
+            snapshot_interval: With delta storage, the number of versions between
+                records holding the full state.
+            cache_size: The number of nodes whose read model and active record are
+                cached. 0 disables the read cache.
+            cache_ttl: The time in seconds a cache entry stays valid.
+            backend: Whether the service stores in Neo4j or in a `MemoryStore`.
+            store: With the memory backend, the store or None for the process-wide
+                default store.
+
+        Returns: A new service. Use `get_service` to share one.
+
+        """
+        # Memoised generation of CRUD models
+        (
+            create_model,
+            read_model,
+            update_model,
+            record_create_model,
+            record_read_model,
+        ) = cls.get_models(model_class)
 
         # Creating the generic repositories
-        class GenericRepository(NodeRepository[create_model, read_model, node_class]):
+        base_repository = NodeRepository
+        if BackendEnum(backend) == BackendEnum.MEMORY:
+            base_repository = MemoryNodeRepository
+
+        class GenericRepository(base_repository[create_model, read_model, node_class]):
             pass
 
         class GenericRecordRepository(
-            NodeRepository[record_create_model, record_read_model, record_class]
+            base_repository[record_create_model, record_read_model, record_class]
         ):
             pass
 
@@ -40,18 +366,167 @@ class ServiceFactory:
             pass
 
         # Initialization of repository and service instances
+        record_chain_repo = None
+        store_options = {}
+        if BackendEnum(backend) == BackendEnum.MEMORY:
+            store_options = {"store": store}
+            record_chain_repo = MemoryRecordChainRepository[node_class, record_class](
+                node_model=node_class,
+                record_model=record_class,
+                storage=storage,
+                snapshot_interval=snapshot_interval,
+                store=store,
+            )
+
         record_repository = GenericRecordRepository(
-            node_model=record_class, read_model=record_read_model
+            node_model=record_class, read_model=record_read_model, **store_options
         )
         record_service = GenericRecordService(
             repository=record_repository, create_model=record_create_model
         )
 
-        repository = GenericRepository(node_model=node_class, read_model=read_model)
+        repository = GenericRepository(
+            node_model=node_class, read_model=read_model, **store_options
+        )
         service = GenericService(
             repository=repository,
             record_service=record_service,
             create_model=create_model,
+            update_model=update_model,
+            storage=storage,
+            snapshot_interval=snapshot_interval,
+            cache=ReadCache(cache_size, cache_ttl) if cache_size > 0 else None,
+            record_chain_repo=record_chain_repo,
         )
 
         return service
+
+    @classmethod
+    def create_async_service(
+        cls,
+        model_class,
+        node_class,
+        record_class,
+        driver: AsyncDriver,
+        database: Optional[str] = None,
+        storage: RecordStorageEnum = RecordStorageEnum.FULL,
+        snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+    ):
+        """
+        Create an awaitable recorded node service on a neo4j async driver.
+
+        Args:
+            model_class: The pydantic model of the recorded data.
+            node_class: The neomodel class of the recorded node.
+            record_class: The neomodel class of the node records.
+            driver: The driver created with `neo4j.AsyncGraphDatabase.driver`.
+            database: The database name or None for the default database.
+            storage: Whether records hold full copies or only the changed fields.
+            snapshot_interval: With delta storage, the number of versions between
+                records holding the full state.
+
+        Returns: The async service.
+
+        """
+        # Memoised generation of CRUD models
+        models = cls.get_models(model_class)
+        create_model, read_model, update_model = (
+            models.create,
+            models.read,
+            models.update,
+        )
+        record_read_model = models.record_read
+
+        # Creating the generic repository and service
+        class GenericAsyncRepository(
+            AsyncNodeRepository[create_model, read_model, node_class]
+        ):
+            pass
+
+        class GenericAsyncService(
+            AsyncRecordedNodeService[node_class, record_class, read_model]
+        ):
+            pass
+
+        # Initialization of repository and service instances
+        repository = GenericAsyncRepository(
+            driver=driver,
+            node_model=node_class,
+            read_model=read_model,
+            database=database,
+        )
+        record_chain_repo = AsyncRecordChainRepository(
+            driver=driver,
+            chain=RecordChainRepository(
+                node_model=node_class,
+                record_model=record_class,
+                storage=storage,
+                snapshot_interval=snapshot_interval,
+            ),
+            database=database,
+        )
+        return GenericAsyncService(
+            repository=repository,
+            record_chain_repo=record_chain_repo,
+            create_model=create_model,
+            update_model=update_model,
+            record_read_model=record_read_model,
+        )
+
+    @classmethod
+    def create_edge_service(
+        cls,
+        model_class,
+        rel_type: str,
+        start_node_class,
+        end_node_class,
+        record_class,
+        backend: BackendEnum = BackendEnum.NEO4J,
+        store: Optional[MemoryStore] = None,
+    ):
+        """
+        Create a recorded edge service.
+
+        Args:
+            model_class: The pydantic model of the recorded edge data, derived from
+                `EdgeModel`.
+            rel_type: The type of the recorded relationships.
+            start_node_class: The neomodel class of the start nodes.
+            end_node_class: The neomodel class of the end nodes.
+            record_class: The neomodel class of the edge records, derived from
+                `EdgeRecord`.
+            backend: Whether the service stores in Neo4j or in a `MemoryStore`.
+            store: With the memory backend, the store or None for the process-wide
+                default store.
+
+        Returns: The service.
+
+        """
+        models = cls.get_edge_models(model_class)
+
+        class GenericEdgeService(RecordedEdgeService[record_class, models.read]):
+            pass
+
+        if BackendEnum(backend) == BackendEnum.MEMORY:
+            edge_chain_repo = MemoryEdgeRecordChainRepository[record_class](
+                rel_type=rel_type,
+                start_node_model=start_node_class,
+                end_node_model=end_node_class,
+                record_model=record_class,
+                store=store,
+            )
+        else:
+            edge_chain_repo = EdgeRecordChainRepository[record_class](
+                rel_type=rel_type,
+                start_node_model=start_node_class,
+                end_node_model=end_node_class,
+                record_model=record_class,
+            )
+
+        return GenericEdgeService(
+            edge_chain_repo=edge_chain_repo,
+            create_model=models.create,
+            read_model=models.read,
+            update_model=models.update,
+            record_read_model=models.record_read,
+        )
@@ -5,3 +5,18 @@ class OperationEnum(str, Enum):
     CREATED = "created"
     UPDATED = "updated"
     DELETED = "deleted"
+
+
+class RecordStorageEnum(str, Enum):
+    FULL = "full"
+    DELTA = "delta"
+
+
+class BackendEnum(str, Enum):
+    NEO4J = "neo4j"
+    MEMORY = "memory"
+
+
+class TransferFormatEnum(str, Enum):
+    PARQUET = "parquet"
+    JSONL = "jsonl"